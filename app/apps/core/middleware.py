@@ -0,0 +1,42 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+
+@database_sync_to_async
+def _user_for_token(raw_token):
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate WebSocket connections with a simplejwt access token, taken
+    from an ``Authorization: Bearer <token>`` header or, since browsers
+    cannot set headers on WebSocket requests, a ``token`` query parameter.
+    Sets ``scope["user"]``, anonymous when the token is missing or invalid.
+    """
+
+    async def __call__(self, scope, receive, send):
+        raw_token = self._raw_token(scope)
+        scope["user"] = (
+            await _user_for_token(raw_token) if raw_token else AnonymousUser()
+        )
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def _raw_token(scope):
+        headers = dict(scope.get("headers", []))
+        scheme, _, token = headers.get(b"authorization", b"").decode().partition(" ")
+        if token and scheme in ("Bearer", "JWT"):
+            return token
+        query = parse_qs(scope.get("query_string", b"").decode())
+        return query.get("token", [None])[0]
@@ -0,0 +1,160 @@
+"""
+Keyset (cursor) pagination for large tables.
+
+Pages are selected with a range condition on the ordering columns, starting
+after the last row of the previous page, so with a matching composite index
+page 1000 costs the same as page 1. There is deliberately no page number or
+offset to jump to.
+
+Subclasses set ``ordering``: a tuple of model fields, all ascending or all
+descending, whose last field is unique (the primary key) so the order is
+total. Cursors are opaque, URL-safe tokens encoding the boundary row.
+"""
+
+import base64
+import binascii
+import json
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip("-")) for name in self.ordering
+        ]
+        self.descending = self.ordering[0].startswith("-")
+        page_size = self.get_page_size(request)
+        position, backwards = self.decode_cursor(request)
+
+        # Walking backwards (to the previous page) runs the query in the
+        # opposite order and flips the rows back afterwards.
+        descending = self.descending != backwards
+        queryset = queryset.order_by(
+            *((("-" if descending else "") + field.name) for field in self.fields)
+        )
+        if position is not None:
+            queryset = queryset.filter(self._after(position, descending))
+
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def _after(self, position, descending):
+        """
+        Rows strictly past ``position`` in the query order, as
+        ``a <= x AND (a < x OR (a = x AND b < y))`` (``>=``/``>`` ascending):
+        the leading bound gives the planner an index range to scan.
+        """
+        strict, inclusive = ("lt", "lte") if descending else ("gt", "gte")
+        names = [field.name for field in self.fields]
+        past = Q()
+        for index, name in enumerate(names):
+            ties = {names[i]: position[i] for i in range(index)}
+            past |= Q(**ties, **{f"{name}__{strict}": position[index]})
+        return Q(**{f"{names[0]}__{inclusive}": position[0]}) & past
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        """Return ``(position, backwards)``; ``(None, False)`` for page one."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded))
+            values = payload["p"]
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                field.to_python(value) for field, value in zip(self.fields, values)
+            ]
+            return position, bool(payload.get("r"))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, backwards):
+        payload = {"p": [field.value_to_string(row) for field in self.fields]}
+        if backwards:
+            payload["r"] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return self._url_with_cursor(token.rstrip("="))
+
+    def _url_with_cursor(self, token):
+        url = urlparse(self.request.build_absolute_uri())
+        query = parse_qs(url.query, keep_blank_values=True)
+        query[self.cursor_query_param] = [token]
+        return urlunparse(url._replace(query=urlencode(query, doseq=True)))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], backwards=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], backwards=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Opaque cursor from a previous page's next/previous link.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Results per page (max {self.max_page_size}).",
+                "schema": {"type": "integer"},
+            },
+        ]
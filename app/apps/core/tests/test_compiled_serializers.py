@@ -0,0 +1,116 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from apps.core.serializers import compile_serializer
+from apps.notifications.choices import NotificationChannel, NotificationStatus
+from apps.notifications.models import (
+    Broadcast,
+    Notification,
+    NotificationContent,
+    NotificationTemplate,
+)
+from apps.notifications.serializers import BroadcastSerializer, NotificationSerializer
+from apps.users.api.serializers import ProfileSerializer, UserSerializer
+from apps.users.models import Profile, Role, User
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+def assert_parity(serializer_class, queryset, context=None):
+    compiled = compile_serializer(serializer_class)
+    objects = list(compiled.prepare(queryset))
+    expected = serializer_class(objects, many=True, context=context).data
+    assert render(compiled.serialize(objects, context)) == render(expected)
+
+
+@pytest.fixture
+def users():
+    admin = User.objects.create_user(
+        "admin", "Ada", "Admin", "admin@example.com", "pw", role=Role.ADMIN
+    )
+    admin.last_login = timezone.now()
+    admin.save()
+    user = User.objects.create_user("plain", "Paul", "Plain", "plain@example.com", "pw")
+    user.last_name = ""
+    user.save()
+    return admin, user
+
+
+@pytest.fixture
+def notifications(users):
+    template = NotificationTemplate.objects.create(
+        name="welcome", subject="Hi {{ name }}", template="Hello {{ name }}"
+    )
+    broadcast = Broadcast.objects.create(
+        name="launch", template=template, recipient_filter={"is_active": True}
+    )
+    plain = NotificationContent.pack("Hello", "Plain body")
+    large = NotificationContent.pack("News", "x" * 4096, "<p>" + "y" * 4096 + "</p>")
+    NotificationContent.objects.bulk_create([plain, large])
+    rows = [
+        Notification(user=users[0], recipient="admin@example.com", content=plain),
+        Notification(
+            user=users[1],
+            recipient="plain@example.com",
+            content=large,
+            broadcast=broadcast,
+            template=template,
+            status=NotificationStatus.SENT,
+            sent_at=timezone.now(),
+        ),
+        # No user: DRF omits user_email
+        Notification(
+            phone_number="+237600000000",
+            channel=NotificationChannel.SMS,
+            content=plain,
+            error_message="bounced",
+        ),
+    ]
+    for notification in rows:
+        notification.save()
+    return rows
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("zone", ["Africa/Douala", "UTC"])
+def test_notification_serializer_parity(notifications, zone):
+    with timezone.override(zone):
+        assert_parity(NotificationSerializer, Notification.objects.all())
+
+
+@pytest.mark.django_db
+def test_user_serializer_parity(users):
+    assert_parity(UserSerializer, User.objects.order_by("pkid"))
+
+
+@pytest.mark.django_db
+def test_profile_serializer_parity(users, settings):
+    settings.ALLOWED_HOSTS = ["testserver"]
+    Profile.objects.filter(user=users[1]).update(bio=None, country="FR")
+    request = APIRequestFactory().get("/")
+    assert_parity(ProfileSerializer, Profile.objects.all(), {"request": request})
+
+
+@pytest.mark.django_db
+def test_values_rows_parity(notifications):
+    Broadcast.objects.update(scheduled_at=timezone.now() + datetime.timedelta(days=1))
+    compiled = compile_serializer(BroadcastSerializer)
+    assert compiled.supports_values
+
+    queryset = Broadcast.objects.all()
+    expected = BroadcastSerializer(queryset, many=True).data
+    rows = compiled.serialize(compiled.values(queryset))
+    assert render(rows) == render(expected)
+
+
+def test_values_rejected_for_computed_fields():
+    compiled = compile_serializer(NotificationSerializer)
+    assert not compiled.supports_values
+    with pytest.raises(TypeError):
+        compiled.values(Notification.objects.all())
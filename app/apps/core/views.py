@@ -1,3 +1,21 @@
-from django.shortcuts import render
+from rest_framework.response import Response
 
-# Create your views here.
+from apps.core.serializers import compile_serializer
+
+
+class CompiledListMixin:
+    """
+    Serve the ``list`` action of a viewset with the compiled form of its
+    serializer (see ``apps.core.serializers``). Other actions, and the
+    response shape, are unchanged.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = compile_serializer(self.get_serializer_class())
+        queryset = compiled.prepare(self.filter_queryset(self.get_queryset()))
+        context = self.get_serializer_context()
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page, context))
+        return Response(compiled.serialize(queryset, context))
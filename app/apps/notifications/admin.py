@@ -3,13 +3,14 @@ from .models import (
     NotificationTemplate,
     Broadcast,
     Notification,
+    Segment,
     UserNotificationSetting,
 )
 
 
 @admin.register(NotificationTemplate)
 class NotificationTemplateAdmin(admin.ModelAdmin):
-    list_display = ["name", "type", "is_active", "created_at"]
+    list_display = ["name", "type", "is_active", "digest_window", "created_at"]
     list_filter = ["type", "is_active"]
     search_fields = ["name", "subject"]
 
@@ -27,6 +28,7 @@ class BroadcastAdmin(admin.ModelAdmin):
     list_filter = ["status", "channel", "created_at"]
     search_fields = ["name"]
     readonly_fields = [
+        "dispatched_at",
         "total_recipients",
         "sent_count",
         "failed_count",
@@ -35,15 +37,50 @@ class BroadcastAdmin(admin.ModelAdmin):
     ]
 
 
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    list_display = ["name", "size", "refreshed_at", "created_at"]
+    search_fields = ["name"]
+    exclude = ["bitmap"]
+    readonly_fields = ["size", "refreshed_at"]
+
+    def save_model(self, request, obj, form, change):
+        if {"filter", "expression"} & set(form.changed_data):
+            # Rebuilt by the next refresh_segments run
+            obj.refreshed_at = None
+        super().save_model(request, obj, form, change)
+
+
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ["id", "user", "recipient", "channel", "status", "created_at"]
+    list_display = [
+        "id",
+        "user",
+        "recipient",
+        "channel",
+        "status",
+        "attempts",
+        "created_at",
+    ]
     list_filter = ["channel", "status", "created_at"]
     search_fields = ["user__email", "recipient"]
-    readonly_fields = ["context", "error_message"]
+    readonly_fields = [
+        "content",
+        "context",
+        "error_message",
+        "attempts",
+        "next_attempt_at",
+        "read_at",
+    ]
 
 
 @admin.register(UserNotificationSetting)
 class UserNotificationSettingAdmin(admin.ModelAdmin):
-    list_display = ["user", "email_enabled", "sms_enabled", "updated_at"]
+    list_display = [
+        "user",
+        "email_enabled",
+        "sms_enabled",
+        "in_app_enabled",
+        "updated_at",
+    ]
     search_fields = ["user__email"]
@@ -0,0 +1,69 @@
+"""
+A per-process asyncio event loop for synchronous callers (Celery tasks).
+
+The loop runs on a daemon thread and owns one aiohttp ``ClientSession``, so
+keep-alive connections to HTTP providers survive from one task to the next
+instead of being rebuilt for every batch. Forked children start their own
+loop lazily on first use.
+"""
+
+import asyncio
+import os
+import threading
+
+import aiohttp
+from django.conf import settings
+
+
+class AsyncRunner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._session = None
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._session = None
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="notifications-asyncio",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro):
+        """Run ``coro`` on the process loop and block until it returns."""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    async def get_session(self):
+        """The shared ``aiohttp.ClientSession``; call from the process loop."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.NOTIFICATIONS_SMS_CONCURRENCY,
+                    keepalive_timeout=60,
+                ),
+                timeout=aiohttp.ClientTimeout(total=settings.NOTIFICATIONS_SMS_TIMEOUT),
+            )
+        return self._session
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+            session, self._session = self._session, None
+            if loop is None or self._pid != os.getpid():
+                return
+        if session is not None:
+            asyncio.run_coroutine_threadsafe(session.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+        loop.close()
+
+
+runner = AsyncRunner()
@@ -0,0 +1,278 @@
+"""
+Archival of old notifications to object storage.
+
+``archive_notifications`` walks finished notifications older than
+NOTIFICATIONS_ARCHIVE_AFTER_DAYS in keyset order (created_at, id), one chunk
+of NOTIFICATIONS_ARCHIVE_CHUNK_SIZE rows at a time. Each chunk is written as
+gzip-compressed JSON lines, one file per day, to the "notification_archive"
+storage (``ProtectedMediaStorage`` on R2). Every file is read back and checked
+before its rows are deleted, so memory use depends on the chunk size only.
+
+Files are laid out as ``notifications/YYYY/MM/DD/<first>-<last>.jsonl.gz``
+and records carry their rendered content inline, so ``rehydrate`` can put a
+time range back into the table without anything else surviving.
+"""
+
+import gzip
+import io
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta, timezone as dt_timezone
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .choices import NotificationStatus
+from .models import Notification, NotificationContent
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = "notifications"
+# Spool archive files in memory up to this size, then on disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+FINAL_STATUSES = (
+    NotificationStatus.SENT,
+    NotificationStatus.FAILED,
+    NotificationStatus.CANCELED,
+)
+
+ARCHIVED_FIELDS = (
+    "id",
+    "user_id",
+    "recipient",
+    "phone_number",
+    "channel",
+    "priority",
+    "status",
+    "broadcast_id",
+    "template_id",
+    "context",
+    "error_message",
+    "attempts",
+    "sent_at",
+    "read_at",
+    "created_at",
+)
+
+
+class ArchiveVerificationError(Exception):
+    """An archive file did not read back as written."""
+
+
+def get_archive_storage():
+    return storages["notification_archive"]
+
+
+def _record(notification):
+    record = {field: getattr(notification, field) for field in ARCHIVED_FIELDS}
+    # DjangoJSONEncoder would cut datetimes to milliseconds
+    for field in ("sent_at", "read_at", "created_at"):
+        record[field] = record[field] and record[field].isoformat()
+    record["subject"] = notification.subject
+    record["body"] = notification.body
+    record["html_body"] = notification.html_body
+    return record
+
+
+def _day_path(day):
+    return f"{ARCHIVE_PREFIX}/{day:%Y/%m/%d}"
+
+
+def _write_file(storage, notifications):
+    """Write one day's notifications as a gzip JSONL file; return its name."""
+    first, last = notifications[0], notifications[-1]
+    name = (
+        f"{_day_path(first.created_at)}/"
+        f"{first.created_at:%H%M%S%f}-{first.id.hex[:8]}-{last.id.hex[:8]}.jsonl.gz"
+    )
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        with gzip.GzipFile(fileobj=spool, mode="wb") as archive:
+            for notification in notifications:
+                line = json.dumps(_record(notification), cls=DjangoJSONEncoder)
+                archive.write(line.encode() + b"\n")
+        size = spool.tell()
+        spool.seek(0)
+        name = storage.save(name, File(spool, name=name))
+
+    if storage.size(name) != size:
+        raise ArchiveVerificationError(f"{name}: stored size differs from written")
+    last_id = None
+    count = 0
+    for record in read_file(storage, name):
+        count += 1
+        last_id = record["id"]
+    if count != len(notifications) or last_id != str(last.id):
+        raise ArchiveVerificationError(
+            f"{name}: read back {count} records, wrote {len(notifications)}"
+        )
+    return name
+
+
+def read_file(storage, name):
+    """Yield the records of an archive file, streaming."""
+    with storage.open(name, "rb") as stored:
+        with gzip.GzipFile(fileobj=stored, mode="rb") as archive:
+            for line in io.TextIOWrapper(archive, encoding="utf-8"):
+                yield json.loads(line)
+
+
+def _prune_contents(digests):
+    """Delete the content rows of archived notifications nothing else uses."""
+    unused = ~Exists(Notification.objects.filter(content=OuterRef("pk")))
+    try:
+        with transaction.atomic():
+            # Rows a sender holds (see save_notifications) are about to be
+            # referenced; skip them. The delete checks again for references
+            # committed after the lock was taken.
+            locked = list(
+                NotificationContent.objects.select_for_update(skip_locked=True)
+                .filter(unused, digest__in=digests)
+                .values_list("digest", flat=True)
+            )
+            NotificationContent.objects.filter(unused, digest__in=locked).delete()
+    except IntegrityError:
+        # Still referenced from a detached partition, or reused by a row
+        # inserted meanwhile; a later run picks it up if it becomes orphaned.
+        logger.info("Kept notification content still in use")
+
+
+def archive_notifications(older_than=None, chunk_size=None, max_seconds=None):
+    """
+    Archive and delete finished notifications created before ``older_than``
+    (default: NOTIFICATIONS_ARCHIVE_AFTER_DAYS ago). Stops after the chunk
+    that exceeds ``max_seconds``. Returns ``(archived rows, files written)``.
+    """
+    if older_than is None:
+        older_than = timezone.now() - timedelta(
+            days=settings.NOTIFICATIONS_ARCHIVE_AFTER_DAYS
+        )
+    chunk_size = chunk_size or settings.NOTIFICATIONS_ARCHIVE_CHUNK_SIZE
+    storage = get_archive_storage()
+    started = time.monotonic()
+
+    candidates = (
+        Notification.objects.select_related("content")
+        .filter(created_at__lt=older_than, status__in=FINAL_STATUSES)
+        .order_by("created_at", "id")
+    )
+    archived = files = 0
+    cursor = None
+    while True:
+        chunk = candidates
+        if cursor:
+            created_at, last_id = cursor
+            chunk = chunk.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=last_id)
+            )
+        notifications = list(chunk[:chunk_size])
+        if not notifications:
+            break
+
+        day_start = 0
+        for index in range(1, len(notifications) + 1):
+            if (
+                index == len(notifications)
+                or notifications[index].created_at.date()
+                != notifications[day_start].created_at.date()
+            ):
+                _write_file(storage, notifications[day_start:index])
+                files += 1
+                day_start = index
+
+        Notification.objects.filter(id__in=[n.id for n in notifications]).delete()
+        _prune_contents({n.content_id for n in notifications})
+        archived += len(notifications)
+        cursor = (notifications[-1].created_at, notifications[-1].id)
+
+        if max_seconds and time.monotonic() - started > max_seconds:
+            break
+
+    if archived:
+        logger.info(f"Archived {archived} notifications in {files} files")
+    return archived, files
+
+
+def rehydrate(start, end, batch_size=1000):
+    """
+    Restore archived notifications created in ``[start, end)`` into the
+    table. Rows that are already present are left alone. Returns the number
+    of records restored.
+    """
+    storage = get_archive_storage()
+    restored = 0
+    batch = []
+    # Archive paths are UTC days
+    start, end = start.astimezone(dt_timezone.utc), end.astimezone(dt_timezone.utc)
+    day = start.date()
+    while day <= end.date():
+        try:
+            _, names = storage.listdir(_day_path(day))
+        except FileNotFoundError:
+            names = []
+        for name in sorted(names):
+            for record in read_file(storage, f"{_day_path(day)}/{name}"):
+                created_at = parse_datetime(record["created_at"])
+                if not start <= created_at < end:
+                    continue
+                batch.append(record)
+                if len(batch) == batch_size:
+                    restored += _restore(batch)
+                    batch = []
+        day += timedelta(days=1)
+    if batch:
+        restored += _restore(batch)
+    return restored
+
+
+def _restore(records):
+    notifications = []
+    for record in records:
+        content = NotificationContent.pack(
+            record.pop("subject"), record.pop("body"), record.pop("html_body")
+        )
+        record["id"] = uuid.UUID(record["id"])
+        record["created_at"] = parse_datetime(record["created_at"])
+        for field in ("sent_at", "read_at"):
+            # Files written before read_at existed lack it
+            record[field] = record.get(field) and parse_datetime(record[field])
+        notifications.append(Notification(content=content, **record))
+
+    with transaction.atomic():
+        existing = set(
+            Notification.objects.filter(
+                id__in=[n.id for n in notifications]
+            ).values_list("id", flat=True)
+        )
+        notifications = [n for n in notifications if n.id not in existing]
+        # Users, broadcasts and templates deleted since are SET_NULL, as
+        # they would have been on the live row
+        for field in ("user", "broadcast", "template"):
+            model = Notification._meta.get_field(field).related_model
+            attname = f"{field}_id"
+            ids = {getattr(n, attname) for n in notifications} - {None}
+            alive = set(model.objects.filter(pk__in=ids).values_list("pk", flat=True))
+            for notification in notifications:
+                if getattr(notification, attname) not in alive:
+                    setattr(notification, attname, None)
+
+        contents = {n.content_id: n.content for n in notifications}
+        NotificationContent.objects.bulk_create(
+            contents.values(), ignore_conflicts=True
+        )
+        # bulk_create stamps auto_now_add fields; put the original times back
+        created_at = {n.id: n.created_at for n in notifications}
+        Notification.objects.bulk_create(notifications)
+        for notification in notifications:
+            notification.created_at = created_at[notification.id]
+        Notification.objects.bulk_update(notifications, ["created_at"], batch_size=500)
+    return len(notifications)
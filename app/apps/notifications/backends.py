@@ -1,8 +1,13 @@
+import asyncio
 import logging
+import smtplib
 from abc import ABC, abstractmethod
 
+import aiohttp
 from django.conf import settings
 from django.core.mail import send_mail as django_send_mail
+from django.core.mail.message import make_msgid, sanitize_address
+from django.core.mail.utils import DNS_NAME
 from django.template.loader import render_to_string
 
 logger = logging.getLogger(__name__)
@@ -15,6 +20,27 @@ class BaseEmailBackend(ABC):
     def send(self, recipient, subject, body, html_body=None, from_email=None):
         pass
 
+    def rate_limit(self):
+        """``(bucket key, messages per second)`` for ``ratelimit.get_bucket``."""
+        return "email:settings", settings.NOTIFICATIONS_EMAIL_RATE_LIMIT
+
+    def send_many(self, messages, throttle=None):
+        """
+        Send a batch of messages (dicts of ``send()`` kwargs).
+        ``throttle(i)``, if given, is called before sending ``messages[i]``.
+        Returns one entry per message: None on success, the exception on failure.
+        """
+        results = []
+        for index, message in enumerate(messages):
+            try:
+                if throttle:
+                    throttle(index)
+                self.send(**message)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
 
 class DjangoSMTPBackend(BaseEmailBackend):
     """Uses Django's default SMTP backend."""
@@ -42,6 +68,53 @@ class BaseSMSBackend(ABC):
     def send(self, phone_number, message):
         pass
 
+    def rate_limit(self):
+        """``(bucket key, messages per second)`` for ``ratelimit.get_bucket``."""
+        return f"sms:{type(self).__name__}", settings.NOTIFICATIONS_SMS_RATE_LIMIT
+
+    def send_many(self, messages, throttle=None):
+        """
+        Send a batch of messages (dicts of ``send()`` kwargs).
+        ``throttle(i)``, if given, is called before sending ``messages[i]``.
+        Returns one entry per message: None on success, the exception on failure.
+        """
+        results = []
+        for index, message in enumerate(messages):
+            try:
+                if throttle:
+                    throttle(index)
+                self.send(**message)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class SMSDeliveryError(Exception):
+    """The SMS provider rejected a message."""
+
+    def __init__(self, status, detail):
+        super().__init__(f"HTTP {status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+    @property
+    def permanent(self):
+        """Rejections of the message itself (bad number, opted out...)."""
+        return 400 <= self.status < 500 and self.status not in (408, 429)
+
+
+def is_permanent_failure(error):
+    """Whether a delivery that raised ``error`` would fail again on retry."""
+    if isinstance(error, SMSDeliveryError):
+        return error.permanent
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    # Missing recipient, unsupported channel
+    return isinstance(error, ValueError)
+
 
 class ConsoleSMSBackend(BaseSMSBackend):
     """For development – prints SMS to console."""
@@ -52,7 +125,7 @@ class ConsoleSMSBackend(BaseSMSBackend):
 
 
 class TwilioSMSBackend(BaseSMSBackend):
-    """Twilio implementation."""
+    """Twilio implementation using the blocking twilio SDK, one request at a time."""
 
     def __init__(self):
         from twilio.rest import Client
@@ -62,6 +135,12 @@ class TwilioSMSBackend(BaseSMSBackend):
         self.from_number = settings.TWILIO_PHONE_NUMBER
         self.client = Client(account_sid, auth_token)
 
+    def rate_limit(self):
+        return (
+            f"sms:twilio:{settings.TWILIO_ACCOUNT_SID}",
+            settings.NOTIFICATIONS_SMS_RATE_LIMIT,
+        )
+
     def send(self, phone_number, message):
         try:
             self.client.messages.create(
@@ -76,65 +155,192 @@ class TwilioSMSBackend(BaseSMSBackend):
             raise
 
 
+class AsyncTwilioSMSBackend(BaseSMSBackend):
+    """
+    Twilio over its REST API with aiohttp. A batch is sent concurrently, with
+    at most NOTIFICATIONS_SMS_CONCURRENCY requests in flight, over the
+    keep-alive session the worker process shares between tasks.
+    """
+
+    def __init__(self):
+        self.account_sid = settings.TWILIO_ACCOUNT_SID
+        self.auth_token = settings.TWILIO_AUTH_TOKEN
+        self.from_number = settings.TWILIO_PHONE_NUMBER
+        base_url = settings.TWILIO_API_BASE_URL.rstrip("/")
+        self.url = f"{base_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+
+    def rate_limit(self):
+        return f"sms:twilio:{self.account_sid}", settings.NOTIFICATIONS_SMS_RATE_LIMIT
+
+    def send(self, phone_number, message):
+        error = self.send_many([{"phone_number": phone_number, "message": message}])[0]
+        if error is not None:
+            logger.error(f"Failed to send SMS to {phone_number}: {error}")
+            raise error
+        logger.info(f"SMS sent to {phone_number}")
+        return True
+
+    def send_many(self, messages, throttle=None):
+        from .aio import runner
+
+        results = runner.run(self._send_all(messages, throttle))
+        if len(results) > 1:
+            sent = results.count(None)
+            logger.info(f"SMS batch sent: {sent} ok, {len(results) - sent} failed")
+        return results
+
+    async def _send_all(self, messages, throttle):
+        from .aio import runner
+
+        session = await runner.get_session()
+        auth = aiohttp.BasicAuth(self.account_sid, self.auth_token)
+        slots = asyncio.Semaphore(settings.NOTIFICATIONS_SMS_CONCURRENCY)
+
+        async def send_one(index, message):
+            async with slots:
+                try:
+                    if throttle:
+                        # Token buckets block; keep the loop free while they wait
+                        await asyncio.to_thread(throttle, index)
+                    await self._post(session, auth, **message)
+                    return None
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to send SMS to {message['phone_number']}: {e}"
+                    )
+                    return e
+
+        return list(
+            await asyncio.gather(*(send_one(i, m) for i, m in enumerate(messages)))
+        )
+
+    async def _post(self, session, auth, phone_number, message):
+        data = {"To": phone_number, "From": self.from_number, "Body": message}
+        async with session.post(self.url, data=data, auth=auth) as response:
+            # Read to the end so the connection goes back to the keep-alive pool
+            body = await response.text()
+            if response.status >= 400:
+                raise SMSDeliveryError(response.status, body)
+
+
 class DatabaseSMTPBackend(BaseEmailBackend):
     """
     Email backend that reads configuration from the EmailConfiguration model.
-    Falls back to Django's default SMTP backend if no active config exists.
+    Falls back to the EMAIL_* SMTP settings if no active config exists.
+    The configuration and live connections come from the per-process
+    registry in ``connections``, so sending costs no database query.
     """
 
-    def __init__(self):
-        self._backend = None
-        self._load_backend()
-
-    def _load_backend(self):
-        from .models import EmailConfiguration
-
-        config = EmailConfiguration.get_active()
-        if config:
-            from django.core.mail.backends.smtp import EmailBackend
-
-            self._backend = EmailBackend(
-                host=config.host,
-                port=config.port,
-                username=config.username,
-                password=config.password,
-                use_tls=config.use_tls,
-                use_ssl=config.use_ssl,
-                timeout=config.timeout,
-            )
-            self.from_email = config.from_email
-        else:
-            # Fallback to Django's default SMTP backend using settings
-            from django.core.mail import get_connection
+    def __init__(self, config=None):
+        # An explicit EmailConfiguration overrides the registry's active one
+        self.config = config
 
-            self._backend = get_connection()
-            from django.conf import settings
+    def _get_config(self):
+        from .connections import registry
 
-            self.from_email = settings.DEFAULT_FROM_EMAIL
+        return self.config or registry.get_config()
 
-    def send(self, recipient, subject, body, html_body=None, from_email=None):
-        from_email = from_email or getattr(self, "from_email", None)
-        if not from_email:
-            from django.conf import settings
+    @property
+    def from_email(self):
+        config = self._get_config()
+        return config.from_email if config else settings.DEFAULT_FROM_EMAIL
 
-            from_email = settings.DEFAULT_FROM_EMAIL
+    def rate_limit(self):
+        config = self._get_config()
+        if config and config.max_send_rate:
+            return f"email:{config.pk}", config.max_send_rate
+        return super().rate_limit()
 
-        if self._backend is None:
-            self._load_backend()
+    def send(self, recipient, subject, body, html_body=None, from_email=None):
+        error = self.send_many(
+            [
+                {
+                    "recipient": recipient,
+                    "subject": subject,
+                    "body": body,
+                    "html_body": html_body,
+                    "from_email": from_email,
+                }
+            ]
+        )[0]
+        if error is not None:
+            logger.error(f"Failed to send email to {recipient}: {error}")
+            raise error
+        logger.info(f"Email sent to {recipient}: {subject}")
+        return True
 
+    def send_many(self, messages, throttle=None):
+        """
+        Send all messages over one pooled SMTP connection (no TCP+TLS+AUTH
+        handshake per message). A failing message does not abort the batch;
+        its exception is returned in its slot instead.
+        """
+        from .connections import registry
+
+        with registry.get_pool().connection() as connection:
+            results = self.send_over(connection, messages, throttle=throttle)
+
+        if len(results) > 1:
+            sent = results.count(None)
+            logger.info(f"Email batch sent: {sent} ok, {len(results) - sent} failed")
+        return results
+
+    def send_over(self, connection, messages, throttle=None, prepared=None):
+        """
+        Send ``messages`` over an open ``connection``; see ``send_many``.
+
+        Messages with identical content (e.g. a broadcast rendered once) share
+        one MIME payload; only the recipient headers change between sends.
+        Pass the same ``prepared`` dict to share payloads across calls.
+        """
+        default_from = self.from_email
+        if prepared is None:
+            prepared = {}  # (subject, body, html_body, from_email) -> (email, mime)
+        results = []
+        for index, message in enumerate(messages):
+            recipient = message["recipient"]
+            try:
+                if throttle:
+                    throttle(index)
+                key = (
+                    message.get("subject", ""),
+                    message.get("body", ""),
+                    message.get("html_body"),
+                    message.get("from_email") or default_from,
+                )
+                if key in prepared:
+                    email, mime = prepared[key]
+                    del mime["To"], mime["Message-ID"]
+                    mime["To"] = recipient
+                    mime["Message-ID"] = make_msgid(domain=DNS_NAME)
+                else:
+                    email = self._create_email_message(*key, [recipient])
+                    mime = email.message()
+                    prepared[key] = (email, mime)
+                self._deliver(connection, email, recipient, mime)
+                results.append(None)
+            except Exception as e:
+                logger.warning(f"Failed to send email to {recipient}: {e}")
+                results.append(e)
+        return results
+
+    def _deliver(self, connection, email, recipient, mime):
+        encoding = email.encoding or settings.DEFAULT_CHARSET
+        from_email = sanitize_address(email.from_email, encoding)
+        payload = mime.as_bytes(linesep="\r\n")
+        if connection.connection is None:
+            connection.open()
         try:
-            self._backend.send_messages(
-                [
-                    self._create_email_message(
-                        subject, body, html_body, from_email, [recipient]
-                    )
-                ]
+            connection.connection.sendmail(
+                from_email, [sanitize_address(recipient, encoding)], payload
+            )
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped us between health checks: reconnect once
+            connection.close()
+            connection.open()
+            connection.connection.sendmail(
+                from_email, [sanitize_address(recipient, encoding)], payload
             )
-            logger.info(f"Email sent to {recipient}: {subject}")
-            return True
-        except Exception as e:
-            logger.exception(f"Failed to send email to {recipient}: {e}")
-            raise
 
     def _create_email_message(self, subject, body, html_body, from_email, to_emails):
         from django.core.mail import EmailMultiAlternatives
@@ -143,3 +349,76 @@ class DatabaseSMTPBackend(BaseEmailBackend):
         if html_body:
             msg.attach_alternative(html_body, "text/html")
         return msg
+
+
+def in_app_group(user_pkid):
+    """Channel-layer group of a user's open in-app WebSocket connections."""
+    return f"notifications_user_{user_pkid}"
+
+
+class InAppBackend:
+    """
+    In-app notifications, pushed to the recipient's open WebSocket
+    connections (consumers.NotificationConsumer) through the channel layer.
+    The notification row is the message: users who aren't connected find it
+    in their inbox, so a push only fails when the channel layer does.
+
+    A batch is handed to the layer as one group send per recipient, all in
+    flight together on the process event loop, rather than a blocking
+    publish per user.
+    """
+
+    def __init__(self, layer=None):
+        self.layer = layer
+
+    def rate_limit(self):
+        # No provider to protect; broadcast pacing still applies
+        return "in_app", None
+
+    def send(self, user_pkid, notification):
+        error = self.send_many(
+            [{"user_pkid": user_pkid, "notification": notification}]
+        )[0]
+        if error is not None:
+            logger.error(f"Failed to push notification to user {user_pkid}: {error}")
+            raise error
+        return True
+
+    def send_many(self, messages, throttle=None):
+        """
+        Push a batch of messages (dicts of ``send()`` kwargs).
+        ``throttle(i)``, if given, is called before pushing ``messages[i]``.
+        Returns one entry per message: None on success, the exception on failure.
+        """
+        from .aio import runner
+
+        return runner.run(self.asend_many(messages, throttle))
+
+    async def asend_many(self, messages, throttle=None):
+        """``send_many`` for callers already on an event loop."""
+        from channels.layers import get_channel_layer
+
+        layer = self.layer or get_channel_layer()
+
+        async def send_one(index, message):
+            try:
+                if throttle:
+                    # Token buckets block; keep the loop free while they wait
+                    await asyncio.to_thread(throttle, index)
+                await layer.group_send(
+                    in_app_group(message["user_pkid"]),
+                    {
+                        "type": "notification.message",
+                        "notification": message["notification"],
+                    },
+                )
+                return None
+            except Exception as e:
+                logger.warning(
+                    f"Failed to push notification to user {message['user_pkid']}: {e}"
+                )
+                return e
+
+        return list(
+            await asyncio.gather(*(send_one(i, m) for i, m in enumerate(messages)))
+        )
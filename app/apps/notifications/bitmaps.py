@@ -0,0 +1,63 @@
+"""
+Sets of user pkids as bitmaps: bit ``n`` of a Python int is set when pkid
+``n`` is a member.
+
+User pkids are dense auto-increment keys, so a bitmap costs about one bit
+per user ever created (2M users fit in 250KB) and union, intersection and
+difference are single C-level big-int operations. Bitmaps are stored
+zlib-compressed, which shrinks sparse ones to a few bytes per member run.
+"""
+
+import zlib
+from functools import reduce
+
+# Positions of the set bits of every byte value
+_BYTE_BITS = [
+    tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)
+]
+
+
+def from_pkids(pkids):
+    """The bitmap of an iterable of pkids."""
+    bits = bytearray()
+    for pkid in pkids:
+        index = pkid >> 3
+        if index >= len(bits):
+            bits.extend(bytes(index - len(bits) + 1))
+        bits[index] |= 1 << (pkid & 7)
+    return int.from_bytes(bits, "little")
+
+
+def iter_pkids(bitmap):
+    """The members of ``bitmap``, in ascending order."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for index, value in enumerate(data):
+        if value:
+            base = index << 3
+            for bit in _BYTE_BITS[value]:
+                yield base + bit
+
+
+def size(bitmap):
+    return bitmap.bit_count()
+
+
+def union(*bitmaps):
+    return reduce(lambda a, b: a | b, bitmaps, 0)
+
+
+def intersection(first, *others):
+    return reduce(lambda a, b: a & b, others, first)
+
+
+def difference(first, *others):
+    """Members of ``first`` that are in none of ``others``."""
+    return first & ~union(*others)
+
+
+def pack(bitmap):
+    return zlib.compress(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little"))
+
+
+def unpack(data):
+    return int.from_bytes(zlib.decompress(data), "little") if data else 0
@@ -5,11 +5,19 @@ from django.utils.translation import gettext_lazy as _
 class NotificationChannel(models.TextChoices):
     EMAIL = "email", _("Email")
     SMS = "sms", _("SMS")
+    IN_APP = "in_app", _("In-app")
     # Push, Slack, etc. can be added later
 
 
+class NotificationPriority(models.TextChoices):
+    TRANSACTIONAL = "transactional", _("Transactional")
+    BULK = "bulk", _("Bulk")
+    MAINTENANCE = "maintenance", _("Maintenance")
+
+
 class NotificationStatus(models.TextChoices):
     PENDING = "pending", _("Pending")
+    SENDING = "sending", _("Sending")
     SENT = "sent", _("Sent")
     FAILED = "failed", _("Failed")
     CANCELED = "canceled", _("Canceled")
@@ -24,6 +32,13 @@ class BroadcastStatus(models.TextChoices):
     CANCELED = "canceled", _("Canceled")
 
 
+class BroadcastPartitionStatus(models.TextChoices):
+    PENDING = "pending", _("Pending")
+    RUNNING = "running", _("Running")
+    DONE = "done", _("Done")
+
+
 class TemplateType(models.TextChoices):
     EMAIL = "email", _("Email")
     SMS = "sms", _("SMS")
+    IN_APP = "in_app", _("In-app")
@@ -0,0 +1,182 @@
+"""
+Process-wide SMTP connection management.
+
+Every process (Celery worker child, gunicorn worker) keeps a single
+``registry`` that caches the active EmailConfiguration and a small pool of
+live SMTP connections built from it. Saving or deleting an
+EmailConfiguration invalidates the cache locally through signals and in all
+other processes through a shared generation number.
+"""
+
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .generations import SharedGeneration
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class SMTPConnectionPool:
+    """
+    A bounded pool of open ``django.core.mail.backends.smtp.EmailBackend``
+    connections. Connections idle for longer than ``healthcheck_after``
+    seconds are probed with NOOP before being handed out again.
+    """
+
+    def __init__(self, config, size, healthcheck_after):
+        self.config = config
+        self.size = size
+        self.healthcheck_after = healthcheck_after
+        self._idle = []  # [(backend, last_used), ...]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _new_connection(self):
+        from django.core.mail.backends.smtp import EmailBackend
+
+        if self.config:
+            backend = EmailBackend(
+                host=self.config.host,
+                port=self.config.port,
+                username=self.config.username,
+                password=self.config.password,
+                use_tls=self.config.use_tls,
+                use_ssl=self.config.use_ssl,
+                timeout=self.config.timeout,
+            )
+        else:
+            # Fallback to the EMAIL_* SMTP settings
+            backend = EmailBackend()
+        backend.open()
+        return backend
+
+    @staticmethod
+    def _is_alive(backend):
+        if backend.connection is None:
+            return False
+        try:
+            return backend.connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _discard(backend):
+        try:
+            backend.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    return self._new_connection()
+                backend, last_used = item
+                idle_for = time.monotonic() - last_used
+                if idle_for < self.healthcheck_after or self._is_alive(backend):
+                    return backend
+                logger.info("Pooled SMTP connection failed health check, reconnecting")
+                self._discard(backend)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, backend, discard=False):
+        try:
+            if discard or self._closed or backend.connection is None:
+                self._discard(backend)
+            else:
+                with self._lock:
+                    self._idle.append((backend, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        backend = self.acquire()
+        discard = False
+        try:
+            yield backend
+        except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+            discard = True
+            raise
+        finally:
+            self.release(backend, discard=discard)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for backend, _ in idle:
+            self._discard(backend)
+
+
+class EmailBackendRegistry:
+    """
+    Caches the active EmailConfiguration and its connection pool for the
+    lifetime of the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config = _UNSET
+        self._pool = None
+        self._generation = SharedGeneration("notifications:email_config:generation")
+
+    def _is_stale(self):
+        return self._config is _UNSET or not self._generation.is_current()
+
+    def _reload(self):
+        from .models import EmailConfiguration
+
+        self._generation.mark_seen()
+        self._config = EmailConfiguration.get_active()
+
+        old_pool = self._pool
+        self._pool = SMTPConnectionPool(
+            self._config,
+            size=settings.NOTIFICATIONS_SMTP_POOL_SIZE,
+            healthcheck_after=settings.NOTIFICATIONS_SMTP_HEALTHCHECK_AFTER,
+        )
+        if old_pool:
+            old_pool.close()
+
+    def get_config(self):
+        """Return the active EmailConfiguration, or None to use settings."""
+        with self._lock:
+            if self._is_stale():
+                self._reload()
+            return self._config
+
+    def get_pool(self):
+        with self._lock:
+            if self._is_stale():
+                self._reload()
+            return self._pool
+
+    def invalidate(self):
+        """Drop the cached configuration here and in every other process."""
+        self._generation.bump()
+        with self._lock:
+            self._config = _UNSET
+
+    def close(self):
+        with self._lock:
+            if self._pool:
+                self._pool.close()
+            self._pool = None
+            self._config = _UNSET
+
+
+registry = EmailBackendRegistry()
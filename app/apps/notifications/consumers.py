@@ -0,0 +1,96 @@
+from channels.consumer import get_handler_name
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from . import progress
+from .backends import in_app_group
+from .choices import BroadcastStatus
+from .models import Broadcast
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    In-app notifications of the connected user, pushed as they are sent (see
+    backends.InAppBackend). Every open connection of the user gets them.
+    """
+
+    group = None
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.group = in_app_group(user.pkid)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def notification_message(self, event):
+        await self.send_json(event["notification"])
+
+    async def dispatch(self, message):
+        # No handler here touches the database: skip the thread hop the base
+        # class makes before each message to close stale DB connections,
+        # which would serialize every push on the sync executor.
+        handler = getattr(self, get_handler_name(message), None)
+        if handler is None:
+            raise ValueError(f"No handler for message type {message['type']}")
+        await handler(message)
+
+
+class BroadcastProgressConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live progress of one broadcast: a snapshot on connect, then the ones
+    pushed by senders (see progress.py), at most one per
+    NOTIFICATIONS_PROGRESS_INTERVAL. Requires an authenticated user, like
+    BroadcastViewSet.
+    """
+
+    group = None
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.broadcast_id = self.scope["url_route"]["kwargs"]["broadcast_id"]
+        initial = await self._initial_snapshot()
+        if initial is None:
+            await self.close()
+            return
+
+        self.group = progress.group_name(self.broadcast_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        await self.send_json(initial)
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def broadcast_progress(self, event):
+        await self.send_json(event["progress"])
+
+    @database_sync_to_async
+    def _initial_snapshot(self):
+        broadcast = (
+            Broadcast.objects.filter(id=self.broadcast_id)
+            .values("status", "total_recipients", "sent_count", "failed_count")
+            .first()
+        )
+        if broadcast is None:
+            return None
+        if broadcast["status"] == BroadcastStatus.SENDING:
+            return progress.snapshot(self.broadcast_id, record=False)
+        # Not started or finished: the row is up to date, the counters may be gone
+        return progress.message(
+            self.broadcast_id,
+            broadcast["status"],
+            broadcast["sent_count"],
+            broadcast["failed_count"],
+            broadcast["total_recipients"],
+        )
@@ -0,0 +1,76 @@
+"""
+Broadcast delivery counters kept in Redis.
+
+Senders HINCRBY a per-broadcast hash instead of doing a read-modify-write on
+the Broadcast row, so concurrent workers neither lose updates nor queue on
+its row lock. ``flush_broadcast_counters`` periodically copies the totals
+into Broadcast.sent_count/failed_count and completes the broadcast once
+every recipient is accounted for.
+"""
+
+from .redis_client import get_redis
+
+# Keep counters around for a while after completion for late readers
+COUNTER_TTL = 7 * 24 * 3600
+
+
+def _key(broadcast_id):
+    return f"notifications:broadcast:{broadcast_id}:counters"
+
+
+def record(broadcast_id, sent=0, failed=0):
+    """Add delivery outcomes for ``broadcast_id``."""
+    if not (sent or failed):
+        return
+    pipe = get_redis().pipeline(transaction=False)
+    if sent:
+        pipe.hincrby(_key(broadcast_id), "sent", sent)
+    if failed:
+        pipe.hincrby(_key(broadcast_id), "failed", failed)
+    pipe.expire(_key(broadcast_id), COUNTER_TTL)
+    pipe.execute()
+
+
+def set_total(broadcast_id, total):
+    """
+    Record the number of recipients of a broadcast. Until it is set a
+    broadcast is never considered complete.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hset(_key(broadcast_id), "total", total)
+    pipe.expire(_key(broadcast_id), COUNTER_TTL)
+    pipe.execute()
+
+
+def record_partition(broadcast_id, partition_id, failed, skipped):
+    """
+    Set one partition's users that failed to build and snapshotted users that
+    turned out not to need a notification (opted out or deleted since), which
+    count as failed and come off the total. The counts are the partition's
+    running totals, so setting them again after a crash never double-counts.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hset(
+        _key(broadcast_id),
+        mapping={
+            f"partition:{partition_id}:failed": failed,
+            f"partition:{partition_id}:skipped": skipped,
+        },
+    )
+    pipe.expire(_key(broadcast_id), COUNTER_TTL)
+    pipe.execute()
+
+
+def read(broadcast_id):
+    """Return ``(sent, failed, total)``; ``total`` is None until it is set."""
+    values = get_redis().hgetall(_key(broadcast_id))
+    sent = int(values.get(b"sent", 0))
+    failed = int(values.get(b"failed", 0))
+    total = values.get(b"total")
+    total = int(total) if total is not None else None
+    for field, value in values.items():
+        if field.endswith(b":failed"):
+            failed += int(value)
+        elif field.endswith(b":skipped") and total is not None:
+            total -= int(value)
+    return sent, failed, total
@@ -0,0 +1,204 @@
+"""
+Digest mode: coalescing a burst of notifications to one user into one message.
+
+For templates with a ``digest_window``, ``send_notification`` renders the
+notification as usual but, instead of saving and sending it, appends it to a
+Redis list per user, template and channel. The first item of a list starts
+its window: the list goes into a sorted set scored by when the window
+closes, and ``flush_due`` (run every NOTIFICATIONS_DIGEST_FLUSH_INTERVAL
+seconds) takes each due list atomically and delivers it as one notification:
+
+- a single item as the original message,
+- several through the template's ``digest_template``, or as a plain list of
+  the items when it has none.
+
+Buffered items only live in Redis. When Redis is unavailable notifications
+are sent right away, and a digest whose delivery fails is put back.
+"""
+
+import json
+import logging
+import time
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.html import linebreaks
+from redis.exceptions import RedisError
+
+from .models import NotificationTemplate
+from .redis_client import get_redis
+from .utils import build_notification, deliver_notification
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "notifications:digest:"
+_DUE = "notifications:digest:due"  # buffers scored by when their window closes
+# Extra seconds a buffer outlives its window, should flushing stall
+BUFFER_TTL = 24 * 3600
+# Items rendered into one digest; its count includes the rest
+MAX_ITEMS = 100
+
+# KEYS: buffer, due; ARGV: item, window close time, ttl
+_PUSH_SCRIPT = """
+local length = redis.call('RPUSH', KEYS[1], ARGV[1])
+if length == 1 then
+    redis.call('ZADD', KEYS[2], 'NX', ARGV[2], KEYS[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return length
+"""
+
+# KEYS: buffer, due. Returns the buffer's remaining TTL (ms), then its items.
+_TAKE_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+table.insert(items, 1, redis.call('PTTL', KEYS[1]))
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], KEYS[1])
+return items
+"""
+
+_scripts = {}
+
+
+def _script(source):
+    if source not in _scripts:
+        _scripts[source] = get_redis().register_script(source)
+    return _scripts[source]
+
+
+def _key(user_pkid, template_id, channel):
+    return f"{_PREFIX}{user_pkid}:{template_id}:{channel}"
+
+
+def is_digested(notification):
+    """True if ``notification`` should be buffered into a digest."""
+    template = notification.template
+    return bool(
+        template
+        and template.digest_window
+        and notification.user_id
+        and not notification.broadcast_id
+    )
+
+
+def buffer(notification):
+    """
+    Append a built, unsaved notification to its user's digest buffer, or
+    deliver it right away if Redis is unavailable.
+    """
+    item = json.dumps(
+        {
+            "subject": notification.subject,
+            "body": notification.body,
+            "html_body": notification.html_body,
+            "context": notification.context,
+            "created_at": timezone.now(),
+        },
+        cls=DjangoJSONEncoder,
+    )
+    window = notification.template.digest_window
+    try:
+        _script(_PUSH_SCRIPT)(
+            keys=[
+                _key(
+                    notification.user_id,
+                    notification.template_id,
+                    notification.channel,
+                ),
+                _DUE,
+            ],
+            args=[item, time.time() + window, window + BUFFER_TTL],
+        )
+    except RedisError as e:
+        logger.warning(f"Digest buffer unavailable, sending right away: {e}")
+        deliver_notification(notification)
+
+
+def _digest_content(items, count):
+    """``(subject, body, html_body)`` of a digest without a digest template."""
+    subject = items[0]["subject"]
+    if subject:
+        subject = f"{subject} (+{count - 1} more)"
+    body = "\n\n".join(item["body"] for item in items)
+    html_body = None
+    if any(item["html_body"] for item in items):
+        html_body = "<hr>".join(
+            item["html_body"] or linebreaks(item["body"], autoescape=True)
+            for item in items
+        )
+    return subject, body, html_body
+
+
+def _build(key, items):
+    """The notification delivering the buffered ``items`` of ``key``."""
+    user_pkid, template_id, channel = key[len(_PREFIX) :].split(":")
+    user = (
+        get_user_model()
+        .objects.select_related("notification_settings", "profile")
+        .filter(pkid=user_pkid)
+        .first()
+    )
+    template = NotificationTemplate.objects.filter(id=template_id).first()
+    if user is None or template is None:
+        return None
+    build = partial(build_notification, user=user, channel=channel)
+    if len(items) == 1:
+        [item] = items
+        notification = build(
+            subject=item["subject"],
+            body=item["body"],
+            html_body=item["html_body"],
+            context=item["context"],
+        )
+    elif template.digest_template:
+        notification = build(
+            template=template.digest_template,
+            context={"items": items[:MAX_ITEMS], "count": len(items)},
+        )
+    else:
+        subject, body, html_body = _digest_content(items[:MAX_ITEMS], len(items))
+        notification = build(subject=subject, body=body, html_body=html_body)
+    if notification is not None and notification.template is None:
+        notification.template = template
+    return notification
+
+
+def flush(key):
+    """Deliver the buffer ``key`` now; returns the notification, if any."""
+    redis = get_redis()
+    ttl, *items = _script(_TAKE_SCRIPT)(keys=[key, _DUE])
+    if not items:
+        return None
+    try:
+        with transaction.atomic():
+            notification = _build(key, [json.loads(item) for item in items])
+            if notification is not None:
+                deliver_notification(notification)
+        return notification
+    except Exception:
+        # Put them back ahead of any newer items, due right away. They keep
+        # the buffer's expiry, so one that keeps failing is dropped in time.
+        pipe = redis.pipeline()
+        pipe.lpush(key, *reversed(items))
+        if ttl > 0:
+            pipe.pexpire(key, ttl)
+        else:
+            pipe.expire(key, BUFFER_TTL)
+        pipe.zadd(_DUE, {key: time.time()})
+        pipe.execute()
+        raise
+
+
+def flush_due(limit=1000):
+    """Deliver up to ``limit`` buffers whose window has closed."""
+    keys = get_redis().zrangebyscore(_DUE, "-inf", time.time(), start=0, num=limit)
+    delivered = 0
+    for key in keys:
+        try:
+            delivered += flush(key.decode()) is not None
+        except Exception:
+            logger.exception(f"Failed to deliver digest {key.decode()}")
+    return delivered
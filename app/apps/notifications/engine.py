@@ -0,0 +1,215 @@
+"""
+asyncio email delivery engine.
+
+Runs outside Celery (``manage.py run_email_engine``) and drains pending email
+notifications over K concurrent SMTP sessions. A producer claims batches of
+rows and queues them in chunks; each session takes chunks off the queue and
+sends them over its own connection, so K conversations with the relay are
+in flight at once instead of one per prefork worker.
+
+smtplib is blocking, so every session does its network I/O on a dedicated
+thread (keeping its connection on one thread) while asyncio schedules the
+sessions, the producer and the periodic stats report.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections as db_connections
+
+from .backends import DatabaseSMTPBackend
+from .choices import NotificationChannel
+from .connections import SMTPConnectionPool, registry
+from .ratelimit import DeliveryThrottle
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStats:
+    __slots__ = ("sent", "failed", "busy", "max_latency")
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.busy = 0.0  # seconds spent in SMTP transactions
+        self.max_latency = 0.0
+
+    def record(self, latency, ok):
+        if ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+        self.busy += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    @property
+    def mean_latency(self):
+        count = self.sent + self.failed
+        return self.busy / count if count else 0.0
+
+
+class EngineStats:
+    def __init__(self, connections):
+        self.started = time.monotonic()
+        self.sessions = [SessionStats() for _ in range(connections)]
+
+    @property
+    def sent(self):
+        return sum(s.sent for s in self.sessions)
+
+    @property
+    def failed(self):
+        return sum(s.failed for s in self.sessions)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Messages per second (sent and failed) since the engine started."""
+        elapsed = self.elapsed
+        return (self.sent + self.failed) / elapsed if elapsed else 0.0
+
+    def report(self):
+        lines = [
+            f"{self.sent} sent, {self.failed} failed in {self.elapsed:.1f}s "
+            f"({self.rate:.1f} msg/s)"
+        ]
+        for index, session in enumerate(self.sessions):
+            lines.append(
+                f"  connection {index}: {session.sent + session.failed} msgs, "
+                f"mean {session.mean_latency * 1000:.1f}ms, "
+                f"max {session.max_latency * 1000:.1f}ms"
+            )
+        return "\n".join(lines)
+
+
+class EmailDeliveryEngine:
+    def __init__(
+        self,
+        connections=None,
+        batch_size=None,
+        chunk_size=50,
+        poll_interval=1.0,
+        report_interval=10.0,
+        config=None,
+    ):
+        self.connections = (
+            connections or settings.NOTIFICATIONS_EMAIL_ENGINE_CONNECTIONS
+        )
+        self.batch_size = batch_size or settings.NOTIFICATIONS_EMAIL_BATCH_SIZE
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.report_interval = report_interval
+        # Defaults to the active EmailConfiguration (or the EMAIL_* settings)
+        self.config = config if config is not None else registry.get_config()
+        self.pool = SMTPConnectionPool(
+            self.config,
+            size=self.connections,
+            healthcheck_after=settings.NOTIFICATIONS_SMTP_HEALTHCHECK_AFTER,
+        )
+        self.backend = DatabaseSMTPBackend(config=self.config)
+        self.stats = EngineStats(self.connections)
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """Finish the chunks already claimed, then return from ``run``."""
+        self._stopping.set()
+
+    async def run(self, drain=False):
+        """
+        Deliver pending email until ``stop()`` is called or, with ``drain``,
+        until no pending email is left. Returns the final ``EngineStats``.
+        """
+        from .tasks import claim_pending_notifications
+
+        queue = asyncio.Queue(maxsize=self.connections * 2)
+        sessions = [
+            asyncio.create_task(self._session(index, queue))
+            for index in range(self.connections)
+        ]
+        reporter = asyncio.create_task(self._report_periodically())
+        claimer = ThreadPoolExecutor(1, thread_name_prefix="email-engine-claim")
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._stopping.is_set():
+                notifications = await loop.run_in_executor(
+                    claimer,
+                    lambda: claim_pending_notifications(
+                        NotificationChannel.EMAIL, limit=self.batch_size
+                    ),
+                )
+                if not notifications:
+                    if drain:
+                        break
+                    try:
+                        await asyncio.wait_for(
+                            self._stopping.wait(), timeout=self.poll_interval
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                for start in range(0, len(notifications), self.chunk_size):
+                    await queue.put(notifications[start : start + self.chunk_size])
+        finally:
+            for _ in sessions:
+                await queue.put(None)
+            await asyncio.gather(*sessions)
+            reporter.cancel()
+            await loop.run_in_executor(claimer, db_connections.close_all)
+            # QUIT blocks on the network; keep it off the event loop
+            await loop.run_in_executor(claimer, self.pool.close)
+            claimer.shutdown()
+        logger.info(f"Email engine finished: {self.stats.report()}")
+        return self.stats
+
+    async def _session(self, index, queue):
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(1, thread_name_prefix=f"email-engine-{index}")
+        try:
+            while True:
+                notifications = await queue.get()
+                if notifications is None:
+                    break
+                await loop.run_in_executor(
+                    executor,
+                    self._deliver_chunk,
+                    notifications,
+                    self.stats.sessions[index],
+                )
+        finally:
+            await loop.run_in_executor(executor, db_connections.close_all)
+            executor.shutdown()
+
+    def _deliver_chunk(self, notifications, stats):
+        from .tasks import email_message, record_delivery_results
+
+        throttle = DeliveryThrottle(self.backend, notifications)
+        prepared = {}
+        errors = []
+        try:
+            with self.pool.connection() as connection:
+                for index, notification in enumerate(notifications):
+                    throttle(index)
+                    started = time.monotonic()
+                    [error] = self.backend.send_over(
+                        connection, [email_message(notification)], prepared=prepared
+                    )
+                    stats.record(time.monotonic() - started, ok=error is None)
+                    errors.append(error)
+        except Exception as e:
+            # Connection-level failure: fail what's left of the chunk
+            logger.warning(f"Email engine session lost its connection: {e}")
+            for _ in notifications[len(errors) :]:
+                stats.record(0.0, ok=False)
+                errors.append(e)
+        record_delivery_results(notifications, errors)
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info(f"Email engine: {self.stats.report()}")
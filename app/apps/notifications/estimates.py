@@ -0,0 +1,141 @@
+"""
+Broadcast dry runs: what sending a broadcast would do, without scanning the
+users table.
+
+- The recipient count is the size of the broadcast's segment, or else the
+  query planner's row estimate for the recipient query (PostgreSQL
+  ``EXPLAIN``, which reads table statistics only), or else the snapshot size
+  of the last broadcast sent on the same channel with the same filter.
+- Sample messages are rendered for the first few matching users: the first
+  segment members, or a LIMIT query with no ORDER BY, which stops at the
+  first matches.
+- The send duration follows from the slower of the broadcast's send_rate and
+  the provider's bulk rate.
+"""
+
+import json
+import logging
+import math
+from itertools import islice
+
+from django.db import DatabaseError, connections
+
+from . import bitmaps
+from .choices import BroadcastStatus, NotificationPriority
+from .models import Broadcast
+from .ratelimit import provider_rate
+from .recipients import Recipient, recipient_queryset, resolve_recipients
+from .utils import build_notification, get_backend
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_LIMIT = 10
+
+
+def planner_estimate(queryset):
+    """The planner's row estimate for ``queryset``, or None if unavailable."""
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    try:
+        plan = json.loads(queryset.explain(format="json"))
+        # A one-item list, or just the item when the driver decoded the JSON
+        if isinstance(plan, list):
+            plan = plan[0]
+        return int(plan["Plan"]["Plan Rows"])
+    except (DatabaseError, ValueError, LookupError) as e:
+        logger.warning(f"Could not get a row estimate: {e}")
+        return None
+
+
+def previous_snapshot_size(broadcast):
+    """Recipients snapshotted by the last broadcast like ``broadcast``, if any."""
+    return (
+        Broadcast.objects.filter(
+            channel=broadcast.channel,
+            recipient_filter=broadcast.recipient_filter,
+            segment__isnull=True,
+            status__in=[
+                BroadcastStatus.SENDING,
+                BroadcastStatus.SENT,
+                BroadcastStatus.FAILED,
+            ],
+        )
+        .exclude(id=broadcast.id)
+        .order_by("-created_at")
+        .values_list("total_recipients", flat=True)
+        .first()
+    )
+
+
+def estimate_recipients(broadcast):
+    """``(estimated recipient count, its source)``, or ``(None, None)``."""
+    if broadcast.segment_id:
+        return broadcast.segment.size, "segment"
+    pkids = (
+        recipient_queryset(broadcast.channel, broadcast.recipient_filter)
+        .values_list("pkid", flat=True)
+        .distinct()
+    )
+    estimate = planner_estimate(pkids)
+    if estimate is not None:
+        return estimate, "planner"
+    estimate = previous_snapshot_size(broadcast)
+    if estimate is not None:
+        return estimate, "previous_snapshot"
+    return None, None
+
+
+def sample_messages(broadcast, size):
+    """The broadcast's message rendered for up to ``size`` of its recipients."""
+    if broadcast.segment_id:
+        pkids = islice(bitmaps.iter_pkids(broadcast.segment.members), size)
+        users = resolve_recipients(broadcast.channel, list(pkids))
+    else:
+        rows = recipient_queryset(broadcast.channel, broadcast.recipient_filter)
+        users = [Recipient(*row) for row in rows[:size]]
+    samples = []
+    for user in users:
+        try:
+            notification = build_notification(
+                user=user,
+                channel=broadcast.channel,
+                template=broadcast.template,
+                broadcast=broadcast,
+            )
+        except Exception as e:
+            # The partition would count this recipient as failed
+            samples.append({"user": str(user.id), "error": str(e)})
+            continue
+        samples.append(
+            {
+                "user": str(user.id),
+                "recipient": notification.recipient or notification.phone_number,
+                "subject": notification.subject,
+                "body": notification.body,
+                "html_body": notification.html_body,
+            }
+        )
+    return samples
+
+
+def send_rate(broadcast):
+    """Messages per second the broadcast will go out at, or None if unlimited."""
+    backend = get_backend(broadcast.channel)
+    _, provider = provider_rate(backend, NotificationPriority.BULK)
+    rates = [rate for rate in (broadcast.send_rate, provider) if rate]
+    return min(rates) if rates else None
+
+
+def estimate_broadcast(broadcast, sample_size=3):
+    """Dry run of ``broadcast``: nothing is sent or written."""
+    count, source = estimate_recipients(broadcast)
+    rate = send_rate(broadcast)
+    return {
+        "recipients": {"estimate": count, "source": source},
+        "samples": sample_messages(broadcast, min(sample_size, SAMPLE_LIMIT)),
+        "send_rate": rate,
+        # Seconds; unknown without a count, unbounded by rate limits without a rate
+        "estimated_duration": math.ceil(count / rate)
+        if count is not None and rate
+        else None,
+    }
@@ -0,0 +1,63 @@
+"""
+Cross-process invalidation for per-process caches.
+
+A ``SharedGeneration`` is a counter in Redis, which every web and worker
+process shares (the default Django cache may be per-process LocMem). A
+process that changes the underlying data bumps it; every other process
+notices the new value (checked at most every NOTIFICATIONS_CACHE_RECHECK
+seconds) and drops its local copy. While Redis is unavailable processes keep
+their local copies rather than reloading on every use.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class SharedGeneration:
+    def __init__(self, key):
+        self.key = key
+        self._loaded = False
+        self._seen = None
+        self._checked_at = 0.0
+
+    def read(self):
+        """The current generation, or None if Redis is unavailable."""
+        try:
+            return int(get_redis().get(self.key) or 0)
+        except RedisError as e:
+            logger.warning(f"Could not read generation {self.key}: {e}")
+            return None
+
+    def mark_seen(self):
+        """Record the current generation; call *before* reloading the data."""
+        self._seen = self.read()
+        self._loaded = True
+        self._checked_at = time.monotonic()
+
+    def is_current(self):
+        if not self._loaded:
+            return False
+        now = time.monotonic()
+        if now - self._checked_at < settings.NOTIFICATIONS_CACHE_RECHECK:
+            return True
+        self._checked_at = now
+        current = self.read()
+        return current is None or current == self._seen
+
+    def forget(self):
+        self._loaded = False
+
+    def bump(self):
+        try:
+            get_redis().incr(self.key)
+        except RedisError as e:
+            # Other processes pick the change up once Redis is back and bumped
+            logger.error(f"Could not bump generation {self.key}: {e}")
+        self._loaded = False
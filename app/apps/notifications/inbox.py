@@ -0,0 +1,296 @@
+"""
+Per-user notification inbox kept in Redis.
+
+Sent notifications are a user's inbox items, unread until
+Notification.read_at is set. So that the unread badge polled on every page
+is a single Redis read instead of a COUNT over the notification log, Redis
+holds, per user (keyed by the public User.id carried by access tokens):
+
+- ``unread``: the number of unread items,
+- ``recent``: the latest NOTIFICATIONS_INBOX_RECENT_SIZE item ids, scored by
+  creation time, with their payloads in ``items`` and the still unread ones
+  in ``unread_ids``.
+
+The state is built lazily and only kept for users who use it: it expires
+NOTIFICATIONS_INBOX_TTL seconds after their last inbox read, and deliveries
+to users without it cost nothing. A read that misses marks the user dirty,
+and ``reconcile`` (run right after the miss and periodically) rebuilds
+dirty users from the database. Marking items read updates the database
+first, adjusts the counter by the rows actually changed, and marks the user
+dirty too, so a race with a concurrent delivery is repaired by the next
+reconcile.
+"""
+
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Notification, NotificationStatus
+from .redis_client import get_redis
+
+_PREFIX = "notifications:inbox:"
+_DIRTY = "notifications:inbox:dirty"  # user ids to rebuild from the database
+# Flag set on users being rebuilt; deliveries meanwhile mark them dirty again
+REBUILD_FLAG_TTL = 60
+
+# KEYS: unread, recent, items, unread_ids, rebuilding flag, dirty
+# ARGV: user id, notification id, score, payload, recent size
+_DELIVER_SCRIPT = """
+if redis.call('EXISTS', KEYS[5]) == 1 then
+    redis.call('SADD', KEYS[6], ARGV[1])
+end
+local ttl = redis.call('TTL', KEYS[1])
+if ttl < 0 or redis.call('HSETNX', KEYS[3], ARGV[2], ARGV[4]) == 0 then
+    return 0
+end
+redis.call('INCR', KEYS[1])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+redis.call('SADD', KEYS[4], ARGV[2])
+local evicted = redis.call('ZRANGE', KEYS[2], 0, -tonumber(ARGV[5]) - 1)
+if #evicted > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -tonumber(ARGV[5]) - 1)
+    redis.call('HDEL', KEYS[3], unpack(evicted))
+    redis.call('SREM', KEYS[4], unpack(evicted))
+end
+for i = 2, 4 do
+    redis.call('EXPIRE', KEYS[i], ttl)
+end
+return 1
+"""
+
+# KEYS: unread, recent, items, unread_ids, dirty
+# ARGV: user id, ttl, number of recent items to return
+# Returns {unread, payload, is unread, payload, is unread...}, or
+# {-1, newly dirty} when the user has no state.
+_READ_SCRIPT = """
+local unread = redis.call('GET', KEYS[1])
+if not unread then
+    return {-1, redis.call('SADD', KEYS[5], ARGV[1])}
+end
+for i = 1, 4 do
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+end
+local result = {tonumber(unread)}
+local limit = tonumber(ARGV[3])
+if limit > 0 then
+    for _, id in ipairs(redis.call('ZREVRANGE', KEYS[2], 0, limit - 1)) do
+        result[#result + 1] = redis.call('HGET', KEYS[3], id)
+        result[#result + 1] = redis.call('SISMEMBER', KEYS[4], id)
+    end
+end
+return result
+"""
+
+# KEYS: unread, unread_ids, dirty
+# ARGV: user id, rows marked read, their ids (none: all of them)
+_MARK_READ_SCRIPT = """
+redis.call('SADD', KEYS[3], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return
+end
+if redis.call('DECRBY', KEYS[1], ARGV[2]) < 0 then
+    redis.call('SET', KEYS[1], 0, 'KEEPTTL')
+end
+if #ARGV > 2 then
+    redis.call('SREM', KEYS[2], unpack(ARGV, 3))
+else
+    redis.call('DEL', KEYS[2])
+end
+"""
+
+_scripts = {}
+
+
+def _script(source):
+    if source not in _scripts:
+        _scripts[source] = get_redis().register_script(source)
+    return _scripts[source]
+
+
+def _keys(user_id):
+    prefix = f"{_PREFIX}{user_id}:"
+    return [f"{prefix}{name}" for name in ("unread", "recent", "items", "unread_ids")]
+
+
+def _rebuilding_key(user_id):
+    return f"{_PREFIX}{user_id}:rebuilding"
+
+
+def _payload(notification):
+    return json.dumps(
+        {
+            "id": str(notification.id),
+            "channel": notification.channel,
+            "subject": notification.subject,
+            "created_at": notification.created_at.isoformat(),
+        }
+    )
+
+
+def _unread_items():
+    return Notification.objects.filter(status=NotificationStatus.SENT, read_at=None)
+
+
+def _schedule_reconcile():
+    from .tasks import reconcile_inbox
+
+    reconcile_inbox.delay()
+
+
+def deliver(notifications):
+    """Add newly sent notifications to their users' inboxes."""
+    notifications = [n for n in notifications if n.user_id]
+    if not notifications:
+        return
+    public_ids = dict(
+        get_user_model()
+        .objects.filter(pkid__in={n.user_id for n in notifications})
+        .values_list("pkid", "id")
+    )
+    deliver_script = _script(_DELIVER_SCRIPT)
+    pipe = get_redis().pipeline(transaction=False)
+    for notification in notifications:
+        user_id = public_ids.get(notification.user_id)
+        if user_id is None:
+            continue
+        deliver_script(
+            keys=[*_keys(user_id), _rebuilding_key(user_id), _DIRTY],
+            args=[
+                str(user_id),
+                str(notification.id),
+                notification.created_at.timestamp(),
+                _payload(notification),
+                settings.NOTIFICATIONS_INBOX_RECENT_SIZE,
+            ],
+            client=pipe,
+        )
+    pipe.execute()
+
+
+def _read(user_id, limit):
+    result = _script(_READ_SCRIPT)(
+        keys=[*_keys(user_id), _DIRTY],
+        args=[str(user_id), settings.NOTIFICATIONS_INBOX_TTL, limit],
+    )
+    if result[0] == -1:
+        if result[1]:
+            _schedule_reconcile()
+        return None
+    return result
+
+
+def unread_count(user_id):
+    """
+    The user's unread count, from Redis only. A user without inbox state
+    reads 0 until the reconcile triggered by the miss has run.
+    """
+    result = _read(user_id, 0)
+    return result[0] if result else 0
+
+
+def recent(user_id, limit=None):
+    """
+    ``(unread count, latest items)`` of the user's inbox; items are dicts
+    with a ``read`` flag. Builds the state first if the user has none.
+    """
+    size = settings.NOTIFICATIONS_INBOX_RECENT_SIZE
+    limit = size if limit is None else min(limit, size)
+    result = _read(user_id, limit)
+    if result is None:
+        rebuild([user_id])
+        result = _read(user_id, limit) or [0]
+    items = []
+    for payload, unread in zip(result[1::2], result[2::2]):
+        if payload is not None:
+            item = json.loads(payload)
+            item["read"] = not unread
+            items.append(item)
+    return result[0], items
+
+
+def mark_read(user_id, notification_ids):
+    """Mark some of the user's items read; returns the number changed."""
+    changed = (
+        _unread_items()
+        .filter(user__id=user_id, id__in=notification_ids)
+        .update(read_at=timezone.now())
+    )
+    if changed:
+        unread, _, _, unread_ids = _keys(user_id)
+        _script(_MARK_READ_SCRIPT)(
+            keys=[unread, unread_ids, _DIRTY],
+            args=[str(user_id), changed, *map(str, notification_ids)],
+        )
+    return changed
+
+
+def mark_all_read(user_id):
+    """Mark all of the user's items read in one UPDATE; returns the number changed."""
+    changed = _unread_items().filter(user__id=user_id).update(read_at=timezone.now())
+    if changed:
+        unread, _, _, unread_ids = _keys(user_id)
+        _script(_MARK_READ_SCRIPT)(
+            keys=[unread, unread_ids, _DIRTY], args=[str(user_id), changed]
+        )
+    return changed
+
+
+def rebuild(user_ids):
+    """Rebuild the inbox state of ``user_ids`` (public ids) from the database."""
+    user_ids = [str(user_id) for user_id in user_ids]
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.set(_rebuilding_key(user_id), 1, ex=REBUILD_FLAG_TTL)
+    pipe.execute()
+
+    pkids = {
+        str(user_id): pkid
+        for user_id, pkid in get_user_model()
+        .objects.filter(id__in=user_ids)
+        .values_list("id", "pkid")
+    }
+    counts = dict(
+        _unread_items()
+        .filter(user_id__in=pkids.values())
+        .order_by()
+        .values_list("user_id")
+        .annotate(Count("id"))
+    )
+    size = settings.NOTIFICATIONS_INBOX_RECENT_SIZE
+    ttl = settings.NOTIFICATIONS_INBOX_TTL
+
+    pipe = redis.pipeline(transaction=True)
+    for user_id in user_ids:
+        keys = _keys(user_id)
+        pipe.delete(*keys, _rebuilding_key(user_id))
+        pkid = pkids.get(user_id)
+        if pkid is None:
+            continue
+        latest = list(
+            Notification.objects.select_related("content")
+            .filter(user_id=pkid, status=NotificationStatus.SENT)
+            .order_by("-created_at", "-id")[:size]
+        )
+        unread, recent_ids, items, unread_ids = keys
+        pipe.set(unread, counts.get(pkid, 0), ex=ttl)
+        if latest:
+            pipe.zadd(recent_ids, {str(n.id): n.created_at.timestamp() for n in latest})
+            pipe.hset(items, mapping={str(n.id): _payload(n) for n in latest})
+            pipe.expire(recent_ids, ttl)
+            pipe.expire(items, ttl)
+        if any(n.read_at is None for n in latest):
+            pipe.sadd(unread_ids, *(str(n.id) for n in latest if n.read_at is None))
+            pipe.expire(unread_ids, ttl)
+    pipe.execute()
+
+
+def reconcile(limit=500):
+    """Rebuild up to ``limit`` dirty users; returns how many were rebuilt."""
+    user_ids = [user_id.decode() for user_id in get_redis().spop(_DIRTY, limit) or []]
+    if user_ids:
+        rebuild(user_ids)
+    return len(user_ids)
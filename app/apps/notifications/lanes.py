@@ -0,0 +1,142 @@
+"""
+Priority lanes for notification delivery.
+
+Every NotificationPriority has its own Celery queue, served by its own worker
+pool, so transactional mail never waits behind a broadcast.
+
+Within the bulk lane, broadcasts don't publish their send batches straight
+to the queue. Each broadcast gets a Redis list of pending batches, and the
+broadcasts with work are kept in a ring. ``dispatch_bulk_batches`` walks the
+ring one batch per broadcast at a time and keeps at most
+NOTIFICATIONS_BULK_MAX_IN_FLIGHT batches on the queue, so a new small
+broadcast is served within one round instead of after a huge one's backlog.
+"""
+
+import json
+
+from django.conf import settings
+
+from .choices import NotificationChannel, NotificationPriority
+from .redis_client import get_redis
+
+QUEUES = {
+    NotificationPriority.TRANSACTIONAL: "transactional",
+    NotificationPriority.BULK: "bulk",
+    NotificationPriority.MAINTENANCE: "maintenance",
+}
+
+_RING = "notifications:bulk:ring"  # broadcast ids, rotated as they are served
+_MEMBERS = "notifications:bulk:members"  # same ids as a set, for O(1) membership
+_IN_FLIGHT = "notifications:bulk:in_flight"
+_DISPATCH_LOCK = "notifications:bulk:dispatch_lock"
+_BATCHES_PREFIX = "notifications:bulk:batches:"
+
+# Leaked credits (a worker killed mid-batch) expire once the lane goes idle
+IN_FLIGHT_TTL = 600
+
+_ENQUEUE_SCRIPT = """
+redis.call('RPUSH', KEYS[1], unpack(ARGV, 2))
+if redis.call('SADD', KEYS[3], ARGV[1]) == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[1])
+end
+"""
+
+# Rotate the ring until a broadcast with a pending batch comes up; drop
+# broadcasts whose list ran dry along the way.
+_NEXT_SCRIPT = """
+for i = 1, redis.call('LLEN', KEYS[1]) do
+    local broadcast_id = redis.call('RPOPLPUSH', KEYS[1], KEYS[1])
+    local batch = redis.call('LPOP', ARGV[1] .. broadcast_id)
+    if batch then
+        return batch
+    end
+    redis.call('LREM', KEYS[1], 1, broadcast_id)
+    redis.call('SREM', KEYS[2], broadcast_id)
+end
+return false
+"""
+
+_scripts = {}
+
+
+def _script(source):
+    if source not in _scripts:
+        _scripts[source] = get_redis().register_script(source)
+    return _scripts[source]
+
+
+def queue_for(priority):
+    return QUEUES[NotificationPriority(priority)]
+
+
+def batch_size(channel):
+    """Notifications per send batch task on ``channel``."""
+    if channel == NotificationChannel.EMAIL:
+        return settings.NOTIFICATIONS_EMAIL_BATCH_SIZE
+    if channel == NotificationChannel.IN_APP:
+        return settings.NOTIFICATIONS_IN_APP_BATCH_SIZE
+    return settings.NOTIFICATIONS_SMS_BATCH_SIZE
+
+
+def enqueue_bulk_batches(broadcast_id, channel, notification_ids):
+    """Queue send batches of ``notification_ids`` behind ``broadcast_id``'s turn."""
+    size = batch_size(channel)
+    ids = [str(i) for i in notification_ids]
+    batches = [
+        json.dumps({"channel": channel, "ids": ids[start : start + size]})
+        for start in range(0, len(ids), size)
+    ]
+    if batches:
+        _script(_ENQUEUE_SCRIPT)(
+            keys=[f"{_BATCHES_PREFIX}{broadcast_id}", _RING, _MEMBERS],
+            args=[str(broadcast_id), *batches],
+        )
+
+
+def waiting_broadcasts():
+    """Ids of the broadcasts that still have batches waiting for their turn."""
+    redis = get_redis()
+    members = [member.decode() for member in redis.smembers(_MEMBERS)]
+    pipe = redis.pipeline(transaction=False)
+    for broadcast_id in members:
+        pipe.llen(f"{_BATCHES_PREFIX}{broadcast_id}")
+    return {
+        broadcast_id for broadcast_id, length in zip(members, pipe.execute()) if length
+    }
+
+
+def take_bulk_batches():
+    """
+    Pop up to the free in-flight budget of batches, round-robin across
+    broadcasts, and reserve a credit for each. Returns ``[(channel, ids)]``.
+    Only one dispatcher runs at a time; others get an empty list.
+    """
+    redis = get_redis()
+    if not redis.set(_DISPATCH_LOCK, 1, nx=True, ex=30):
+        return []
+    try:
+        in_flight = int(redis.get(_IN_FLIGHT) or 0)
+        budget = settings.NOTIFICATIONS_BULK_MAX_IN_FLIGHT - in_flight
+        batches = []
+        next_batch = _script(_NEXT_SCRIPT)
+        for _ in range(max(budget, 0)):
+            batch = next_batch(keys=[_RING, _MEMBERS], args=[_BATCHES_PREFIX])
+            if batch is None:
+                break
+            batch = json.loads(batch)
+            batches.append((batch["channel"], batch["ids"]))
+        if batches:
+            pipe = redis.pipeline()
+            pipe.incrby(_IN_FLIGHT, len(batches))
+            pipe.expire(_IN_FLIGHT, IN_FLIGHT_TTL)
+            pipe.execute()
+        return batches
+    finally:
+        redis.delete(_DISPATCH_LOCK)
+
+
+def release_bulk_credit():
+    """Return the credit of a finished bulk batch."""
+    redis = get_redis()
+    if redis.decr(_IN_FLIGHT) < 0:
+        redis.set(_IN_FLIGHT, 0)
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.notifications.archive import archive_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Move finished notifications older than --days to the archive storage "
+        "as compressed JSON lines, deleting them from the table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.NOTIFICATIONS_ARCHIVE_AFTER_DAYS,
+            help="Archive notifications older than this (default NOTIFICATIONS_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Rows per chunk (default NOTIFICATIONS_ARCHIVE_CHUNK_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] <= 0:
+            raise CommandError("--days must be positive")
+        older_than = timezone.now() - timedelta(days=options["days"])
+        archived, files = archive_notifications(
+            older_than=older_than, chunk_size=options["chunk_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archived} notifications older than {older_than:%Y-%m-%d} "
+                f"in {files} files"
+            )
+        )
@@ -0,0 +1,142 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.notifications.choices import NotificationChannel, NotificationStatus
+from apps.notifications.engine import EmailDeliveryEngine
+from apps.notifications.models import (
+    EmailConfiguration,
+    Notification,
+    NotificationContent,
+)
+
+BENCHMARK_SUBJECT = "[email engine benchmark]"
+
+
+class SMTPSink:
+    """Minimal local SMTP server that accepts and discards every message."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        writer.write(b"220 benchmark sink ready\r\n")
+        in_data = False
+        while line := await reader.readline():
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    # Stand-in for the relay's queueing time
+                    await asyncio.sleep(self.latency)
+                    self.received += 1
+                    writer.write(b"250 queued\r\n")
+                continue
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                writer.write(b"250 benchmark sink\r\n")
+            elif command == b"DATA":
+                in_data = True
+                writer.write(b"354 end with <CRLF>.<CRLF>\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 bye\r\n")
+                break
+            else:
+                writer.write(b"250 ok\r\n")
+            await writer.drain()
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the asyncio email engine against a local SMTP sink. Creates "
+        "throwaway pending notifications, delivers them and deletes them again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000)
+        parser.add_argument(
+            "--connections",
+            default="1,4,8",
+            help="Comma-separated connection counts to compare.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=20.0,
+            help="Milliseconds the sink waits before accepting each message.",
+        )
+
+    def handle(self, *args, **options):
+        if Notification.objects.filter(
+            channel=NotificationChannel.EMAIL, status=NotificationStatus.PENDING
+        ).exists():
+            raise CommandError(
+                "Pending email notifications exist; the benchmark would deliver "
+                "them to the sink. Run it against an idle database."
+            )
+        connection_counts = [int(c) for c in options["connections"].split(",")]
+        for sessions in connection_counts:
+            stats = asyncio.run(
+                self._run(sessions, options["messages"], options["latency"] / 1000)
+            )
+            self.stdout.write(f"K={sessions}: {stats.report()}")
+
+    async def _run(self, connections, messages, latency):
+        sink = SMTPSink(latency)
+        port = await sink.start()
+        config = EmailConfiguration(
+            name="benchmark sink",
+            host="127.0.0.1",
+            port=port,
+            use_tls=False,
+            from_email="benchmark@localhost",
+            timeout=10,
+        )
+        await asyncio.to_thread(self._create_notifications, messages)
+        try:
+            engine = EmailDeliveryEngine(
+                connections=connections, config=config, report_interval=3600
+            )
+            stats = await engine.run(drain=True)
+        finally:
+            await asyncio.to_thread(self._delete_notifications)
+            await sink.stop()
+        if sink.received != stats.sent:
+            self.stderr.write(
+                f"Sink received {sink.received}, engine sent {stats.sent}"
+            )
+        return stats
+
+    def _create_notifications(self, count):
+        self.content = NotificationContent.pack(
+            BENCHMARK_SUBJECT, "Benchmark message body.\n" * 20
+        )
+        self.content.save()
+        Notification.objects.bulk_create(
+            (
+                Notification(
+                    recipient=f"benchmark-{i}@example.com",
+                    channel=NotificationChannel.EMAIL,
+                    content=self.content,
+                )
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+        connections.close_all()
+
+    def _delete_notifications(self):
+        Notification.objects.filter(content=self.content).delete()
+        self.content.delete()
+        connections.close_all()
@@ -0,0 +1,139 @@
+import asyncio
+import time
+import uuid
+
+from channels.layers import InMemoryChannelLayer, channel_layers
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.notifications.backends import InAppBackend
+from apps.notifications.consumers import NotificationConsumer
+
+LAYER_ALIAS = "in_app_benchmark"
+
+
+class SocketUser:
+    """Just enough of a User for NotificationConsumer; no database involved."""
+
+    is_authenticated = True
+
+    def __init__(self, pkid):
+        self.pkid = pkid
+
+
+class FanOutChannelLayer(InMemoryChannelLayer):
+    """
+    The in-memory layer without its expiry sweep, which walks every channel
+    and group on each send and receive: at 10k sockets that O(N) housekeeping
+    per operation, not the fan-out, would be what gets measured. Nothing
+    expires during a run anyway.
+    """
+
+    def _clean_expired(self):
+        pass
+
+
+class BenchmarkConsumer(NotificationConsumer):
+    channel_layer_alias = LAYER_ALIAS
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark in-app notification fan-out: connect WebSocket consumers to "
+        "an in-memory channel layer, push one notification to every user "
+        "through InAppBackend batches and time its arrival on each socket."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument(
+            "--sockets-per-user",
+            type=int,
+            default=1,
+            help="Open connections per user (e.g. several browser tabs).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.NOTIFICATIONS_IN_APP_BATCH_SIZE,
+            help="Notifications per send_many call, as in send_in_app_batch.",
+        )
+        parser.add_argument("--rounds", type=int, default=3)
+
+    def handle(self, *args, **options):
+        channel_layers.set(
+            LAYER_ALIAS, FanOutChannelLayer(capacity=max(options["rounds"], 100))
+        )
+        try:
+            asyncio.run(self._run(**options))
+        finally:
+            channel_layers.backends.pop(LAYER_ALIAS, None)
+
+    async def _run(self, users, sockets_per_user, batch_size, rounds, **options):
+        application = BenchmarkConsumer.as_asgi()
+        sockets = []
+        started = time.perf_counter()
+        for pkid in range(1, users + 1):
+            for _ in range(sockets_per_user):
+                socket = WebsocketCommunicator(application, "/ws/notifications/")
+                socket.scope["user"] = SocketUser(pkid)
+                sockets.append(socket)
+        connected = await asyncio.gather(
+            *(socket.connect(timeout=60) for socket in sockets)
+        )
+        if not all(accepted for accepted, _ in connected):
+            raise RuntimeError("A benchmark socket was rejected")
+        self.stdout.write(
+            f"Connected {len(sockets)} sockets for {users} users "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+        backend = InAppBackend(layer=channel_layers[LAYER_ALIAS])
+        try:
+            for round_number in range(1, rounds + 1):
+                latencies, send_time = await self._fan_out(
+                    backend, sockets, users, batch_size
+                )
+                latencies.sort()
+                self.stdout.write(
+                    f"Round {round_number}: {len(latencies)} deliveries, "
+                    f"send {send_time * 1000:.0f}ms, "
+                    f"latency p50 {percentile(latencies, 0.5) * 1000:.0f}ms "
+                    f"p99 {percentile(latencies, 0.99) * 1000:.0f}ms "
+                    f"max {latencies[-1] * 1000:.0f}ms, "
+                    f"{len(latencies) / latencies[-1]:.0f} deliveries/s"
+                )
+        finally:
+            await asyncio.gather(*(socket.disconnect() for socket in sockets))
+
+    async def _fan_out(self, backend, sockets, users, batch_size):
+        """Push one notification per user; return per-socket latencies."""
+        notification = {
+            "id": str(uuid.uuid4()),
+            "subject": "Benchmark",
+            "body": "In-app fan-out benchmark.",
+            "broadcast": None,
+            "created_at": None,
+        }
+        messages = [
+            {"user_pkid": pkid, "notification": notification}
+            for pkid in range(1, users + 1)
+        ]
+
+        async def receive(socket):
+            await socket.receive_json_from(timeout=60)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        receivers = [asyncio.ensure_future(receive(socket)) for socket in sockets]
+        for start in range(0, len(messages), batch_size):
+            errors = await backend.asend_many(messages[start : start + batch_size])
+            if any(errors):
+                raise RuntimeError(f"Push failed: {next(e for e in errors if e)}")
+        send_time = time.perf_counter() - started
+        return list(await asyncio.gather(*receivers)), send_time
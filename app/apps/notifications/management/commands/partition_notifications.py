@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.notifications import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain the monthly partitions of the Notification table (PostgreSQL): "
+        "create upcoming partitions and detach or drop expired ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Convert the existing table to a partitioned one first (one-off).",
+        )
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            help="Months to create ahead (default NOTIFICATIONS_PARTITIONS_AHEAD).",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            help="Expire partitions older than this (default NOTIFICATIONS_RETENTION_MONTHS, 0 keeps all).",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            default=None,
+            help="Drop expired partitions instead of only detaching them.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options["convert"]:
+                boundary = partitioning.convert_to_partitioned()
+                self.stdout.write(
+                    f"Converted {partitioning.TABLE}; rows before {boundary} are in "
+                    f"{partitioning.LEGACY_PARTITION}"
+                )
+            elif not partitioning.is_partitioned():
+                raise CommandError(
+                    f"{partitioning.TABLE} is not partitioned; run with --convert first"
+                )
+            created = partitioning.ensure_partitions(ahead=options["ahead"])
+            expired = partitioning.expire_partitions(
+                retention_months=options["retention_months"], drop=options["drop"]
+            )
+        except partitioning.PartitioningError as e:
+            raise CommandError(str(e))
+
+        for name in created:
+            self.stdout.write(f"Partition {name} ready")
+        for name in expired:
+            self.stdout.write(f"Partition {name} expired")
+        self.stdout.write(self.style.SUCCESS("Notification partitions up to date"))
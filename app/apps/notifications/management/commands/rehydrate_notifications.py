@@ -0,0 +1,46 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.notifications.archive import rehydrate
+
+
+def _parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date or datetime: {value}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Restore archived notifications created in [--start, --end) from the "
+        "archive storage into the table. Already present rows are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start", required=True, help="Date or datetime (inclusive)."
+        )
+        parser.add_argument(
+            "--end", required=True, help="Date or datetime (exclusive)."
+        )
+
+    def handle(self, *args, **options):
+        start = _parse_moment(options["start"])
+        end = _parse_moment(options["end"])
+        if end <= start:
+            raise CommandError("--end must be after --start")
+        restored = rehydrate(start, end)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Restored {restored} notifications from {start} to {end}"
+            )
+        )
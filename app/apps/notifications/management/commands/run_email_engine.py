@@ -0,0 +1,61 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.engine import EmailDeliveryEngine
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the asyncio email delivery engine: drain pending email "
+        "notifications over several concurrent SMTP connections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--connections",
+            type=int,
+            help="Concurrent SMTP sessions (default NOTIFICATIONS_EMAIL_ENGINE_CONNECTIONS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Notifications claimed per database round trip.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling again when nothing is pending.",
+        )
+        parser.add_argument(
+            "--report-interval",
+            type=float,
+            default=10.0,
+            help="Seconds between throughput/latency reports in the log.",
+        )
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="Exit once no pending email is left instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        engine = EmailDeliveryEngine(
+            connections=options["connections"],
+            batch_size=options["batch_size"],
+            poll_interval=options["poll_interval"],
+            report_interval=options["report_interval"],
+        )
+        self.stdout.write(
+            f"Email engine started with {engine.connections} SMTP connections"
+        )
+        stats = asyncio.run(self._run(engine, options["drain"]))
+        self.stdout.write(self.style.SUCCESS(stats.report()))
+
+    async def _run(self, engine, drain):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, engine.stop)
+        return await engine.run(drain=drain)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("sending", "Sending"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                    ("canceled", "Canceled"),
+                ],
+                default="pending",
+                max_length=20,
+                verbose_name="Status",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0002_notification_sending_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationtemplate",
+            name="context_variables",
+            field=models.JSONField(
+                blank=True, editable=False, null=True, verbose_name="Context variables"
+            ),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2 on 2026-10-17 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0003_notificationtemplate_context_variables"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BroadcastPartition",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("index", models.PositiveIntegerField()),
+                ("start_pkid", models.BigIntegerField()),
+                ("end_pkid", models.BigIntegerField()),
+                ("checkpoint_pkid", models.BigIntegerField(blank=True, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("enqueued", models.PositiveIntegerField(default=0)),
+                ("failed", models.PositiveIntegerField(default=0)),
+                ("skipped", models.PositiveIntegerField(default=0)),
+                ("heartbeat_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "broadcast",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="partitions",
+                        to="notifications.broadcast",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["broadcast", "index"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "heartbeat_at"],
+                        name="notificatio_status_6b8336_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("broadcast", "index"), name="unique_broadcast_partition"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="BroadcastRecipient",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("user_pkid", models.BigIntegerField()),
+                (
+                    "broadcast",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recipient_snapshot",
+                        to="notifications.broadcast",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("broadcast", "user_pkid"),
+                        name="unique_broadcast_recipient",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0004_broadcast_partitions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="broadcast",
+            name="send_rate",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Max messages per second for this broadcast; empty for no pacing",
+                null=True,
+                verbose_name="Send rate",
+            ),
+        ),
+        migrations.AddField(
+            model_name="emailconfiguration",
+            name="max_send_rate",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Max emails per second accepted by this server; empty for unlimited",
+                null=True,
+            ),
+        ),
+    ]
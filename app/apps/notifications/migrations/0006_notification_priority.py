@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0005_send_rate_limits"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="priority",
+            field=models.CharField(
+                choices=[
+                    ("transactional", "Transactional"),
+                    ("bulk", "Bulk"),
+                    ("maintenance", "Maintenance"),
+                ],
+                default="transactional",
+                max_length=20,
+                verbose_name="Priority",
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 03:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0007_notification_outbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationContent",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                (
+                    "subject",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Subject"
+                    ),
+                ),
+                ("body", models.BinaryField(verbose_name="Body")),
+                (
+                    "html_body",
+                    models.BinaryField(blank=True, null=True, verbose_name="HTML body"),
+                ),
+                ("compressed", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Notification Content",
+                "verbose_name_plural": "Notification Contents",
+            },
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="content",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="notifications",
+                to="notifications.notificationcontent",
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import zlib
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def digest(subject, body):
+    # Same digest as NotificationContent.compute_digest (no HTML was stored)
+    payload = json.dumps([subject, body, None], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def move_content(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    NotificationContent = apps.get_model("notifications", "NotificationContent")
+
+    rows = Notification.objects.filter(content__isnull=True).values_list(
+        "id", "subject", "body"
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            _move_batch(Notification, NotificationContent, batch)
+            batch = []
+    if batch:
+        _move_batch(Notification, NotificationContent, batch)
+
+
+def _move_batch(Notification, NotificationContent, batch):
+    contents = {}
+    notifications = []
+    for notification_id, subject, body in batch:
+        key = digest(subject, body)
+        # Stored uncompressed; new content is compressed as it's written
+        contents[key] = NotificationContent(
+            digest=key, subject=subject, body=body.encode(), compressed=False
+        )
+        notifications.append(Notification(id=notification_id, content_id=key))
+    NotificationContent.objects.bulk_create(contents.values(), ignore_conflicts=True)
+    Notification.objects.bulk_update(notifications, ["content"])
+
+
+def restore_content(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    for notification in Notification.objects.select_related("content").iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        body = bytes(notification.content.body)
+        if notification.content.compressed:
+            body = zlib.decompress(body)
+        notification.subject = notification.content.subject
+        notification.body = body.decode()
+        notification.save(update_fields=["subject", "body"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0008_notification_content"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_content, restore_content),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-17 03:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0009_move_notification_content"),
+    ]
+
+    operations = [
+        # Lets the column be re-added with existing rows when migrating back
+        migrations.AlterField(
+            model_name="notification",
+            name="body",
+            field=models.TextField(default="", verbose_name="Body"),
+        ),
+        migrations.RemoveField(
+            model_name="notification",
+            name="body",
+        ),
+        migrations.RemoveField(
+            model_name="notification",
+            name="subject",
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="content",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="notifications",
+                to="notifications.notificationcontent",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-17 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0012_notification_read_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usernotificationsetting",
+            name="in_app_enabled",
+            field=models.BooleanField(
+                default=True, verbose_name="In-app notifications"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="broadcast",
+            name="channel",
+            field=models.CharField(
+                choices=[("email", "Email"), ("sms", "SMS"), ("in_app", "In-app")],
+                default="email",
+                max_length=10,
+                verbose_name="Channel",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="channel",
+            field=models.CharField(
+                choices=[("email", "Email"), ("sms", "SMS"), ("in_app", "In-app")],
+                max_length=10,
+                verbose_name="Channel",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notificationtemplate",
+            name="type",
+            field=models.CharField(
+                choices=[("email", "Email"), ("sms", "SMS"), ("in_app", "In-app")],
+                default="email",
+                max_length=10,
+                verbose_name="Type",
+            ),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2 on 2026-10-17 04:07
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0013_in_app_channel"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Segment",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="Segment name"
+                    ),
+                ),
+                (
+                    "description",
+                    models.TextField(blank=True, verbose_name="Description"),
+                ),
+                (
+                    "filter",
+                    models.JSONField(
+                        blank=True,
+                        help_text="Lookups on indexed user fields (e.g., {'is_active': True}); empty for a derived segment",
+                        null=True,
+                        verbose_name="Filter",
+                    ),
+                ),
+                (
+                    "expression",
+                    models.JSONField(
+                        blank=True,
+                        help_text="Union, intersection or difference of other segments; empty for a base segment",
+                        null=True,
+                        verbose_name="Expression",
+                    ),
+                ),
+                ("bitmap", models.BinaryField(default=bytes)),
+                ("size", models.PositiveIntegerField(default=0, editable=False)),
+                (
+                    "refreshed_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="segments_created",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Segment",
+                "verbose_name_plural": "Segments",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="broadcast",
+            name="segment",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Send to this segment instead of the recipient filter",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="broadcasts",
+                to="notifications.segment",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 04:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0014_segments"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="broadcast",
+            name="dispatched_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="broadcast",
+            index=models.Index(
+                condition=models.Q(("status", "scheduled")),
+                fields=["scheduled_at"],
+                name="broadcast_scheduled_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 04:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0015_broadcast_scheduler"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationtemplate",
+            name="digest_template",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Renders the digest, with 'items' (subject, body, html_body, context) and 'count' in its context; empty for a plain list",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="digested_templates",
+                to="notifications.notificationtemplate",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationtemplate",
+            name="digest_window",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Seconds to collect a user's notifications from this template into one message; empty to send each right away",
+                null=True,
+                verbose_name="Digest window",
+            ),
+        ),
+    ]
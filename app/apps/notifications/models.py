@@ -1,4 +1,9 @@
+import hashlib
+import json
 import uuid
+import zlib
+from functools import cached_property
+
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -6,10 +11,13 @@ from django.utils.translation import gettext_lazy as _
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 
+from . import bitmaps
 from .choices import (
     NotificationChannel,
+    NotificationPriority,
     NotificationStatus,
     BroadcastStatus,
+    BroadcastPartitionStatus,
     TemplateType,
 )
 
@@ -45,6 +53,32 @@ class NotificationTemplate(models.Model):
         related_name="created_templates",
     )
     is_active = models.BooleanField(_("Active"), default=True)
+    # Digest mode (see digests.py)
+    digest_window = models.PositiveIntegerField(
+        _("Digest window"),
+        null=True,
+        blank=True,
+        help_text=_(
+            "Seconds to collect a user's notifications from this template into "
+            "one message; empty to send each right away"
+        ),
+    )
+    digest_template = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="digested_templates",
+        help_text=_(
+            "Renders the digest, with 'items' (subject, body, html_body, "
+            "context) and 'count' in its context; empty for a plain list"
+        ),
+    )
+    # Root context variables referenced by subject/template/html_template,
+    # computed on save. None means "not analysed yet".
+    context_variables = models.JSONField(
+        _("Context variables"), null=True, blank=True, editable=False
+    )
 
     class Meta:
         verbose_name = _("Notification Template")
@@ -54,6 +88,97 @@ class NotificationTemplate(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.context_variables = self.analyse_context_variables()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "context_variables"}
+        super().save(*args, **kwargs)
+
+    def analyse_context_variables(self):
+        from .templating import referenced_variables
+
+        return referenced_variables(self.subject, self.template, self.html_template)
+
+    def get_context_variables(self):
+        if self.context_variables is None:
+            return self.analyse_context_variables()
+        return self.context_variables
+
+    def uses_variable(self, name):
+        variables = self.get_context_variables()
+        return name in variables or "*" in variables
+
+    def is_invariant(self, known_variables):
+        """True if rendering only depends on ``known_variables`` (not the recipient)."""
+        return set(self.get_context_variables()) <= set(known_variables)
+
+
+class Segment(models.Model):
+    """
+    A named set of users, materialised as a bitmap of their pkids (see
+    bitmaps.py and segments.py).
+
+    Base segments select users with ``filter``; derived segments combine
+    other segments with ``expression``, e.g.
+    ``{"difference": [<segment id>, {"union": [<segment id>, ...]}]}``.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(_("Segment name"), max_length=255, unique=True)
+    description = models.TextField(_("Description"), blank=True)
+    filter = models.JSONField(
+        _("Filter"),
+        null=True,
+        blank=True,
+        help_text=_(
+            "Lookups on indexed user fields (e.g., {'is_active': True}); "
+            "empty for a derived segment"
+        ),
+    )
+    expression = models.JSONField(
+        _("Expression"),
+        null=True,
+        blank=True,
+        help_text=_(
+            "Union, intersection or difference of other segments; "
+            "empty for a base segment"
+        ),
+    )
+    bitmap = models.BinaryField(default=bytes, editable=False)
+    size = models.PositiveIntegerField(default=0, editable=False)
+    # When membership last changed; empty until the segment is (re)built
+    refreshed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="segments_created",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Segment")
+        verbose_name_plural = _("Segments")
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"{self.name} ({self.size})"
+
+    @property
+    def is_derived(self):
+        return self.expression is not None
+
+    @property
+    def members(self):
+        """The member bitmap."""
+        return bitmaps.unpack(self.bitmap)
+
+    def set_members(self, bitmap):
+        self.bitmap = bitmaps.pack(bitmap)
+        self.size = bitmaps.size(bitmap)
+
 
 class Broadcast(models.Model):
     """
@@ -78,7 +203,24 @@ class Broadcast(models.Model):
         default=dict,
         help_text=_("Query filters to select users (e.g., {'is_active': True})"),
     )
+    segment = models.ForeignKey(
+        Segment,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="broadcasts",
+        help_text=_("Send to this segment instead of the recipient filter"),
+    )
     scheduled_at = models.DateTimeField(_("Scheduled at"), null=True, blank=True)
+    # When a SCHEDULED broadcast was last handed to process_broadcast; the
+    # scheduler hands it over again if it is still SCHEDULED long after
+    dispatched_at = models.DateTimeField(null=True, blank=True, editable=False)
+    send_rate = models.PositiveIntegerField(
+        _("Send rate"),
+        null=True,
+        blank=True,
+        help_text=_("Max messages per second for this broadcast; empty for no pacing"),
+    )
     status = models.CharField(
         _("Status"),
         max_length=20,
@@ -104,11 +246,157 @@ class Broadcast(models.Model):
         verbose_name = _("Broadcast")
         verbose_name_plural = _("Broadcasts")
         ordering = ["-created_at"]
+        indexes = [
+            # What the scheduler sweeps: only broadcasts waiting to start
+            models.Index(
+                fields=["scheduled_at"],
+                condition=models.Q(status=BroadcastStatus.SCHEDULED),
+                name="broadcast_scheduled_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_status_display()})"
 
 
+class BroadcastRecipient(models.Model):
+    """
+    Recipient snapshot taken when a broadcast starts sending: one compact
+    row per user pkid, so later changes to the users table don't move the
+    target set under a running (or resuming) broadcast.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    broadcast = models.ForeignKey(
+        Broadcast,
+        on_delete=models.CASCADE,
+        related_name="recipient_snapshot",
+        db_index=False,  # covered by the unique constraint below
+    )
+    user_pkid = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["broadcast", "user_pkid"], name="unique_broadcast_recipient"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.broadcast_id} -> {self.user_pkid}"
+
+
+class BroadcastPartition(models.Model):
+    """
+    A pkid range of a broadcast's recipient snapshot, processed by its own
+    Celery task. ``checkpoint_pkid`` is the last user whose notification was
+    committed, so a crashed partition resumes right after it. ``failed`` and
+    ``skipped`` count its users that failed to build or needed no
+    notification, committed with the checkpoint.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    broadcast = models.ForeignKey(
+        Broadcast,
+        on_delete=models.CASCADE,
+        related_name="partitions",
+    )
+    index = models.PositiveIntegerField()
+    start_pkid = models.BigIntegerField()  # inclusive
+    end_pkid = models.BigIntegerField()  # inclusive
+    checkpoint_pkid = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=BroadcastPartitionStatus.choices,
+        default=BroadcastPartitionStatus.PENDING,
+    )
+    enqueued = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["broadcast", "index"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["broadcast", "index"], name="unique_broadcast_partition"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "heartbeat_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.broadcast_id} #{self.index} ({self.status})"
+
+
+class NotificationContent(models.Model):
+    """
+    Rendered subject/text/HTML of one or more notifications, stored once per
+    distinct content and keyed by its SHA-256 digest. A broadcast rendered
+    once for N recipients points N notifications at one row. Bodies of at
+    least NOTIFICATIONS_CONTENT_COMPRESS_MIN bytes are zlib-compressed.
+    """
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    subject = models.CharField(_("Subject"), max_length=255, blank=True)
+    body = models.BinaryField(_("Body"))
+    html_body = models.BinaryField(_("HTML body"), null=True, blank=True)
+    compressed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Notification Content")
+        verbose_name_plural = _("Notification Contents")
+
+    def __str__(self):
+        return self.subject or self.digest
+
+    @staticmethod
+    def compute_digest(subject, body, html_body=None):
+        payload = json.dumps([subject, body, html_body], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @classmethod
+    def pack(cls, subject, body, html_body=None):
+        """An unsaved content row for a rendered message; save with bulk_create."""
+        subject, body = subject or "", body or ""
+        html_body = html_body or None
+        encoded_body = body.encode()
+        encoded_html = html_body.encode() if html_body is not None else None
+        threshold = settings.NOTIFICATIONS_CONTENT_COMPRESS_MIN
+        compressed = bool(threshold) and (
+            len(encoded_body) + len(encoded_html or b"") >= threshold
+        )
+        if compressed:
+            encoded_body = zlib.compress(encoded_body)
+            if encoded_html is not None:
+                encoded_html = zlib.compress(encoded_html)
+        return cls(
+            digest=cls.compute_digest(subject, body, html_body),
+            subject=subject,
+            body=encoded_body,
+            html_body=encoded_html,
+            compressed=compressed,
+        )
+
+    def _decode(self, value):
+        if value is None:
+            return None
+        value = bytes(value)  # memoryview on PostgreSQL
+        if self.compressed:
+            value = zlib.decompress(value)
+        return value.decode()
+
+    @cached_property
+    def text(self):
+        return self._decode(self.body)
+
+    @cached_property
+    def html(self):
+        return self._decode(self.html_body)
+
+
 class Notification(models.Model):
     """
     Log of a single notification sent to a user.
@@ -129,14 +417,24 @@ class Notification(models.Model):
         max_length=10,
         choices=NotificationChannel.choices,
     )
-    subject = models.CharField(_("Subject"), max_length=255, blank=True)
-    body = models.TextField(_("Body"))
+    # Rendered subject/body/HTML, shared with identical notifications
+    content = models.ForeignKey(
+        NotificationContent,
+        on_delete=models.PROTECT,
+        related_name="notifications",
+    )
     status = models.CharField(
         _("Status"),
         max_length=20,
         choices=NotificationStatus.choices,
         default=NotificationStatus.PENDING,
     )
+    priority = models.CharField(
+        _("Priority"),
+        max_length=20,
+        choices=NotificationPriority.choices,
+        default=NotificationPriority.TRANSACTIONAL,
+    )
     broadcast = models.ForeignKey(
         Broadcast,
         on_delete=models.SET_NULL,
@@ -153,7 +451,13 @@ class Notification(models.Model):
     )
     context = models.JSONField(_("Context"), default=dict, blank=True)
     error_message = models.TextField(_("Error message"), blank=True)
+    attempts = models.PositiveSmallIntegerField(_("Attempts"), default=0)
+    # PENDING: not claimable before this time (retry backoff).
+    # SENDING: lease expiry, after which the sweeper takes the row back.
+    next_attempt_at = models.DateTimeField(_("Next attempt at"), default=timezone.now)
     sent_at = models.DateTimeField(null=True, blank=True)
+    # Inbox read state of a sent notification (see inbox.py)
+    read_at = models.DateTimeField(_("Read at"), null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -162,12 +466,38 @@ class Notification(models.Model):
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["status"]),
-            models.Index(fields=["user", "-created_at"]),
+            # Keyset pagination of a user's / everyone's history
+            models.Index(fields=["user", "-created_at", "-id"]),
+            models.Index(fields=["-created_at", "-id"]),
+            # The outbox: only claimable rows are indexed, so it stays small
+            models.Index(
+                fields=["channel", "next_attempt_at"],
+                condition=models.Q(status=NotificationStatus.PENDING),
+                name="notification_claimable_idx",
+            ),
+            # Unread inbox items, for counting them per user
+            models.Index(
+                fields=["user"],
+                condition=models.Q(status=NotificationStatus.SENT, read_at=None),
+                name="notification_unread_idx",
+            ),
         ]
 
     def __str__(self):
         return f"{self.channel} to {self.recipient or self.user} - {self.status}"
 
+    @property
+    def subject(self):
+        return self.content.subject
+
+    @property
+    def body(self):
+        return self.content.text
+
+    @property
+    def html_body(self):
+        return self.content.html
+
 
 class UserNotificationSetting(models.Model):
     """
@@ -182,6 +512,7 @@ class UserNotificationSetting(models.Model):
     )
     email_enabled = models.BooleanField(_("Email notifications"), default=True)
     sms_enabled = models.BooleanField(_("SMS notifications"), default=False)
+    in_app_enabled = models.BooleanField(_("In-app notifications"), default=True)
     # You can extend with specific types (e.g., marketing, security)
     receive_marketing_emails = models.BooleanField(_("Marketing emails"), default=False)
     receive_security_emails = models.BooleanField(_("Security emails"), default=True)
@@ -212,6 +543,11 @@ class EmailConfiguration(models.Model):
     from_email = models.EmailField(help_text="Default from email address")
     reply_to = models.EmailField(blank=True, null=True)
     timeout = models.PositiveIntegerField(default=30)
+    max_send_rate = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Max emails per second accepted by this server; empty for unlimited",
+    )
     is_active = models.BooleanField(
         default=False, help_text="Only one config can be active at a time"
     )
@@ -0,0 +1,221 @@
+"""
+Monthly range partitioning of the Notification log on PostgreSQL (opt-in,
+NOTIFICATIONS_PARTITIONING).
+
+``convert_to_partitioned`` turns ``notifications_notification`` into a table
+partitioned by ``created_at``. The existing rows are not copied: the old
+table becomes the first partition, covering everything up to the end of the
+current month. From then on ``maintain_partitions`` (run periodically by
+``maintain_notification_partitions``) creates the upcoming monthly
+partitions ahead of time and detaches (or drops) the ones that fell out of
+NOTIFICATIONS_RETENTION_MONTHS, so purging old notifications is a catalog
+operation instead of a huge DELETE.
+
+PostgreSQL requires the primary key of a partitioned table to include the
+partition key, so the database key becomes ``(id, created_at)``. Django keeps
+treating ``id`` as the primary key; ids are random UUIDs, so it stays unique
+in practice.
+"""
+
+import logging
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+TABLE = Notification._meta.db_table
+LEGACY_PARTITION = f"{TABLE}_legacy"
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def _month_start(day, offset=0):
+    """First day of the month ``offset`` months after ``day``'s month."""
+    month = day.month - 1 + offset
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_y{month.year}m{month.month:02d}"
+
+
+def _check_vendor():
+    if connection.vendor != "postgresql":
+        raise PartitioningError("Notification partitioning requires PostgreSQL")
+
+
+def is_partitioned():
+    _check_vendor()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """``[(name, upper_bound)]`` of the attached partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+            [TABLE],
+        )
+        partitions = []
+        for name, bound in cursor.fetchall():
+            match = _UPPER_BOUND.search(bound)
+            upper = datetime.fromisoformat(match.group(1)) if match else None
+            partitions.append((name, upper))
+    latest = datetime.max.replace(tzinfo=dt_timezone.utc)
+    return sorted(partitions, key=lambda partition: partition[1] or latest)
+
+
+def convert_to_partitioned(today=None):
+    """
+    Replace the Notification table by a partitioned one and attach the old
+    table as its first partition. Runs in one transaction that locks the
+    table while the old rows are checked once against the partition bound
+    (the CHECK constraint, which then lets ATTACH skip its own scan).
+    """
+    _check_vendor()
+    if is_partitioned():
+        raise PartitioningError(f"{TABLE} is already partitioned")
+    boundary = _month_start(today or date.today(), 1)
+    quote = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) "
+            "FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary",
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(LEGACY_PARTITION)}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(LEGACY_PARTITION)} ADD CONSTRAINT "
+            f"{quote(LEGACY_PARTITION + '_bound')} CHECK "
+            f"(created_at IS NOT NULL AND created_at < %s)",
+            [boundary],
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote(TABLE)} (LIKE {quote(LEGACY_PARTITION)} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} DROP CONSTRAINT {quote(LEGACY_PARTITION + '_bound')}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + '_pkey_partitioned')} "
+            f"PRIMARY KEY (id, created_at)"
+        )
+        # Recreate the indexes and foreign keys on the parent under their
+        # Django names (the definitions were read before the rename, so they
+        # name the parent). The old table's copies are renamed out of the way
+        # and get attached to them by ATTACH PARTITION.
+        for name, definition in indexes:
+            legacy_name = f"{name[:55]}_legacy"
+            cursor.execute(f"ALTER INDEX {quote(name)} RENAME TO {quote(legacy_name)}")
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}"
+            )
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(LEGACY_PARTITION)} "
+            f"FOR VALUES FROM (MINVALUE) TO (%s)",
+            [boundary],
+        )
+    logger.info(
+        f"{TABLE} partitioned by month; existing rows kept in {LEGACY_PARTITION}"
+    )
+    return boundary
+
+
+def ensure_partitions(ahead=None, today=None):
+    """
+    Create the monthly partitions from the end of the newest one up to
+    ``ahead`` months past the current month. Returns the names created.
+    """
+    ahead = settings.NOTIFICATIONS_PARTITIONS_AHEAD if ahead is None else ahead
+    today = today or date.today()
+    partitions = list_partitions()
+    newest = max((upper for _, upper in partitions if upper), default=None)
+    month = newest.date() if newest else _month_start(today)
+    last = _month_start(today, ahead)
+    quote = connection.ops.quote_name
+
+    created = []
+    with connection.cursor() as cursor:
+        while month <= last:
+            name = partition_name(month)
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(TABLE)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [month, _month_start(month, 1)],
+            )
+            created.append(name)
+            month = _month_start(month, 1)
+    return created
+
+
+def expire_partitions(retention_months=None, drop=None, today=None):
+    """
+    Detach the partitions whose rows are all older than the retention window
+    (NOTIFICATIONS_RETENTION_MONTHS, 0 keeps everything) and drop them if
+    ``drop``. Detached tables stay in the database for archiving; they still
+    reference their NotificationContent rows. Returns the names expired.
+    """
+    retention_months = (
+        settings.NOTIFICATIONS_RETENTION_MONTHS
+        if retention_months is None
+        else retention_months
+    )
+    drop = settings.NOTIFICATIONS_RETENTION_DROP if drop is None else drop
+    if not retention_months:
+        return []
+    cutoff = _month_start(today or date.today(), -retention_months)
+    quote = connection.ops.quote_name
+
+    expired = []
+    with connection.cursor() as cursor:
+        for name, upper in list_partitions():
+            if upper is None or upper.date() > cutoff:
+                continue
+            cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+            expired.append(name)
+    return expired
+
+
+def maintain_partitions():
+    """Create upcoming partitions and expire old ones. Returns both lists."""
+    if not is_partitioned():
+        raise PartitioningError(
+            f"{TABLE} is not partitioned yet; run manage.py partition_notifications --convert"
+        )
+    return ensure_partitions(), expire_partitions()
@@ -0,0 +1,95 @@
+"""
+Live broadcast progress for WebSocket subscribers.
+
+Senders publish a snapshot of a broadcast's Redis delivery counters (see
+counters.py) to its channel-layer group whenever they record results, at
+most once per NOTIFICATIONS_PROGRESS_INTERVAL seconds per broadcast: the
+first publisher after the interval claims the slot in Redis and the others
+skip. flush_broadcast_counters publishes unthrottled, which covers quiet
+periods and the final state. Subscribers (consumers.BroadcastProgressConsumer)
+only ever read these pushes, never the database.
+"""
+
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from . import counters
+from .choices import BroadcastStatus
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Keep the last sample (for the rate) as long as the counters
+SAMPLE_TTL = counters.COUNTER_TTL
+
+
+def group_name(broadcast_id):
+    return f"broadcast_progress_{broadcast_id}"
+
+
+def _throttle_key(broadcast_id):
+    return f"notifications:broadcast:{broadcast_id}:progress_slot"
+
+
+def _sample_key(broadcast_id):
+    return f"notifications:broadcast:{broadcast_id}:progress_sample"
+
+
+def message(broadcast_id, status, sent, failed, total, rate=0.0):
+    """The progress snapshot pushed to subscribers."""
+    done = sent + failed
+    return {
+        "broadcast": str(broadcast_id),
+        "status": status,
+        "total": total,
+        "sent": sent,
+        "failed": failed,
+        "percent": round(100 * done / total, 1) if total else None,
+        "rate": round(rate, 1),
+        "at": time.time(),
+    }
+
+
+def snapshot(broadcast_id, status=BroadcastStatus.SENDING, record=True):
+    """
+    Current progress of a broadcast from its Redis counters. ``rate`` is in
+    deliveries per second since the previous recorded snapshot.
+    """
+    sent, failed, total = counters.read(broadcast_id)
+    done = sent + failed
+    now = time.time()
+    redis = get_redis()
+    previous = redis.hgetall(_sample_key(broadcast_id))
+    if record:
+        pipe = redis.pipeline(transaction=False)
+        pipe.hset(_sample_key(broadcast_id), mapping={"done": done, "at": now})
+        pipe.expire(_sample_key(broadcast_id), SAMPLE_TTL)
+        pipe.execute()
+
+    rate = 0.0
+    if previous:
+        elapsed = now - float(previous[b"at"])
+        if elapsed > 0:
+            rate = max(done - int(previous[b"done"]), 0) / elapsed
+    return message(broadcast_id, status, sent, failed, total, rate)
+
+
+def publish(broadcast_id, status=BroadcastStatus.SENDING, throttle=True):
+    """Push a progress snapshot to the broadcast's subscribers."""
+    interval = int(settings.NOTIFICATIONS_PROGRESS_INTERVAL * 1000)
+    try:
+        if throttle and not get_redis().set(
+            _throttle_key(broadcast_id), 1, nx=True, px=interval
+        ):
+            return
+        async_to_sync(get_channel_layer().group_send)(
+            group_name(broadcast_id),
+            {"type": "broadcast.progress", "progress": snapshot(broadcast_id, status)},
+        )
+    except Exception as e:
+        # Progress is informational; never fail a delivery over it
+        logger.warning(f"Could not publish progress of broadcast {broadcast_id}: {e}")
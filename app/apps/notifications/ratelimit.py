@@ -0,0 +1,280 @@
+"""
+Token-bucket rate limiting for delivery providers and broadcast pacing.
+
+Buckets refill at ``rate`` tokens per second up to ``burst`` tokens. Taking a
+token never fails: when the bucket is empty the token is reserved ahead of
+time and the caller sleeps until it is due. Concurrent workers therefore
+queue up behind each other instead of piling into the provider's throttling.
+
+``RedisTokenBucket`` shares a bucket across every worker through atomic Lua
+scripts; ``LocalTokenBucket`` is the in-process equivalent, used for tests,
+benchmarks and ``NOTIFICATIONS_RATE_LIMIT_BACKEND = "local"``.
+
+A provider's rate is split between the transactional lane and the others
+(NOTIFICATIONS_BULK_RATE_SHARE). The split is a reservation, not a ceiling:
+each lane first takes tokens left idle in the other lane's bucket (see
+``BorrowingBucket``), so a lane alone gets the whole rate.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .choices import NotificationPriority
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Returns the seconds the caller must wait for its tokens (as a string, since
+# Lua numbers are truncated to integers in replies).
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local count = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate) - count
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+# Takes the tokens only if at least ARGV[4] are left afterwards; returns 1
+# if it did. Never reserves ahead.
+_TAKE_NOW_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local count = tonumber(ARGV[3])
+local keep = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate) - count
+if tokens < keep then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+return 1
+"""
+
+
+class LocalTokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, count=1):
+        """Take ``count`` tokens; return the seconds until they are available."""
+        with self._lock:
+            self._refill()
+            self._tokens -= count
+            return max(0.0, -self._tokens / self.rate)
+
+    def take_now(self, count=1, keep=0):
+        """
+        Take ``count`` tokens only if they are available now and at least
+        ``keep`` are left afterwards. Returns whether it took them.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens - count < keep:
+                return False
+            self._tokens -= count
+            return True
+
+    def acquire(self, count=1):
+        """Take ``count`` tokens, sleeping until they are available."""
+        wait = self.reserve(count)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class RedisTokenBucket(LocalTokenBucket):
+    _scripts = {}
+
+    def __init__(self, key, rate, burst=None):
+        super().__init__(rate, burst)
+        self.key = f"notifications:ratelimit:{key}"
+
+    @classmethod
+    def _get_script(cls, source=_TAKE_SCRIPT):
+        if source not in cls._scripts:
+            cls._scripts[source] = get_redis().register_script(source)
+        return cls._scripts[source]
+
+    def reserve(self, count=1):
+        try:
+            wait = self._get_script()(
+                keys=[self.key], args=[self.rate, self.burst, count]
+            )
+        except RedisError as e:
+            # Degrade to unthrottled sending rather than failing deliveries
+            logger.warning(f"Rate limiter unavailable for {self.key}: {e}")
+            return 0.0
+        return float(wait)
+
+    def take_now(self, count=1, keep=0):
+        try:
+            taken = self._get_script(_TAKE_NOW_SCRIPT)(
+                keys=[self.key], args=[self.rate, self.burst, count, keep]
+            )
+        except RedisError as e:
+            logger.warning(f"Rate limiter unavailable for {self.key}: {e}")
+            return False
+        return bool(int(taken))
+
+
+class BorrowingBucket:
+    """
+    A lane's own bucket that also takes tokens left idle in another lane's.
+    ``reserve`` takes an available token of its own first, then one of the
+    ``lender`` that leaves it at least ``lender_keep`` tokens, and only then
+    queues on its own bucket. Both buckets together never exceed their
+    combined rate.
+    """
+
+    def __init__(self, own, lender, lender_keep=0):
+        self.own = own
+        self.lender = lender
+        self.lender_keep = lender_keep
+
+    def reserve(self, count=1):
+        if self.own.take_now(count) or self.lender.take_now(
+            count, keep=self.lender_keep
+        ):
+            return 0.0
+        return self.own.reserve(count)
+
+    def acquire(self, count=1):
+        """Take ``count`` tokens, sleeping until they are available."""
+        wait = self.reserve(count)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+
+def get_bucket(key, rate, burst=None):
+    """
+    Return the bucket for ``key``, or None when ``rate`` is unset (unlimited).
+    Backed by Redis or by this process according to
+    NOTIFICATIONS_RATE_LIMIT_BACKEND.
+    """
+    if not rate:
+        return None
+    if settings.NOTIFICATIONS_RATE_LIMIT_BACKEND == "redis":
+        return RedisTokenBucket(key, rate, burst)
+    with _local_lock:
+        bucket = _local_buckets.get((key, rate, burst))
+        if bucket is None:
+            bucket = _local_buckets[(key, rate, burst)] = LocalTokenBucket(rate, burst)
+        return bucket
+
+
+def _lane(priority):
+    if priority == NotificationPriority.TRANSACTIONAL:
+        return NotificationPriority.TRANSACTIONAL
+    return NotificationPriority.BULK
+
+
+def provider_rate(backend, priority):
+    """
+    ``(bucket key, messages per second)`` reserved for ``priority`` out of
+    ``backend``'s rate limit: its lane's share. Transactional sends get their
+    own share so bulk reservations can't queue them up. The rate is None
+    when unlimited.
+    """
+    key, rate = backend.rate_limit()
+    if not rate:
+        return key, None
+    share = settings.NOTIFICATIONS_BULK_RATE_SHARE
+    if _lane(priority) == NotificationPriority.TRANSACTIONAL:
+        share = 1 - share
+    # Rounded so e.g. 1 - 0.8 doesn't leave a burst just short of a token
+    return f"{key}:{_lane(priority)}", round(rate * share, 6)
+
+
+def provider_bucket(backend, priority):
+    """
+    The provider bucket for ``priority``: its lane's reserved share (see
+    ``provider_rate``), borrowing what the other lane leaves idle.
+    Transactional sends borrow any free bulk token. Bulk sends only borrow
+    from a full transactional bucket, i.e. when no transactional traffic has
+    needed it for a while, so they never eat into its reservation.
+    """
+    other = (
+        NotificationPriority.BULK
+        if _lane(priority) == NotificationPriority.TRANSACTIONAL
+        else NotificationPriority.TRANSACTIONAL
+    )
+    own = get_bucket(*provider_rate(backend, priority))
+    lender = get_bucket(*provider_rate(backend, other))
+    if own is None or lender is None:
+        return own or lender
+    keep = 0
+    if other == NotificationPriority.TRANSACTIONAL:
+        keep = lender.burst - 1
+    return BorrowingBucket(own, lender, lender_keep=keep)
+
+
+class DeliveryThrottle:
+    """
+    Before-send hook for a batch of notifications (all of one priority):
+    ``throttle(i)`` waits for a token of the broadcast of ``notifications[i]``
+    (if it is paced) and then for one of the delivery provider.
+    """
+
+    def __init__(self, backend, notifications):
+        from .models import Broadcast
+
+        self.notifications = notifications
+        self.provider = provider_bucket(backend, notifications[0].priority)
+        broadcast_ids = {n.broadcast_id for n in notifications if n.broadcast_id}
+        rates = (
+            Broadcast.objects.filter(
+                id__in=broadcast_ids, send_rate__isnull=False
+            ).values_list("id", "send_rate")
+            if broadcast_ids
+            else []
+        )
+        self.broadcasts = {
+            broadcast_id: get_bucket(f"broadcast:{broadcast_id}", rate)
+            for broadcast_id, rate in rates
+        }
+
+    def __bool__(self):
+        # Nothing to wait for: senders can skip calling it
+        return bool(self.broadcasts) or self.provider is not None
+
+    def __call__(self, index):
+        waited = 0.0
+        pacing = self.broadcasts.get(self.notifications[index].broadcast_id)
+        if pacing:
+            waited += pacing.acquire()
+        if self.provider:
+            waited += self.provider.acquire()
+        return waited
@@ -0,0 +1,17 @@
+"""
+Shared Redis connection for notification bookkeeping (counters, rate limits,
+inbox state). redis-py resets its connection pool after a fork, so one
+client per process is safe under Celery's prefork pool.
+"""
+
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.NOTIFICATIONS_REDIS_URL)
+    return _client
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from .consumers import BroadcastProgressConsumer, NotificationConsumer
+
+websocket_urlpatterns = [
+    path("ws/notifications/", NotificationConsumer.as_asgi()),
+    path(
+        "ws/notifications/broadcasts/<uuid:broadcast_id>/progress/",
+        BroadcastProgressConsumer.as_asgi(),
+    ),
+]
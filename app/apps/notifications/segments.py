@@ -0,0 +1,316 @@
+"""
+Materialised recipient segments.
+
+A Segment's members are kept as a bitmap of user pkids (see bitmaps.py) in
+its row, so targeting one costs reading a blob rather than running a user
+query, and derived segments are big-int operations on their operands.
+
+- Base segments select users with a filter of plain comparisons on indexed
+  columns of User, its profile and its notification settings
+  (``compile_filter`` rejects anything else), so building one never scans
+  the users table.
+- Saving or deleting one of those rows marks its user dirty in Redis (see
+  signals.py), and ``refresh`` re-evaluates only the dirty users against
+  each base filter, then recomputes the derived segments.
+- Segments created or edited since the last refresh (``refreshed_at`` is
+  empty) are built from scratch. Bulk changes that bypass model signals
+  (``QuerySet.update``, ``bulk_create``, raw SQL) need a rebuild.
+"""
+
+import logging
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from . import bitmaps
+from .models import Segment
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_DIRTY = "notifications:segments:dirty"  # user pkids to re-evaluate
+
+# Lookups an index can serve; transforms (``__year``, ``__lower``...) can't
+INDEXED_LOOKUPS = {"exact", "in", "gt", "gte", "lt", "lte", "range", "isnull"}
+# Relations whose changes mark their user dirty (see signals.py)
+TRACKED_RELATIONS = {"profile", "notification_settings"}
+
+OPERATORS = {
+    "union": bitmaps.union,
+    "intersection": bitmaps.intersection,
+    "difference": bitmaps.difference,
+}
+
+
+class SegmentDefinitionError(ValueError):
+    """A segment filter or expression that can't be materialised."""
+
+
+def _is_indexed(field):
+    if field.many_to_many:
+        return False
+    if not field.concrete:
+        # Reverse relation: joined on the other side's key
+        return _is_indexed(field.remote_field)
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    meta = field.model._meta
+    leading = {index.fields[0].lstrip("-") for index in meta.indexes if index.fields}
+    leading.update(
+        constraint.fields[0]
+        for constraint in meta.constraints
+        if getattr(constraint, "fields", None)
+    )
+    leading.update(fields[0] for fields in meta.unique_together)
+    return field.name in leading
+
+
+def _check_lookup(key):
+    model = get_user_model()
+    parts = key.split(LOOKUP_SEP)
+    for position, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            raise SegmentDefinitionError(f"{key}: unknown field {part!r}.")
+        rest = parts[position + 1 :]
+        # Other related rows don't mark their users dirty when they change
+        joins_rows = field.many_to_many or field.one_to_many or not field.concrete
+        if joins_rows and not (model is get_user_model() and part in TRACKED_RELATIONS):
+            raise SegmentDefinitionError(
+                f"{key}: segments can only follow "
+                f"{', '.join(sorted(TRACKED_RELATIONS))}."
+            )
+        if field.is_relation and rest and rest[0] not in INDEXED_LOOKUPS:
+            model = field.related_model
+            continue
+        if len(rest) > 1 or (rest and rest[0] not in INDEXED_LOOKUPS):
+            raise SegmentDefinitionError(
+                f"{key}: only {', '.join(sorted(INDEXED_LOOKUPS))} lookups "
+                f"are allowed."
+            )
+        if not _is_indexed(field):
+            raise SegmentDefinitionError(
+                f"{key}: {model.__name__}.{field.name} is not indexed."
+            )
+        return
+
+
+def compile_filter(filters):
+    """
+    Validate a base segment filter (User lookups) and return it as a Q.
+    An empty filter selects every user.
+    """
+    if not isinstance(filters, dict):
+        raise SegmentDefinitionError("Must be a JSON object.")
+    for key in filters:
+        _check_lookup(key)
+    query = Q(**filters)
+    # Compiling checks the values without running the query
+    try:
+        get_user_model().objects.filter(query).query.sql_with_params()
+    except Exception as e:
+        raise SegmentDefinitionError(f"Invalid filter: {e}") from e
+    return query
+
+
+def _operands(expression):
+    """Validate ``expression``'s shape; return ``(operator, operands)``."""
+    if not isinstance(expression, dict) or len(expression) != 1:
+        raise SegmentDefinitionError(
+            f"Must be an object with one key out of {', '.join(OPERATORS)}."
+        )
+    [(operator, operands)] = expression.items()
+    if operator not in OPERATORS:
+        raise SegmentDefinitionError(f"Unknown operator {operator!r}.")
+    if not isinstance(operands, list) or not operands:
+        raise SegmentDefinitionError(f"{operator}: must be a non-empty list.")
+    return operator, operands
+
+
+def _normalise(expression, references):
+    operator, operands = _operands(expression)
+    normalised = []
+    for operand in operands:
+        if isinstance(operand, dict):
+            normalised.append(_normalise(operand, references))
+            continue
+        try:
+            operand = str(uuid.UUID(str(operand)))
+        except ValueError:
+            raise SegmentDefinitionError(f"{operand!r} is not a segment id.")
+        references.add(operand)
+        normalised.append(operand)
+    return {operator: normalised}
+
+
+def references(expression):
+    """Ids of the segments ``expression`` refers to, directly or nested."""
+    found = set()
+    _normalise(expression, found)
+    return found
+
+
+def check_expression(expression, segment_id=None):
+    """
+    Validate a derived segment expression for the segment ``segment_id`` (None
+    for a new one): operands must exist and must not depend on the segment
+    itself. Returns the expression with normalised segment ids.
+    """
+    found = set()
+    expression = _normalise(expression, found)
+    existing = Segment.objects.filter(id__in=found).values_list("id", flat=True)
+    missing = found - {str(key) for key in existing}
+    if missing:
+        raise SegmentDefinitionError(f"Unknown segments: {', '.join(sorted(missing))}.")
+    if segment_id is not None:
+        graph = {
+            str(key): references(value)
+            for key, value in Segment.objects.filter(expression__isnull=False)
+            .exclude(id=segment_id)
+            .values_list("id", "expression")
+        }
+        seen, pending = set(), set(found)
+        while pending:
+            current = pending.pop()
+            if current == str(segment_id):
+                raise SegmentDefinitionError("A segment can't include itself.")
+            seen.add(current)
+            pending |= graph.get(current, set()) - seen
+    return expression
+
+
+def dependents(segment_id):
+    """Names of the derived segments that refer to ``segment_id`` directly."""
+    return [
+        name
+        for name, expression in Segment.objects.filter(
+            expression__isnull=False
+        ).values_list("name", "expression")
+        if str(segment_id) in references(expression)
+    ]
+
+
+def _add_dirty(user_pkid):
+    try:
+        get_redis().sadd(_DIRTY, user_pkid)
+    except RedisError as e:
+        # The user's segments stay stale until they change again or a rebuild
+        logger.warning(f"Could not mark user {user_pkid} for segment refresh: {e}")
+
+
+def mark_dirty(user_pkid):
+    """Queue a user for re-evaluation once the current transaction commits."""
+    transaction.on_commit(partial(_add_dirty, user_pkid))
+
+
+def _matching(segment, pkids=None):
+    """Bitmap of the users matching a base segment, among ``pkids`` if given."""
+    users = get_user_model().objects.filter(compile_filter(segment.filter))
+    if pkids is not None:
+        users = users.filter(pkid__in=pkids)
+    return bitmaps.from_pkids(
+        users.order_by().values_list("pkid", flat=True).iterator(chunk_size=10000)
+    )
+
+
+def _evaluate(expression, resolve):
+    operator, operands = _operands(expression)
+    return OPERATORS[operator](
+        *(
+            _evaluate(operand, resolve)
+            if isinstance(operand, dict)
+            else resolve(operand)
+            for operand in operands
+        )
+    )
+
+
+def _apply(pkids):
+    """Apply one batch of dirty users; return the number of segments changed."""
+    with transaction.atomic():
+        if not pkids and not Segment.objects.filter(refreshed_at__isnull=True).exists():
+            return 0
+        segments = {
+            str(segment.id): segment
+            for segment in Segment.objects.select_for_update().order_by("id")
+        }
+        dirty = bitmaps.from_pkids(pkids)
+        members, failed = {}, set()
+        for key, segment in segments.items():
+            if segment.is_derived:
+                continue
+            try:
+                if segment.refreshed_at is None:
+                    members[key] = _matching(segment)
+                elif pkids:
+                    members[key] = segment.members & ~dirty | _matching(segment, pkids)
+                else:
+                    members[key] = segment.members
+            except SegmentDefinitionError as e:
+                # E.g. an index it relied on was dropped; keep it as it was
+                logger.error(f"Segment {segment.name} can't be refreshed: {e}")
+                members[key] = segment.members
+                failed.add(key)
+
+        resolving = set()
+
+        def resolve(key):
+            if key not in members:
+                if key in resolving:
+                    raise SegmentDefinitionError(f"Segment {key} includes itself.")
+                if key not in segments:
+                    raise SegmentDefinitionError(f"Segment {key} does not exist.")
+                resolving.add(key)
+                members[key] = _evaluate(segments[key].expression, resolve)
+                resolving.discard(key)
+            return members[key]
+
+        changed = []
+        now = timezone.now()
+        for key, segment in segments.items():
+            if key in failed:
+                continue
+            try:
+                bitmap = resolve(key)
+            except SegmentDefinitionError as e:
+                logger.error(f"Segment {segment.name} can't be refreshed: {e}")
+                resolving.clear()
+                continue
+            if segment.refreshed_at is None or bitmap != segment.members:
+                segment.set_members(bitmap)
+                segment.refreshed_at = now
+                changed.append(segment)
+        Segment.objects.bulk_update(changed, ["bitmap", "size", "refreshed_at"])
+        return len(changed)
+
+
+def refresh():
+    """
+    Apply the dirty users to every segment, NOTIFICATIONS_SEGMENT_REFRESH_BATCH
+    users per transaction, and build segments that have never been built.
+    Returns ``(users applied, segments changed)``.
+    """
+    batch = settings.NOTIFICATIONS_SEGMENT_REFRESH_BATCH
+    redis = get_redis()
+    applied = changed = 0
+    while True:
+        pkids = [int(pkid) for pkid in redis.spop(_DIRTY, batch) or []]
+        try:
+            changed += _apply(pkids)
+        except Exception:
+            # Put them back for the next run
+            if pkids:
+                redis.sadd(_DIRTY, *pkids)
+            raise
+        applied += len(pkids)
+        if len(pkids) < batch:
+            return applied, changed
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
+from . import segments
 from .models import (
     NotificationTemplate,
     Broadcast,
+    Segment,
     Notification,
     UserNotificationSetting,
     EmailConfiguration,
@@ -24,11 +26,18 @@ class NotificationTemplateSerializer(serializers.ModelSerializer):
             "template",
             "html_template",
             "is_active",
+            "digest_window",
+            "digest_template",
             "created_at",
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
 
+    def validate_digest_template(self, value):
+        if value and self.instance and value.pk == self.instance.pk:
+            raise serializers.ValidationError("A template can't be its own digest.")
+        return value
+
 
 class BroadcastSerializer(serializers.ModelSerializer):
     template_name = serializers.CharField(source="template.name", read_only=True)
@@ -42,7 +51,9 @@ class BroadcastSerializer(serializers.ModelSerializer):
             "template_name",
             "channel",
             "recipient_filter",
+            "segment",
             "scheduled_at",
+            "send_rate",
             "status",
             "total_recipients",
             "sent_count",
@@ -66,13 +77,62 @@ class BroadcastSerializer(serializers.ModelSerializer):
         """Ensure the filter is a valid Django ORM filter dict."""
         if not isinstance(value, dict):
             raise serializers.ValidationError("Must be a JSON object.")
-        # Optionally, test the filter against User model
+        # Building and compiling the query checks lookups and values without
+        # running it
         try:
-            User.objects.filter(**value)[:1]
+            User.objects.filter(**value).query.sql_with_params()
         except Exception as e:
             raise serializers.ValidationError(f"Invalid filter: {e}")
         return value
 
+    def validate(self, attrs):
+        segment = attrs.get("segment", getattr(self.instance, "segment", None))
+        recipient_filter = attrs.get(
+            "recipient_filter", getattr(self.instance, "recipient_filter", None)
+        )
+        if segment and recipient_filter:
+            raise serializers.ValidationError(
+                "Target either a segment or a recipient filter, not both."
+            )
+        return attrs
+
+
+class SegmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Segment
+        fields = [
+            "id",
+            "name",
+            "description",
+            "filter",
+            "expression",
+            "size",
+            "refreshed_at",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["id", "size", "refreshed_at", "created_at", "updated_at"]
+
+    def validate(self, attrs):
+        """Exactly one of filter and expression, and one that can be built."""
+        filters = attrs.get("filter", getattr(self.instance, "filter", None))
+        expression = attrs.get("expression", getattr(self.instance, "expression", None))
+        if (filters is None) == (expression is None):
+            raise serializers.ValidationError(
+                "Define the segment by either a filter or an expression."
+            )
+        try:
+            if filters is not None:
+                segments.compile_filter(filters)
+            else:
+                attrs["expression"] = segments.check_expression(
+                    expression, self.instance and self.instance.id
+                )
+        except segments.SegmentDefinitionError as e:
+            field = "filter" if filters is not None else "expression"
+            raise serializers.ValidationError({field: str(e)})
+        return attrs
+
 
 class NotificationSerializer(serializers.ModelSerializer):
     user_email = serializers.EmailField(source="user.email", read_only=True)
@@ -88,11 +148,13 @@ class NotificationSerializer(serializers.ModelSerializer):
             "channel",
             "subject",
             "body",
+            "html_body",
             "status",
             "broadcast",
             "template",
             "error_message",
             "sent_at",
+            "read_at",
             "created_at",
         ]
         read_only_fields = [
@@ -100,10 +162,17 @@ class NotificationSerializer(serializers.ModelSerializer):
             "status",
             "error_message",
             "sent_at",
+            "read_at",
             "created_at",
         ]
 
 
+class InboxMarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, max_length=500
+    )
+
+
 class UserNotificationSettingSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserNotificationSetting
@@ -111,6 +180,7 @@ class UserNotificationSettingSerializer(serializers.ModelSerializer):
             "id",
             "email_enabled",
             "sms_enabled",
+            "in_app_enabled",
             "receive_marketing_emails",
             "receive_security_emails",
             "updated_at",
@@ -133,6 +203,7 @@ class EmailConfigurationSerializer(serializers.ModelSerializer):
             "from_email",
             "reply_to",
             "timeout",
+            "max_send_rate",
             "is_active",
             "created_at",
             "updated_at",
@@ -1,12 +1,55 @@
-from django.db.models.signals import post_save
+from functools import partial
+
+from celery.signals import worker_process_shutdown
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
 
-from .models import UserNotificationSetting
+from . import segments
+from .aio import runner
+from .connections import registry
+from .models import EmailConfiguration, NotificationTemplate, UserNotificationSetting
+from .templating import template_cache
 
 User = settings.AUTH_USER_MODEL
 
 
+@receiver(post_save, sender=EmailConfiguration)
+@receiver(post_delete, sender=EmailConfiguration)
+def invalidate_email_configuration(sender, instance, **kwargs):
+    # After commit: a process reloading on the new generation any earlier
+    # would still read the old row and keep it
+    transaction.on_commit(registry.invalidate)
+
+
+@receiver(post_save, sender=NotificationTemplate)
+@receiver(post_delete, sender=NotificationTemplate)
+def invalidate_notification_template(sender, instance, **kwargs):
+    # After commit, for the same reason as the email configuration
+    transaction.on_commit(partial(template_cache.invalidate, instance))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def refresh_user_segments(sender, instance, **kwargs):
+    segments.mark_dirty(instance.pkid)
+
+
+@receiver(post_save, sender="users.Profile")
+@receiver(post_delete, sender="users.Profile")
+@receiver(post_save, sender=UserNotificationSetting)
+@receiver(post_delete, sender=UserNotificationSetting)
+def refresh_related_user_segments(sender, instance, **kwargs):
+    segments.mark_dirty(instance.user_id)
+
+
+@worker_process_shutdown.connect
+def close_provider_connections(**kwargs):
+    registry.close()
+    runner.close()
+
+
 # @receiver(post_save, sender=User)
 # def create_user_notification_settings(sender, instance, created, **kwargs):
 #     if created:
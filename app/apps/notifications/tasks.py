@@ -1,122 +1,776 @@
 import logging
-from celery import shared_task
+import random
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import partial
+
+from celery import group, shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
 from django.utils import timezone
 
-from .models import Notification, Broadcast, BroadcastStatus, NotificationStatus
+from . import (
+    archive,
+    counters,
+    digests,
+    inbox,
+    lanes,
+    partitioning,
+    progress,
+    segments,
+)
+from .backends import is_permanent_failure
+from .ratelimit import DeliveryThrottle
+from .models import (
+    Notification,
+    NotificationContent,
+    Broadcast,
+    BroadcastPartition,
+    BroadcastRecipient,
+    BroadcastStatus,
+    NotificationStatus,
+)
 from .utils import (
+    build_notification,
+    common_context,
     get_email_backend,
+    get_in_app_backend,
     get_sms_backend,
-    render_template,
-    send_notification,
+    render_notification,
+    save_notifications,
 )
-from .choices import NotificationChannel
-from django.contrib.auth import get_user_model
+from .choices import BroadcastPartitionStatus, NotificationChannel, NotificationPriority
+from .recipients import resolve_recipients, snapshot_recipients
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, max_retries=3)
-def send_notification_task(self, notification_id):
+class DeliveryLeaseExpired(Exception):
+    """A sender claimed the notification and never reported back."""
+
+
+def claim_pending_notifications(channel, notification_ids=None, limit=None):
+    """
+    Claim due pending notifications for ``channel`` by moving them to SENDING
+    under a lease of NOTIFICATIONS_SEND_LEASE seconds. Rows locked by another
+    claimer are skipped, so concurrent senders never pick up the same
+    notification twice.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.NOTIFICATIONS_SEND_LEASE)
+    with transaction.atomic():
+        qs = (
+            Notification.objects.select_related("content")
+            .select_for_update(skip_locked=True, of=("self",))
+            .filter(
+                channel=channel,
+                status=NotificationStatus.PENDING,
+                next_attempt_at__lte=now,
+            )
+        )
+        if notification_ids is not None:
+            qs = qs.filter(id__in=notification_ids)
+        qs = qs.order_by("next_attempt_at")
+        if limit:
+            qs = qs[:limit]
+        claimed = list(qs)
+        if claimed:
+            Notification.objects.filter(id__in=[n.id for n in claimed]).update(
+                status=NotificationStatus.SENDING,
+                attempts=F("attempts") + 1,
+                next_attempt_at=lease,
+            )
+    for notification in claimed:
+        notification.status = NotificationStatus.SENDING
+        notification.attempts += 1
+        notification.next_attempt_at = lease
+    return claimed
+
+
+def _retry_at(notification, error, now):
+    """When to retry a failed delivery, or None if it has failed for good."""
+    if is_permanent_failure(error):
+        return None
+    if notification.attempts >= settings.NOTIFICATIONS_MAX_ATTEMPTS:
+        return None
+    backoff = settings.NOTIFICATIONS_RETRY_BACKOFF * 2 ** (notification.attempts - 1)
+    # Jitter, so a batch that failed together doesn't retry in lockstep
+    return now + timedelta(seconds=backoff * random.uniform(0.8, 1.2))
+
+
+def record_delivery_results(notifications, errors):
+    """
+    Write the outcome of a batch of claimed notifications back in bulk.
+    ``errors`` holds one entry per notification: None on success, the
+    exception on failure. Failures go back to PENDING with a backoff until
+    NOTIFICATIONS_MAX_ATTEMPTS is used up or the error is permanent, then
+    to FAILED. sweep_outbox re-publishes them once they are due. Sent ones
+    are added to their users' inboxes.
+    """
+    now = timezone.now()
+    per_broadcast = Counter()
+    for notification, error in zip(notifications, errors):
+        if error is None:
+            notification.status = NotificationStatus.SENT
+            notification.sent_at = now
+        else:
+            notification.error_message = str(error)
+            retry_at = _retry_at(notification, error, now)
+            if retry_at:
+                notification.status = NotificationStatus.PENDING
+                notification.next_attempt_at = retry_at
+                logger.info(
+                    f"Notification {notification.id} attempt {notification.attempts} "
+                    f"failed, retrying at {retry_at:%H:%M:%S}: {error}"
+                )
+                continue
+            notification.status = NotificationStatus.FAILED
+        if notification.broadcast_id:
+            per_broadcast[(notification.broadcast_id, notification.status)] += 1
+
+    Notification.objects.bulk_update(
+        notifications,
+        ["status", "sent_at", "error_message", "next_attempt_at"],
+        batch_size=500,
+    )
+    sent = [n for n in notifications if n.status == NotificationStatus.SENT]
+    if sent:
+        transaction.on_commit(partial(inbox.deliver, sent))
+    if per_broadcast:
+        # A rolled back caller must not count its outcomes
+        transaction.on_commit(partial(_record_broadcast_outcomes, per_broadcast))
+
+
+def _record_broadcast_outcomes(per_broadcast):
+    for (broadcast_id, status), count in per_broadcast.items():
+        if status == NotificationStatus.SENT:
+            counters.record(broadcast_id, sent=count)
+        else:
+            counters.record(broadcast_id, failed=count)
+    for broadcast_id in {broadcast_id for broadcast_id, _ in per_broadcast}:
+        progress.publish(broadcast_id)
+
+
+def email_message(notification):
+    """``send()``/``send_many()`` kwargs for an email notification."""
+    return {
+        "recipient": notification.recipient,
+        "subject": notification.subject,
+        "body": notification.body,
+        "html_body": notification.html_body,
+    }
+
+
+@shared_task
+def send_email_batch(notification_ids=None, limit=None, lane_credit=False):
+    """
+    Claim up to ``limit`` pending email notifications (optionally restricted to
+    ``notification_ids``) and send them all over one SMTP connection.
+    ``lane_credit`` marks batches handed out by dispatch_bulk_batches.
+    """
     try:
-        notification = Notification.objects.get(id=notification_id)
-    except Notification.DoesNotExist:
+        limit = limit or settings.NOTIFICATIONS_EMAIL_BATCH_SIZE
+        notifications = claim_pending_notifications(
+            NotificationChannel.EMAIL, notification_ids=notification_ids, limit=limit
+        )
+        if not notifications:
+            return 0
+
+        backend = get_email_backend()
+        errors = backend.send_many(
+            [email_message(n) for n in notifications],
+            throttle=DeliveryThrottle(backend, notifications),
+        )
+        record_delivery_results(notifications, errors)
+        return errors.count(None)
+    finally:
+        if lane_credit:
+            _release_bulk_credit()
+
+
+@shared_task
+def send_sms_batch(notification_ids=None, limit=None, lane_credit=False):
+    """
+    Claim up to ``limit`` pending SMS notifications (optionally restricted to
+    ``notification_ids``) and send them as one batch; the async Twilio
+    backend sends them concurrently.
+    """
+    try:
+        limit = limit or settings.NOTIFICATIONS_SMS_BATCH_SIZE
+        notifications = claim_pending_notifications(
+            NotificationChannel.SMS, notification_ids=notification_ids, limit=limit
+        )
+        if not notifications:
+            return 0
+
+        backend = get_sms_backend()
+        errors = backend.send_many(
+            [
+                {
+                    "phone_number": n.phone_number,
+                    "message": n.body,
+                }
+                for n in notifications
+            ],
+            throttle=DeliveryThrottle(backend, notifications),
+        )
+        record_delivery_results(notifications, errors)
+        return errors.count(None)
+    finally:
+        if lane_credit:
+            _release_bulk_credit()
+
+
+def in_app_message(notification):
+    """``send()``/``send_many()`` kwargs for an in-app notification."""
+    return {
+        "user_pkid": notification.user_id,
+        "notification": {
+            "id": str(notification.id),
+            "subject": notification.subject,
+            "body": notification.body,
+            "broadcast": str(notification.broadcast_id)
+            if notification.broadcast_id
+            else None,
+            "created_at": notification.created_at.isoformat(),
+        },
+    }
+
+
+@shared_task
+def send_in_app_batch(notification_ids=None, limit=None, lane_credit=False):
+    """
+    Claim up to ``limit`` pending in-app notifications (optionally restricted
+    to ``notification_ids``) and push them to their users' WebSocket
+    connections as one batch of channel-layer group sends.
+    """
+    try:
+        limit = limit or settings.NOTIFICATIONS_IN_APP_BATCH_SIZE
+        notifications = claim_pending_notifications(
+            NotificationChannel.IN_APP, notification_ids=notification_ids, limit=limit
+        )
+        if not notifications:
+            return 0
+
+        backend = get_in_app_backend()
+        errors = backend.send_many(
+            [in_app_message(n) for n in notifications],
+            throttle=DeliveryThrottle(backend, notifications),
+        )
+        record_delivery_results(notifications, errors)
+        return errors.count(None)
+    finally:
+        if lane_credit:
+            _release_bulk_credit()
+
+
+def _release_bulk_credit():
+    lanes.release_bulk_credit()
+    # A slot just freed up on the bulk lane; hand out the next batch now
+    dispatch_bulk_batches.delay()
+
+
+def _batch_task(channel):
+    if channel == NotificationChannel.EMAIL:
+        return send_email_batch
+    if channel == NotificationChannel.IN_APP:
+        return send_in_app_batch
+    return send_sms_batch
+
+
+def publish_notifications(channel, priority, notification_ids, broadcast_id=None):
+    """
+    Publish send batches for pending notifications on their priority lane.
+    Broadcast notifications wait for their broadcast's turn on the bulk lane.
+    """
+    if broadcast_id and priority == NotificationPriority.BULK:
+        lanes.enqueue_bulk_batches(broadcast_id, channel, notification_ids)
+        dispatch_bulk_batches.delay()
+        return
+    size = lanes.batch_size(channel)
+    ids = [str(i) for i in notification_ids]
+    for start in range(0, len(ids), size):
+        batch = ids[start : start + size]
+        _batch_task(channel).apply_async(
+            args=[batch], kwargs={"limit": len(batch)}, queue=lanes.queue_for(priority)
+        )
+
+
+@shared_task
+def dispatch_bulk_batches():
+    """
+    Publish bulk send batches round-robin across broadcasts, keeping at most
+    NOTIFICATIONS_BULK_MAX_IN_FLIGHT of them on the bulk queue.
+    """
+    batches = lanes.take_bulk_batches()
+    for channel, ids in batches:
+        _batch_task(channel).apply_async(
+            args=[ids],
+            kwargs={"limit": len(ids), "lane_credit": True},
+            queue=lanes.queue_for(NotificationPriority.BULK),
+        )
+    return len(batches)
+
+
+@shared_task
+def send_notification_task(notification_id):
+    """
+    Send a single notification. A failed delivery is rescheduled (or failed
+    for good) by record_delivery_results; sweep_outbox publishes the retry.
+    """
+    channel = (
+        Notification.objects.filter(id=notification_id)
+        .values_list("channel", flat=True)
+        .first()
+    )
+    if channel is None:
         logger.error(f"Notification {notification_id} not found")
         return
 
-    if notification.status != NotificationStatus.PENDING:
-        logger.warning(f"Notification {notification_id} already {notification.status}")
+    # Claim atomically so a concurrent batch sender can't send it as well
+    claimed = claim_pending_notifications(channel, notification_ids=[notification_id])
+    if not claimed:
+        logger.info(f"Notification {notification_id} not due or already claimed")
         return
+    [notification] = claimed
 
     try:
         if notification.channel == NotificationChannel.EMAIL:
             backend = get_email_backend()
-            backend.send(
-                recipient=notification.recipient,
-                subject=notification.subject,
-                body=notification.body,
-                html_body=None,  # you could store HTML separately
-            )
+            DeliveryThrottle(backend, [notification])(0)
+            backend.send(**email_message(notification))
         elif notification.channel == NotificationChannel.SMS:
             backend = get_sms_backend()
+            DeliveryThrottle(backend, [notification])(0)
             backend.send(
                 phone_number=notification.phone_number,
                 message=notification.body,
             )
+        elif notification.channel == NotificationChannel.IN_APP:
+            backend = get_in_app_backend()
+            DeliveryThrottle(backend, [notification])(0)
+            backend.send(**in_app_message(notification))
         else:
             raise ValueError(f"Unsupported channel: {notification.channel}")
+        error = None
+    except Exception as e:
+        logger.exception(f"Failed to send notification {notification_id}")
+        error = e
 
-        notification.status = NotificationStatus.SENT
-        notification.sent_at = timezone.now()
-        notification.save()
+    record_delivery_results([notification], [error])
 
-        # Update broadcast counters if part of a broadcast
-        if notification.broadcast:
-            broadcast = notification.broadcast
-            broadcast.sent_count += 1
-            broadcast.save()
 
-    except Exception as e:
-        logger.exception(f"Failed to send notification {notification_id}")
-        notification.status = NotificationStatus.FAILED
-        notification.error_message = str(e)
-        notification.save()
+@shared_task
+def dispatch_scheduled_broadcasts(limit=100):
+    """
+    Hand due SCHEDULED broadcasts to process_broadcast, oldest first. Runs
+    every NOTIFICATIONS_SCHEDULER_INTERVAL seconds, so schedules wait in the
+    database rather than as ETA messages held by workers. Rows are claimed
+    under skip-locked row locks, so overlapping sweeps never dispatch the
+    same broadcast twice. A broadcast still not started
+    NOTIFICATIONS_SCHEDULER_REDISPATCH_AFTER seconds after its dispatch
+    (e.g. its message was purged) is dispatched again.
+    """
+    now = timezone.now()
+    redispatch = now - timedelta(
+        seconds=settings.NOTIFICATIONS_SCHEDULER_REDISPATCH_AFTER
+    )
+    with transaction.atomic():
+        due = list(
+            Broadcast.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(scheduled_at__lte=now) | Q(scheduled_at__isnull=True),
+                Q(dispatched_at__isnull=True) | Q(dispatched_at__lt=redispatch),
+                status=BroadcastStatus.SCHEDULED,
+            )
+            .order_by("scheduled_at")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not due:
+            return 0
+        Broadcast.objects.filter(id__in=due).update(dispatched_at=now)
 
-        if notification.broadcast:
-            broadcast = notification.broadcast
-            broadcast.failed_count += 1
-            broadcast.save()
+        def dispatch():
+            for broadcast_id in due:
+                process_broadcast.delay(str(broadcast_id))
 
-        # Retry with exponential backoff
-        self.retry(exc=e, countdown=60 * (2**self.request.retries))
+        transaction.on_commit(dispatch)
+    logger.info(f"Dispatched {len(due)} scheduled broadcasts")
+    return len(due)
 
 
 @shared_task
 def process_broadcast(broadcast_id):
-    try:
-        broadcast = Broadcast.objects.get(id=broadcast_id)
-    except Broadcast.DoesNotExist:
-        logger.error(f"Broadcast {broadcast_id} not found")
-        return
+    """
+    Snapshot a scheduled broadcast's recipients, split the snapshot into
+    pkid-range partitions and fan them out to process_broadcast_partition.
+    A target segment that has never been built is built first.
+    """
+    if Broadcast.objects.filter(
+        id=broadcast_id, segment__isnull=False, segment__refreshed_at__isnull=True
+    ).exists():
+        # Its bitmap is still empty; snapshotting it would send to nobody
+        segments.refresh()
 
-    if broadcast.status != BroadcastStatus.SCHEDULED:
-        logger.warning(f"Broadcast {broadcast_id} not in SCHEDULED state")
-        return
+    with transaction.atomic():
+        # Claim atomically; a concurrent run sees SENDING and backs off. A
+        # crash before commit rolls the claim back together with the snapshot.
+        claimed = Broadcast.objects.filter(
+            id=broadcast_id, status=BroadcastStatus.SCHEDULED
+        ).update(status=BroadcastStatus.SENDING, updated_at=timezone.now())
+        if not claimed:
+            logger.warning(
+                f"Broadcast {broadcast_id} missing or not in SCHEDULED state"
+            )
+            return
+
+        broadcast = Broadcast.objects.select_related("segment").get(id=broadcast_id)
+        if broadcast.segment and broadcast.segment.refreshed_at is None:
+            error = f"Segment {broadcast.segment.name} could not be built"
+            Broadcast.objects.filter(id=broadcast_id).update(
+                status=BroadcastStatus.FAILED,
+                error_log=error,
+                completed_at=timezone.now(),
+            )
+            transaction.on_commit(
+                partial(
+                    progress.publish,
+                    broadcast_id,
+                    status=BroadcastStatus.FAILED,
+                    throttle=False,
+                )
+            )
+            logger.error(f"Broadcast {broadcast_id}: {error}")
+            return
+        total = snapshot_recipients(broadcast)
+        partitions = BroadcastPartition.objects.bulk_create(
+            BroadcastPartition(
+                broadcast=broadcast, index=index, start_pkid=start, end_pkid=end
+            )
+            for index, (start, end) in enumerate(_plan_partitions(broadcast))
+        )
+        Broadcast.objects.filter(id=broadcast_id).update(total_recipients=total)
+
+        def dispatch():
+            # From here on flush_broadcast_counters completes the broadcast
+            # once sent + failed reaches the total.
+            counters.set_total(broadcast_id, total)
+            if not total:
+                _complete_broadcast(broadcast_id, sent=0, failed=0)
+                return
+            group(process_broadcast_partition.s(p.id) for p in partitions).apply_async()
+
+        transaction.on_commit(dispatch)
 
-    broadcast.status = BroadcastStatus.SENDING
-    broadcast.save()
+    logger.info(
+        f"Broadcast {broadcast_id}: {total} recipients in {len(partitions)} partitions"
+    )
 
-    User = get_user_model()
-    filters = broadcast.recipient_filter
-    users = User.objects.filter(**filters)
-    broadcast.total_recipients = users.count()
-    broadcast.save()
 
+def _plan_partitions(broadcast):
+    """Yield ``(start_pkid, end_pkid)`` ranges of the snapshot, P users each."""
+    size = settings.NOTIFICATIONS_BROADCAST_PARTITION_SIZE
+    pkids = (
+        BroadcastRecipient.objects.filter(broadcast=broadcast)
+        .order_by("user_pkid")
+        .values_list("user_pkid", flat=True)
+    )
+    start = last = None
+    count = 0
+    for pkid in pkids.iterator(chunk_size=10000):
+        if start is None:
+            start = pkid
+        last = pkid
+        count += 1
+        if count == size:
+            yield start, last
+            start, count = None, 0
+    if start is not None:
+        yield start, last
+
+
+@shared_task(acks_late=True)
+def process_broadcast_partition(partition_id):
+    """
+    Create and publish the notifications of one broadcast partition, chunk by
+    chunk. Each chunk's rows and the partition checkpoint are committed
+    together, so a re-run resumes after the last committed user.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.NOTIFICATIONS_PARTITION_STALE_AFTER)
+    claimed = (
+        BroadcastPartition.objects.filter(id=partition_id)
+        .filter(
+            Q(status=BroadcastPartitionStatus.PENDING)
+            | Q(status=BroadcastPartitionStatus.RUNNING, heartbeat_at__lt=stale)
+        )
+        .update(status=BroadcastPartitionStatus.RUNNING, heartbeat_at=now)
+    )
+    if not claimed:
+        logger.info(f"Partition {partition_id} is done or owned by another worker")
+        return
+
+    partition = BroadcastPartition.objects.select_related(
+        "broadcast", "broadcast__template"
+    ).get(id=partition_id)
+    broadcast = partition.broadcast
     template = broadcast.template
+    channel = broadcast.channel
     context = {}  # Add any broadcast-specific context here (primitive values only!)
 
-    for user in users.iterator():
-        try:
-            if broadcast.channel == NotificationChannel.EMAIL:
-                send_notification(
+    # Templates that only use site-wide/broadcast variables are rendered once
+    rendered = None
+    shared_context = common_context(context)
+    if template.is_invariant(shared_context):
+        rendered = NotificationContent.pack(
+            *render_notification(template, channel, shared_context)
+        )
+
+    snapshot = BroadcastRecipient.objects.filter(
+        broadcast_id=broadcast.id, user_pkid__lte=partition.end_pkid
+    ).order_by("user_pkid")
+    if partition.checkpoint_pkid is not None:
+        snapshot = snapshot.filter(user_pkid__gt=partition.checkpoint_pkid)
+    else:
+        snapshot = snapshot.filter(user_pkid__gte=partition.start_pkid)
+
+    failed_total, skipped_total = partition.failed, partition.skipped
+    if partition.checkpoint_pkid is not None:
+        # Resuming: the last run may have died before updating the counters
+        counters.record_partition(
+            broadcast.id, partition_id, failed_total, skipped_total
+        )
+
+    chunk_size = settings.NOTIFICATIONS_BROADCAST_CHUNK_SIZE
+    while True:
+        pkids = list(snapshot.values_list("user_pkid", flat=True)[:chunk_size])
+        if not pkids:
+            break
+
+        recipients = resolve_recipients(channel, pkids)
+        chunk, failed = [], 0
+        for user in recipients:
+            try:
+                notification = build_notification(
                     user=user,
-                    channel=broadcast.channel,
+                    channel=channel,
                     template=template,
-                    context=context,  # 🟢 Context will be enhanced inside send_notification
+                    context=context,  # 🟢 Context will be enhanced inside build_notification
                     broadcast=broadcast,
+                    rendered=rendered,
                 )
-            elif broadcast.channel == NotificationChannel.SMS:
-                send_notification(
-                    user=user,
-                    channel=broadcast.channel,
-                    template=template,
-                    context=context,
-                    broadcast=broadcast,
+            except Exception as e:
+                logger.exception(f"Failed to build notification for {user.email}: {e}")
+                failed += 1
+                continue
+            if notification is not None:
+                chunk.append(notification)
+        failed_total += failed
+        skipped_total += len(pkids) - len(chunk) - failed
+
+        with transaction.atomic():
+            save_notifications(chunk)
+            BroadcastPartition.objects.filter(id=partition_id).update(
+                checkpoint_pkid=pkids[-1],
+                enqueued=F("enqueued") + len(chunk),
+                failed=failed_total,
+                skipped=skipped_total,
+                heartbeat_at=timezone.now(),
+            )
+            transaction.on_commit(
+                partial(
+                    _publish_broadcast_chunk,
+                    broadcast.id,
+                    partition_id,
+                    channel,
+                    [n.id for n in chunk],
+                    failed=failed_total,
+                    skipped=skipped_total,
                 )
-        except Exception as e:
-            logger.exception(f"Failed to send notification to {user.email}: {e}")
-            broadcast.failed_count += 1
+            )
+        snapshot = snapshot.filter(user_pkid__gt=pkids[-1])
+
+    BroadcastPartition.objects.filter(id=partition_id).update(
+        status=BroadcastPartitionStatus.DONE, heartbeat_at=timezone.now()
+    )
+
+
+def _publish_broadcast_chunk(
+    broadcast_id, partition_id, channel, notification_ids, failed, skipped
+):
+    if notification_ids:
+        publish_notifications(
+            channel, NotificationPriority.BULK, notification_ids, broadcast_id
+        )
+    counters.record_partition(broadcast_id, partition_id, failed, skipped)
+    progress.publish(broadcast_id)
+
+
+@shared_task
+def resume_broadcast_partitions():
+    """
+    Re-publish partitions whose worker died (stale heartbeat) or whose task
+    message never ran. They resume from their last checkpoint.
+    """
+    stale = timezone.now() - timedelta(
+        seconds=settings.NOTIFICATIONS_PARTITION_STALE_AFTER
+    )
+    partition_ids = list(
+        BroadcastPartition.objects.filter(
+            Q(status=BroadcastPartitionStatus.RUNNING, heartbeat_at__lt=stale)
+            | Q(
+                status=BroadcastPartitionStatus.PENDING, broadcast__updated_at__lt=stale
+            ),
+            broadcast__status=BroadcastStatus.SENDING,
+        ).values_list("id", flat=True)
+    )
+    for partition_id in partition_ids:
+        logger.warning(f"Resuming stalled broadcast partition {partition_id}")
+        process_broadcast_partition.delay(partition_id)
+    return len(partition_ids)
+
+
+@shared_task
+def sweep_outbox():
+    """
+    Re-drive the notification outbox, so a lost task message or a dead worker
+    never strands a notification: take back SENDING rows whose lease expired
+    (retrying or failing them), and re-publish PENDING rows whose retry is due
+    or whose first publish apparently never ran.
+    """
+    now = timezone.now()
+    limit = settings.NOTIFICATIONS_OUTBOX_SWEEP_LIMIT
+
+    with transaction.atomic():
+        expired = list(
+            Notification.objects.select_for_update(skip_locked=True).filter(
+                status=NotificationStatus.SENDING, next_attempt_at__lt=now
+            )[:limit]
+        )
+        if expired:
+            logger.warning(
+                f"Taking back {len(expired)} notifications with expired leases"
+            )
+            record_delivery_results(
+                expired, [DeliveryLeaseExpired("Send lease expired")] * len(expired)
+            )
+
+    stale = now - timedelta(seconds=settings.NOTIFICATIONS_OUTBOX_REDRIVE_AFTER)
+    due = (
+        Notification.objects.filter(status=NotificationStatus.PENDING)
+        .filter(
+            Q(attempts=0, next_attempt_at__lte=stale)
+            | Q(attempts__gt=0, next_attempt_at__lte=now)
+        )
+        # Still waiting for their broadcast's turn, not lost. Excluded in the
+        # query so a big backlog can't take up the limit ahead of due rows.
+        .exclude(attempts=0, broadcast_id__in=lanes.waiting_broadcasts())
+        .order_by("next_attempt_at")
+        .values_list("id", "channel", "priority", "broadcast_id")[:limit]
+    )
+    batches = defaultdict(list)
+    for notification_id, channel, priority, broadcast_id in due:
+        batches[(channel, priority, broadcast_id)].append(notification_id)
+
+    redriven = 0
+    for (channel, priority, broadcast_id), ids in batches.items():
+        publish_notifications(channel, priority, ids, broadcast_id)
+        redriven += len(ids)
+    if redriven:
+        logger.info(f"Re-published {redriven} due notifications")
+    return redriven
+
+
+@shared_task
+def maintain_notification_partitions():
+    """
+    Pre-create the upcoming monthly Notification partitions and expire the
+    ones past retention (only with NOTIFICATIONS_PARTITIONING enabled).
+    """
+    if not settings.NOTIFICATIONS_PARTITIONING:
+        return
+    created, expired = partitioning.maintain_partitions()
+    if expired:
+        logger.info(f"Expired notification partitions: {', '.join(expired)}")
+    return len(created), len(expired)
+
+
+@shared_task
+def archive_old_notifications():
+    """
+    Move finished notifications older than NOTIFICATIONS_ARCHIVE_AFTER_DAYS
+    to the archive storage, for at most NOTIFICATIONS_ARCHIVE_MAX_SECONDS.
+    """
+    if not settings.NOTIFICATIONS_ARCHIVE_AFTER_DAYS:
+        return
+    archived, _ = archive.archive_notifications(
+        max_seconds=settings.NOTIFICATIONS_ARCHIVE_MAX_SECONDS
+    )
+    return archived
+
+
+@shared_task
+def reconcile_inbox():
+    """Rebuild the Redis inbox state of users marked dirty from the database."""
+    return inbox.reconcile()
+
+
+@shared_task
+def flush_digests():
+    """Deliver the notification digests whose window has closed."""
+    delivered = digests.flush_due()
+    if delivered:
+        logger.info(f"Delivered {delivered} notification digests")
+    return delivered
+
+
+@shared_task
+def refresh_segments():
+    """
+    Apply the users changed since the last run to every segment bitmap, and
+    build new or edited segments from scratch.
+    """
+    applied, changed = segments.refresh()
+    if changed:
+        logger.info(f"Refreshed {changed} segments for {applied} changed users")
+    return applied, changed
+
+
+@shared_task
+def flush_broadcast_counters():
+    """
+    Copy the Redis delivery counters of every sending broadcast into its row,
+    and mark it SENT/FAILED once sent + failed reaches total_recipients.
+    Progress subscribers get an unthrottled snapshot of each.
+    """
+    for broadcast_id in Broadcast.objects.filter(
+        status=BroadcastStatus.SENDING
+    ).values_list("id", flat=True):
+        sent, failed, total = counters.read(broadcast_id)
+        if total is None:
             continue
+        if sent + failed >= total:
+            _complete_broadcast(broadcast_id, sent=sent, failed=failed, total=total)
+        else:
+            # The total shrinks as partitions skip users who dropped out
+            Broadcast.objects.filter(id=broadcast_id).update(
+                sent_count=sent, failed_count=failed, total_recipients=total
+            )
+            progress.publish(broadcast_id, throttle=False)
+
 
-    broadcast.status = BroadcastStatus.SENT
-    broadcast.completed_at = timezone.now()
-    broadcast.save()
+def _complete_broadcast(broadcast_id, sent, failed, total=0):
+    status = BroadcastStatus.FAILED if failed and not sent else BroadcastStatus.SENT
+    completed = Broadcast.objects.filter(
+        id=broadcast_id, status=BroadcastStatus.SENDING
+    ).update(
+        status=status,
+        sent_count=sent,
+        failed_count=failed,
+        total_recipients=total,
+        completed_at=timezone.now(),
+    )
+    if completed:
+        progress.publish(broadcast_id, status=status, throttle=False)
+    logger.info(f"Broadcast {broadcast_id} {status}: {sent} sent, {failed} failed")
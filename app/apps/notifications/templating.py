@@ -0,0 +1,160 @@
+"""
+Per-process cache of compiled NotificationTemplate fields.
+
+Compiled ``django.template.Template`` objects are kept in an LRU keyed by
+(template id, updated_at, field), so a broadcast lexes and parses each
+subject/body/HTML body once instead of once per recipient. Active templates
+are also cached by name so transactional sends skip the database lookup.
+
+``referenced_variables`` works out which context variables a template uses,
+so broadcasts can render templates that don't depend on the recipient once.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.template import Context, Template
+from django.template.base import Lexer, TokenType
+
+from .generations import SharedGeneration
+
+# Marker stored when a template pulls in variables we can't see ({% include %}, ...)
+UNKNOWN_VARIABLES = "*"
+
+_STRING_RE = re.compile(r"\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'")
+_NAME_RE = re.compile(r"[A-Za-z_]\w*")
+_KEYWORDS = {"in", "not", "and", "or", "is", "as", "with", "only", "reversed"}
+_KEYWORDS |= {"None", "True", "False", "on", "off", "silent"}
+_OPAQUE_TAGS = {"include", "extends", "ssi"}
+_IGNORED_TAGS = {"load", "comment", "verbatim", "templatetag", "csrf_token"}
+# Tags whose bound names are local to their block, and the tag closing it
+_BINDING_TAGS = {
+    "for": "endfor",
+    "with": "endwith",
+    "blocktranslate": "endblocktranslate",
+    "blocktrans": "endblocktrans",
+}
+
+
+def _expression_roots(expression):
+    """Root variable names of a filter expression like ``user.name|default:x``."""
+    expression = _STRING_RE.sub('""', expression)
+    first, *filters = expression.split("|")
+    candidates = [first] + [f.split(":", 1)[1] for f in filters if ":" in f]
+    roots = set()
+    for candidate in candidates:
+        match = _NAME_RE.match(candidate.strip())
+        if match and match.group() not in _KEYWORDS:
+            roots.add(match.group())
+    return roots
+
+
+def referenced_variables(*sources):
+    """
+    Return the sorted root names of the context variables used by the given
+    template sources. Errs on the side of reporting too many names; returns
+    ``[UNKNOWN_VARIABLES]`` members when a tag loads another template.
+    Names bound by a block tag ({% for %}, {% with %}...) are only local
+    inside that block.
+    """
+    names = set()
+    for source in sources:
+        if not source:
+            continue
+        # (end tag, names bound) of the enclosing binding blocks
+        scopes = []
+
+        def unbound(roots):
+            return {r for r in roots if not any(r in bound for _, bound in scopes)}
+
+        for token in Lexer(source).tokenize():
+            if token.token_type == TokenType.VAR:
+                names |= unbound(_expression_roots(token.contents))
+            elif token.token_type == TokenType.BLOCK:
+                tag, *args = token.split_contents()
+                if tag in _OPAQUE_TAGS:
+                    names.add(UNKNOWN_VARIABLES)
+                if tag in _IGNORED_TAGS:
+                    continue
+                if scopes and tag == scopes[-1][0]:
+                    scopes.pop()
+                    continue
+                local = set()
+                if tag == "for" and "in" in args:
+                    loop_vars = args[: args.index("in")]
+                    local |= {v.strip(",") for a in loop_vars for v in a.split(",")}
+                    local.add("forloop")
+                    args = args[args.index("in") + 1 :]
+                for arg in args:
+                    if "=" in arg:
+                        name, arg = arg.split("=", 1)
+                        local.add(name)
+                    names |= unbound(_expression_roots(arg))
+                if tag in _BINDING_TAGS:
+                    scopes.append((_BINDING_TAGS[tag], local))
+    return sorted(names)
+
+
+class CompiledTemplateCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = OrderedDict()
+        self._by_name = {}
+        self._generation = SharedGeneration("notifications:templates:generation")
+
+    def get(self, template, field):
+        """Return the compiled Template for ``template.<field>``."""
+        key = (template.pk, template.updated_at, field)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                return compiled
+
+        compiled = Template(getattr(template, field))
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > settings.NOTIFICATIONS_TEMPLATE_CACHE_SIZE:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def render(self, template, field, context):
+        """Render ``template.<field>``; empty fields render to ``""``."""
+        if not getattr(template, field):
+            return ""
+        return self.get(template, field).render(Context(context))
+
+    def resolve(self, name):
+        """Return the active NotificationTemplate called ``name``."""
+        from .models import NotificationTemplate
+
+        with self._lock:
+            if not self._generation.is_current():
+                self._by_name.clear()
+                self._generation.mark_seen()
+            template = self._by_name.get(name)
+        if template is not None:
+            return template
+
+        template = NotificationTemplate.objects.get(name=name, is_active=True)
+        with self._lock:
+            self._by_name[name] = template
+        return template
+
+    def invalidate(self, template):
+        """Forget ``template`` in this process and its name in every process."""
+        self._generation.bump()
+        with self._lock:
+            for key in [k for k in self._compiled if k[0] == template.pk]:
+                del self._compiled[key]
+            self._by_name.pop(template.name, None)
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+            self._by_name.clear()
+
+
+template_cache = CompiledTemplateCache()
@@ -0,0 +1,188 @@
+import socket
+import socketserver
+import threading
+
+import fakeredis
+import pytest
+from celery import current_app
+from django.contrib.auth import get_user_model
+
+from apps.notifications import redis_client, tasks
+from apps.notifications.choices import NotificationChannel
+from apps.notifications.connections import registry
+from apps.notifications.models import EmailConfiguration, NotificationTemplate
+from apps.notifications.utils import build_notification, save_notifications
+
+# One server for the whole run: modules cache Lua scripts bound to a client
+_redis_server = fakeredis.FakeServer()
+
+
+@pytest.fixture(autouse=True)
+def local_services(settings, monkeypatch):
+    """Run Celery tasks inline and keep the channel layer in memory."""
+    monkeypatch.setattr(current_app.conf, "task_always_eager", True)
+    settings.CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+    }
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(server=_redis_server)
+    client.flushall()
+    monkeypatch.setattr(redis_client, "_client", client)
+    return client
+
+
+@pytest.fixture
+def users(db):
+    return [
+        get_user_model().objects.create_user(
+            f"user{n}", "Test", "User", f"user{n}@example.com", "pass1234"
+        )
+        for n in range(3)
+    ]
+
+
+@pytest.fixture
+def template(db):
+    return NotificationTemplate.objects.create(
+        name="welcome", subject="Hello", template="Hello {{ user.first_name }}"
+    )
+
+
+@pytest.fixture
+def make_notifications(users):
+    def make(count=1, **fields):
+        notifications = [
+            build_notification(
+                user=users[0],
+                channel=NotificationChannel.EMAIL,
+                subject="Hello",
+                body=f"Message {n}",
+            )
+            for n in range(count)
+        ]
+        for notification in notifications:
+            for field, value in fields.items():
+                setattr(notification, field, value)
+        return save_notifications(notifications)
+
+    return make
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Ids handed to publish_notifications, instead of queueing tasks."""
+    ids = []
+    monkeypatch.setattr(
+        tasks,
+        "publish_notifications",
+        lambda channel, priority, notification_ids, broadcast_id=None: ids.extend(
+            notification_ids
+        ),
+    )
+    return ids
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        server.open.append(self.connection)
+        self.reply("220 stand-in ESMTP")
+        sender, recipients = None, []
+        while line := self.rfile.readline():
+            command = line.decode().rstrip("\r\n")
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 stand-in")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].strip(" <>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipient = command.split(":", 1)[1].strip(" <>")
+                if recipient in server.rejected:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(recipient)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b"".join(iter(self.rfile.readline, b".\r\n"))
+                server.messages.append((sender, recipients, data.decode()))
+                self.reply("250 Queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """A local SMTP server recording what it receives."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []  # (sender, recipients, data)
+        self.connections = 0
+        self.open = []
+        self.rejected = set()
+
+    def hang_up(self):
+        """Drop every open client connection, like a server timing them out."""
+        for client in self.open:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.open = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+@pytest.fixture
+def start_smtp_server():
+    """Start SMTP stand-ins, stopped after the test."""
+    servers = []
+
+    def start():
+        server = SMTPStandIn()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def smtp_server(start_smtp_server):
+    return start_smtp_server()
+
+
+@pytest.fixture
+def email_config(db, redis, smtp_server):
+    """The active EmailConfiguration, pointing at the SMTP stand-in."""
+    registry.close()
+    yield EmailConfiguration.objects.create(
+        name="stand-in",
+        host="127.0.0.1",
+        port=smtp_server.port,
+        use_tls=False,
+        from_email="noreply@example.com",
+        timeout=5,
+        is_active=True,
+    )
+    registry.close()
@@ -0,0 +1,67 @@
+from datetime import timedelta, timezone as dt_timezone
+
+import pytest
+from django.utils import timezone
+
+from apps.notifications import archive
+from apps.notifications.choices import NotificationStatus
+from apps.notifications.models import Notification, NotificationContent
+
+
+@pytest.fixture
+def archive_storage(settings, tmp_path):
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "notification_archive": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": tmp_path},
+        },
+    }
+    return archive.get_archive_storage()
+
+
+@pytest.mark.django_db
+def test_archive_and_rehydrate_round_trip(archive_storage, make_notifications):
+    now = timezone.now().replace(hour=12)
+    old = make_notifications(3, status=NotificationStatus.SENT, sent_at=now)
+    pending, recent = make_notifications(2, status=NotificationStatus.PENDING)
+    Notification.objects.filter(id=recent.id).update(status=NotificationStatus.SENT)
+    created = {
+        old[0].id: now - timedelta(days=41),
+        old[1].id: now - timedelta(days=41, minutes=1),
+        old[2].id: now - timedelta(days=40),
+        pending.id: now - timedelta(days=41),
+    }
+    for notification_id, created_at in created.items():
+        Notification.objects.filter(id=notification_id).update(created_at=created_at)
+
+    archived, files = archive.archive_notifications(
+        older_than=now - timedelta(days=30), chunk_size=2
+    )
+
+    # One file per day per chunk; unfinished and recent rows stay
+    assert (archived, files) == (3, 2)
+    assert set(Notification.objects.values_list("id", flat=True)) == {
+        pending.id,
+        recent.id,
+    }
+    # Content still used by the remaining rows is kept
+    assert set(
+        NotificationContent.objects.filter(
+            digest__in=[n.content_id for n in old]
+        ).values_list("digest", flat=True)
+    ) == {pending.content_id, recent.content_id}
+    day = (now - timedelta(days=41)).astimezone(dt_timezone.utc)
+    _, names = archive_storage.listdir(f"notifications/{day:%Y/%m/%d}")
+    assert len(names) == 1
+
+    restored = archive.rehydrate(now - timedelta(days=42), now - timedelta(days=30))
+
+    assert restored == 3
+    for notification in old:
+        row = Notification.objects.select_related("content").get(id=notification.id)
+        assert row.created_at == created[notification.id]
+        assert (row.user_id, row.status) == (notification.user_id, "sent")
+        assert (row.subject, row.body) == ("Hello", notification.body)
+    # Already present rows are left alone
+    assert archive.rehydrate(now - timedelta(days=42), now) == 0
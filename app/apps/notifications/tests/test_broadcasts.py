@@ -0,0 +1,195 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.notifications import counters, lanes, tasks, templating
+from apps.notifications.choices import BroadcastPartitionStatus, NotificationChannel
+from apps.notifications.models import (
+    Broadcast,
+    BroadcastPartition,
+    BroadcastStatus,
+    Notification,
+    Segment,
+)
+from apps.notifications.tasks import process_broadcast, process_broadcast_partition
+
+
+@pytest.mark.django_db
+def test_broadcast_builds_its_segment_before_snapshotting(redis, users, template):
+    segment = Segment.objects.create(name="everyone", filter={})
+    broadcast = Broadcast.objects.create(
+        name="launch",
+        template=template,
+        channel=NotificationChannel.IN_APP,
+        segment=segment,
+        status=BroadcastStatus.SCHEDULED,
+    )
+
+    process_broadcast(broadcast.id)
+
+    segment.refresh_from_db()
+    broadcast.refresh_from_db()
+    assert segment.refreshed_at is not None
+    assert broadcast.status == BroadcastStatus.SENDING
+    assert broadcast.total_recipients == len(users)
+
+
+@pytest.mark.django_db
+def test_resumed_partition_restores_its_counters(redis, users, template):
+    broadcast = Broadcast.objects.create(
+        name="launch",
+        template=template,
+        channel=NotificationChannel.IN_APP,
+        status=BroadcastStatus.SCHEDULED,
+    )
+    process_broadcast(broadcast.id)
+    counters.set_total(broadcast.id, len(users))  # normally set on commit
+    users[0].delete()
+    partition = broadcast.partitions.get()
+
+    # On-commit hooks don't run here: as if the worker died right after the
+    # chunk committed, before updating the counters or finishing
+    process_broadcast_partition(partition.id)
+    assert counters.read(broadcast.id) == (0, 0, len(users))
+    BroadcastPartition.objects.filter(id=partition.id).update(
+        status=BroadcastPartitionStatus.RUNNING,
+        heartbeat_at=timezone.now() - timedelta(days=1),
+    )
+
+    process_broadcast_partition(partition.id)
+    partition.refresh_from_db()
+    assert (partition.enqueued, partition.skipped) == (len(users) - 1, 1)
+    assert counters.read(broadcast.id) == (0, 0, len(users) - 1)
+
+
+@pytest.mark.django_db
+def test_partition_creates_and_enqueues_notifications_in_bulk(
+    redis, users, template, settings, monkeypatch, django_capture_on_commit_callbacks
+):
+    settings.NOTIFICATIONS_BROADCAST_CHUNK_SIZE = 2
+    settings.NOTIFICATIONS_EMAIL_BATCH_SIZE = 2
+    monkeypatch.setattr(tasks.dispatch_bulk_batches, "delay", lambda: None)
+    broadcast = Broadcast.objects.create(
+        name="launch",
+        template=template,
+        channel=NotificationChannel.EMAIL,
+        status=BroadcastStatus.SCHEDULED,
+    )
+    process_broadcast(broadcast.id)
+    partition = broadcast.partitions.get()
+
+    with CaptureQueriesContext(connection) as queries:
+        with django_capture_on_commit_callbacks(execute=True):
+            process_broadcast_partition(partition.id)
+
+    notifications = Notification.objects.filter(broadcast=broadcast)
+    assert sorted(n.recipient for n in notifications) == sorted(u.email for u in users)
+    # One multi-row insert per chunk, not one per recipient
+    inserts = [
+        q
+        for q in queries
+        if q["sql"].startswith('INSERT INTO "notifications_notification"')
+    ]
+    assert len(inserts) == 2
+    # Queued behind the broadcast's turn on the bulk lane, in send batches
+    batches = [
+        json.loads(batch)
+        for batch in redis.lrange(f"{lanes._BATCHES_PREFIX}{broadcast.id}", 0, -1)
+    ]
+    assert sorted(len(batch["ids"]) for batch in batches) == [1, 2]
+    assert {i for batch in batches for i in batch["ids"]} == {
+        str(n.id) for n in notifications
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "body, renders",
+    [
+        # Only site-wide variables: rendered once for the whole partition
+        ("Hello from {{ site_name }}", 2),
+        # Personalised: rendered for every recipient
+        ("Hello {{ user.first_name }}", 6),
+    ],
+)
+def test_partition_renders_recipient_independent_templates_once(
+    redis, users, template, settings, monkeypatch, body, renders
+):
+    settings.SITE_NAME = "Example"
+    template.template = body
+    template.save()
+    calls = []
+    render = templating.template_cache.render
+    monkeypatch.setattr(
+        templating.template_cache,
+        "render",
+        lambda *args: calls.append(args) or render(*args),
+    )
+    broadcast = Broadcast.objects.create(
+        name="launch",
+        template=template,
+        channel=NotificationChannel.IN_APP,
+        status=BroadcastStatus.SCHEDULED,
+    )
+    process_broadcast(broadcast.id)
+
+    process_broadcast_partition(broadcast.partitions.get().id)
+
+    assert len(calls) == renders  # subject and body
+    notifications = Notification.objects.filter(broadcast=broadcast)
+    assert notifications.count() == len(users)
+    if renders == 2:
+        assert {n.content_id for n in notifications} == {notifications[0].content_id}
+        assert notifications[0].body == "Hello from Example"
+
+
+@pytest.mark.django_db
+def test_broadcast_fans_out_pkid_range_partitions(
+    redis, users, template, settings, django_capture_on_commit_callbacks
+):
+    settings.NOTIFICATIONS_BROADCAST_PARTITION_SIZE = 2
+    broadcast = Broadcast.objects.create(
+        name="launch",
+        template=template,
+        channel=NotificationChannel.IN_APP,
+        status=BroadcastStatus.SCHEDULED,
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        process_broadcast(broadcast.id)
+
+    pkids = [user.pkid for user in users]
+    partitions = broadcast.partitions.order_by("index")
+    assert [(p.start_pkid, p.end_pkid) for p in partitions] == [
+        (pkids[0], pkids[1]),
+        (pkids[2], pkids[2]),
+    ]
+    assert {p.status for p in partitions} == {BroadcastPartitionStatus.DONE}
+    assert [p.checkpoint_pkid for p in partitions] == [pkids[1], pkids[2]]
+    notifications = Notification.objects.filter(broadcast=broadcast)
+    assert sorted(n.user_id for n in notifications) == pkids
+
+
+@pytest.mark.django_db
+def test_partition_owned_by_a_live_worker_is_left_alone(redis, users, template):
+    broadcast = Broadcast.objects.create(
+        name="launch",
+        template=template,
+        channel=NotificationChannel.IN_APP,
+        status=BroadcastStatus.SCHEDULED,
+    )
+    process_broadcast(broadcast.id)
+    partition = broadcast.partitions.get()
+    BroadcastPartition.objects.filter(id=partition.id).update(
+        status=BroadcastPartitionStatus.RUNNING, heartbeat_at=timezone.now()
+    )
+
+    process_broadcast_partition(partition.id)
+
+    assert not Notification.objects.filter(broadcast=broadcast).exists()
+    partition.refresh_from_db()
+    assert partition.status == BroadcastPartitionStatus.RUNNING
@@ -0,0 +1,47 @@
+import zlib
+
+import pytest
+
+from apps.notifications.choices import NotificationChannel
+from apps.notifications.models import Notification, NotificationContent
+from apps.notifications.utils import build_notification, save_notifications
+
+
+def build(users, body, html_body=None):
+    return [
+        build_notification(
+            user=user,
+            channel=NotificationChannel.EMAIL,
+            subject="Hello",
+            body=body,
+            html_body=html_body,
+        )
+        for user in users
+    ]
+
+
+@pytest.mark.django_db
+def test_identical_content_is_stored_once(users):
+    save_notifications(build(users, "Welcome aboard"))
+    # A later identical message reuses the stored row
+    save_notifications(build(users[:1], "Welcome aboard"))
+    save_notifications(build(users[:1], "Something else"))
+
+    assert NotificationContent.objects.count() == 2
+    welcome = NotificationContent.objects.get(subject="Hello", body=b"Welcome aboard")
+    assert welcome.notifications.count() == len(users) + 1
+    assert not welcome.compressed
+
+
+@pytest.mark.django_db
+def test_large_content_is_compressed_and_read_back(users, settings):
+    settings.NOTIFICATIONS_CONTENT_COMPRESS_MIN = 100
+    body, html_body = "Lorem ipsum " * 50, f"<p>{'Lorem ipsum ' * 50}</p>"
+    save_notifications(build(users[:1], body, html_body))
+
+    content = NotificationContent.objects.get()
+    assert content.compressed
+    assert len(content.body) < len(body)
+    assert zlib.decompress(bytes(content.body)).decode() == body
+    notification = Notification.objects.select_related("content").get()
+    assert (notification.body, notification.html_body) == (body, html_body)
@@ -0,0 +1,118 @@
+import pytest
+
+from apps.notifications import digests
+from apps.notifications.choices import NotificationChannel
+from apps.notifications.models import Notification, NotificationTemplate
+from apps.notifications.utils import build_notification, send_notification
+
+
+@pytest.fixture
+def digested(template):
+    template.digest_window = 60
+    template.save()
+    return template
+
+
+def buffer_notification(user, template):
+    digests.buffer(
+        build_notification(
+            user=user, channel=NotificationChannel.EMAIL, template=template
+        )
+    )
+    return digests._key(user.pkid, template.id, NotificationChannel.EMAIL)
+
+
+@pytest.mark.django_db
+def test_failed_flush_puts_items_back_without_extending_expiry(
+    redis, users, digested, monkeypatch
+):
+    key = buffer_notification(users[0], digested)
+    ttl = redis.pttl(key)
+
+    def fail(notification):
+        raise RuntimeError("SMTP down")
+
+    monkeypatch.setattr(digests, "deliver_notification", fail)
+    with pytest.raises(RuntimeError):
+        digests.flush(key)
+
+    assert redis.llen(key) == 1
+    assert 0 < redis.pttl(key) <= ttl
+    assert redis.zscore(digests._DUE, key) is not None
+
+
+@pytest.mark.django_db
+def test_expired_buffer_is_dropped_from_the_due_set(redis, users, digested):
+    key = buffer_notification(users[0], digested)
+    redis.delete(key)  # as if its TTL ran out
+
+    assert digests.flush(key) is None
+    assert redis.zscore(digests._DUE, key) is None
+
+
+@pytest.fixture
+def delivered(monkeypatch):
+    """Digests handed to deliver_notification, instead of sending them."""
+    notifications = []
+    monkeypatch.setattr(digests, "deliver_notification", notifications.append)
+    return notifications
+
+
+def send(user, template, django_capture_on_commit_callbacks, count):
+    with django_capture_on_commit_callbacks(execute=True):
+        for n in range(count):
+            send_notification(
+                user=user,
+                channel=NotificationChannel.EMAIL,
+                template=template,
+                context={"n": n},
+            )
+
+
+def close_windows(redis):
+    for key in redis.zrange(digests._DUE, 0, -1):
+        redis.zadd(digests._DUE, {key: 0})
+
+
+@pytest.mark.django_db
+def test_burst_is_delivered_as_one_digest(
+    redis, users, digested, delivered, django_capture_on_commit_callbacks
+):
+    digested.template = "Update {{ n }} for {{ user.first_name }}"
+    digested.save()
+    send(users[0], digested, django_capture_on_commit_callbacks, 3)
+    send(users[1], digested, django_capture_on_commit_callbacks, 1)
+
+    # Nothing is sent while the window is open
+    assert digests.flush_due() == 0
+    assert not Notification.objects.exists()
+    close_windows(redis)
+    assert digests.flush_due() == 2
+
+    by_user = {n.user_id: n for n in delivered}
+    digest = by_user[users[0].pkid]
+    assert digest.subject == "Hello (+2 more)"
+    assert digest.body == "Update 0 for Test\n\nUpdate 1 for Test\n\nUpdate 2 for Test"
+    assert digest.template == digested
+    # A lone item goes out as the original message
+    assert by_user[users[1].pkid].body == "Update 0 for Test"
+    assert not redis.zcard(digests._DUE)
+
+
+@pytest.mark.django_db
+def test_digest_template_renders_the_items(
+    redis, users, digested, delivered, django_capture_on_commit_callbacks
+):
+    digested.digest_template = NotificationTemplate.objects.create(
+        name="welcome digest",
+        subject="{{ count }} updates",
+        template="{% for item in items %}[{{ item.body }}]{% endfor %}",
+    )
+    digested.save()
+    send(users[0], digested, django_capture_on_commit_callbacks, 2)
+    close_windows(redis)
+
+    assert digests.flush_due() == 1
+    [digest] = delivered
+    assert digest.subject == "2 updates"
+    assert digest.body == "[Hello Test][Hello Test]"
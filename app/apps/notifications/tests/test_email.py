@@ -0,0 +1,112 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.notifications.choices import NotificationStatus
+from apps.notifications.models import EmailConfiguration, Notification
+from apps.notifications.tasks import send_email_batch
+
+
+@pytest.mark.django_db
+def test_batch_is_sent_over_one_connection(
+    email_config, smtp_server, make_notifications
+):
+    notifications = make_notifications(3)
+
+    assert send_email_batch() == 3
+    assert smtp_server.connections == 1
+    assert [recipients for _, recipients, _ in smtp_server.messages] == [
+        ["user0@example.com"]
+    ] * 3
+    sender, _, data = smtp_server.messages[0]
+    assert sender == "noreply@example.com"
+    assert "Subject: Hello" in data and "Message 0" in data
+    assert set(
+        Notification.objects.filter(id__in=[n.id for n in notifications]).values_list(
+            "status", flat=True
+        )
+    ) == {NotificationStatus.SENT}
+
+
+@pytest.mark.django_db
+def test_rejected_recipient_does_not_abort_the_batch(
+    email_config, smtp_server, make_notifications
+):
+    smtp_server.rejected.add("gone@example.com")
+    [first] = make_notifications()
+    [rejected] = make_notifications(recipient="gone@example.com")
+    [last] = make_notifications()
+
+    assert send_email_batch() == 2
+    assert len(smtp_server.messages) == 2
+    statuses = dict(Notification.objects.values_list("id", "status"))
+    assert statuses[first.id] == statuses[last.id] == NotificationStatus.SENT
+    # 5xx from the server: not worth retrying
+    assert statuses[rejected.id] == NotificationStatus.FAILED
+
+
+@pytest.mark.django_db
+def test_batch_is_limited_to_the_given_notifications(
+    email_config, smtp_server, make_notifications
+):
+    wanted = make_notifications(2)
+    make_notifications(2)
+
+    assert send_email_batch([str(n.id) for n in wanted]) == 2
+    assert Notification.objects.filter(status=NotificationStatus.PENDING).count() == 2
+
+
+@pytest.mark.django_db
+def test_connection_and_config_are_reused_across_batches(
+    email_config, smtp_server, make_notifications
+):
+    make_notifications()
+    send_email_batch()
+    make_notifications()
+    with CaptureQueriesContext(connection) as queries:
+        assert send_email_batch() == 1
+
+    assert smtp_server.connections == 1
+    assert not [q for q in queries if EmailConfiguration._meta.db_table in q["sql"]]
+
+
+@pytest.mark.django_db
+def test_new_config_is_used_once_saved(
+    email_config,
+    smtp_server,
+    start_smtp_server,
+    make_notifications,
+    django_capture_on_commit_callbacks,
+):
+    make_notifications()
+    send_email_batch()
+    replacement = start_smtp_server()
+    with django_capture_on_commit_callbacks(execute=True):
+        EmailConfiguration.objects.create(
+            name="replacement",
+            host="127.0.0.1",
+            port=replacement.port,
+            use_tls=False,
+            from_email="alerts@example.com",
+            is_active=True,
+        )
+
+    make_notifications()
+    assert send_email_batch() == 1
+    assert len(smtp_server.messages) == 1
+    [(sender, _, _)] = replacement.messages
+    assert sender == "alerts@example.com"
+
+
+@pytest.mark.django_db
+def test_dropped_pooled_connection_is_replaced(
+    email_config, smtp_server, make_notifications, settings
+):
+    settings.NOTIFICATIONS_SMTP_HEALTHCHECK_AFTER = 0
+    make_notifications()
+    send_email_batch()
+    smtp_server.hang_up()
+
+    make_notifications()
+    assert send_email_batch() == 1
+    assert smtp_server.connections == 2
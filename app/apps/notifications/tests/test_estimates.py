@@ -0,0 +1,60 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.notifications import estimates, segments
+from apps.notifications.choices import NotificationChannel
+from apps.notifications.models import Broadcast, BroadcastStatus, Notification, Segment
+
+
+def make_broadcast(template, **fields):
+    return Broadcast.objects.create(
+        name="launch",
+        template=template,
+        channel=NotificationChannel.IN_APP,
+        recipient_filter={"is_staff": False},
+        **fields,
+    )
+
+
+@pytest.mark.django_db
+def test_dry_run_estimates_from_the_last_similar_broadcast(redis, users, template):
+    make_broadcast(template, status=BroadcastStatus.SENT, total_recipients=1200)
+    broadcast = make_broadcast(template, send_rate=100)
+    client = APIClient()
+    client.force_authenticate(users[0])
+    url = reverse("notifications:broadcast-estimate", args=[broadcast.id])
+
+    response = client.get(url, {"sample": 2}).json()
+
+    assert response["recipients"] == {
+        "estimate": 1200,
+        "source": "previous_snapshot",
+    }
+    assert response["send_rate"] == 100
+    assert response["estimated_duration"] == 12
+    samples = response["samples"]
+    assert len(samples) == 2
+    assert {sample["body"] for sample in samples} == {"Hello Test"}
+    assert {sample["user"] for sample in samples} <= {str(u.id) for u in users}
+    # Nothing was sent or written
+    assert not Notification.objects.exists()
+    broadcast.refresh_from_db()
+    assert broadcast.status == BroadcastStatus.DRAFT
+
+
+@pytest.mark.django_db
+def test_segment_broadcast_is_estimated_from_its_size(redis, users, template):
+    segment = Segment.objects.create(name="everyone", filter={})
+    segments.refresh()
+    broadcast = make_broadcast(template, segment=Segment.objects.get(id=segment.id))
+
+    result = estimates.estimate_broadcast(broadcast, sample_size=5)
+
+    assert result["recipients"] == {"estimate": len(users), "source": "segment"}
+    assert [sample["user"] for sample in result["samples"]] == [
+        str(user.id) for user in users
+    ]
+    # In-app pushes aren't rate limited and the broadcast sets no rate
+    assert result["send_rate"] is None
+    assert result["estimated_duration"] is None
@@ -0,0 +1,45 @@
+import fakeredis
+
+from apps.notifications import redis_client
+from apps.notifications.generations import SharedGeneration
+
+
+def test_bump_in_one_process_invalidates_the_others(redis, settings):
+    settings.NOTIFICATIONS_CACHE_RECHECK = 0
+    # Two processes' views of the same generation
+    web = SharedGeneration("notifications:test:generation")
+    worker = SharedGeneration("notifications:test:generation")
+    assert not worker.is_current()
+    worker.mark_seen()
+    assert worker.is_current()
+
+    web.bump()
+    assert not worker.is_current()
+    worker.mark_seen()
+    assert worker.is_current()
+
+
+def test_recheck_interval_limits_redis_reads(redis, settings):
+    settings.NOTIFICATIONS_CACHE_RECHECK = 60
+    worker = SharedGeneration("notifications:test:generation")
+    worker.mark_seen()
+    SharedGeneration("notifications:test:generation").bump()
+    assert worker.is_current()
+
+
+def test_local_copy_is_kept_while_redis_is_down(monkeypatch, settings):
+    settings.NOTIFICATIONS_CACHE_RECHECK = 0
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis_client, "_client", fakeredis.FakeRedis(server=server))
+    worker = SharedGeneration("notifications:test:generation")
+    worker.mark_seen()
+
+    server.connected = False
+    assert worker.is_current()
+    worker.bump()  # logged, not raised
+    assert not worker.is_current()
+    worker.mark_seen()
+    assert worker.is_current()
+
+    server.connected = True
+    assert not worker.is_current()
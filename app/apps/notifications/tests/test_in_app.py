@@ -0,0 +1,88 @@
+import pytest
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.core.middleware import JWTAuthMiddleware
+from apps.notifications import aio
+from apps.notifications.backends import InAppBackend, in_app_group
+from apps.notifications.choices import NotificationChannel, NotificationStatus
+from apps.notifications.models import Notification
+from apps.notifications.routing import websocket_urlpatterns
+from apps.notifications.tasks import send_in_app_batch
+from apps.notifications.utils import build_notification, save_notifications
+
+application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    runner = aio.AsyncRunner()
+    monkeypatch.setattr(aio, "runner", runner)
+    yield runner
+    runner.close()
+
+
+@pytest.mark.django_db
+def test_open_connections_of_the_user_receive_the_push(users):
+    users[0].is_active = True  # accounts start inactive until activated
+    users[0].save()
+    token = AccessToken.for_user(users[0])
+    message = {"id": "1", "subject": "Hello", "body": "Hi"}
+
+    @async_to_sync
+    async def push():
+        tabs = [
+            WebsocketCommunicator(application, f"/ws/notifications/?token={token}")
+            for _ in range(2)
+        ]
+        for tab in tabs:
+            assert (await tab.connect())[0]
+        errors = await InAppBackend().asend_many(
+            [
+                {"user_pkid": users[0].pkid, "notification": message},
+                {"user_pkid": users[1].pkid, "notification": message},
+            ]
+        )
+        received = [await tab.receive_json_from() for tab in tabs]
+        # Nothing for another user's push
+        assert await tabs[0].receive_nothing()
+        for tab in tabs:
+            await tab.disconnect()
+        return errors, received
+
+    errors, received = push()
+
+    assert errors == [None, None]
+    assert received == [message, message]
+
+
+@pytest.mark.django_db
+def test_batch_is_pushed_through_the_channel_layer(redis, users, runner):
+    layer = get_channel_layer()
+    channel = async_to_sync(layer.new_channel)()
+    async_to_sync(layer.group_add)(in_app_group(users[0].pkid), channel)
+    notifications = save_notifications(
+        [
+            build_notification(
+                user=user,
+                channel=NotificationChannel.IN_APP,
+                subject="Hello",
+                body="Hi",
+            )
+            for user in users
+        ]
+    )
+
+    assert send_in_app_batch([n.id for n in notifications]) == len(users)
+
+    event = async_to_sync(layer.receive)(channel)
+    assert event["type"] == "notification.message"
+    assert event["notification"]["id"] == str(notifications[0].id)
+    assert event["notification"]["body"] == "Hi"
+    # Users who aren't connected find theirs in the inbox
+    assert set(Notification.objects.values_list("status", flat=True)) == {
+        NotificationStatus.SENT
+    }
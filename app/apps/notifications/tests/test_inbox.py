@@ -0,0 +1,55 @@
+import pytest
+
+from apps.notifications import inbox
+from apps.notifications.choices import NotificationStatus
+from apps.notifications.models import Notification
+
+
+@pytest.mark.django_db
+def test_unread_badge_is_served_from_redis(
+    redis, users, make_notifications, django_assert_num_queries
+):
+    user_id = users[0].id
+    make_notifications(3, status=NotificationStatus.SENT)
+    make_notifications(1, status=NotificationStatus.PENDING)
+
+    # A miss reads 0 and schedules the rebuild (run inline here)
+    assert inbox.unread_count(user_id) == 0
+    with django_assert_num_queries(0):
+        assert inbox.unread_count(user_id) == 3
+
+    (delivered,) = make_notifications(1, status=NotificationStatus.SENT)
+    inbox.deliver([delivered])
+    with django_assert_num_queries(0):
+        unread, items = inbox.recent(user_id)
+    assert unread == 4
+    assert items[0]["id"] == str(delivered.id)
+    assert [item["read"] for item in items] == [False] * 4
+
+
+@pytest.mark.django_db
+def test_marking_read_updates_rows_and_counter(
+    redis, users, make_notifications, django_assert_num_queries
+):
+    user_id = users[0].id
+    first, second, third = make_notifications(3, status=NotificationStatus.SENT)
+    inbox.rebuild([user_id])
+
+    # Already read or unknown ids don't count twice
+    assert inbox.mark_read(user_id, [first.id, second.id]) == 2
+    assert inbox.mark_read(user_id, [first.id]) == 0
+    unread, items = inbox.recent(user_id)
+    assert unread == 1
+    assert {item["id"]: item["read"] for item in items} == {
+        str(first.id): True,
+        str(second.id): True,
+        str(third.id): False,
+    }
+
+    with django_assert_num_queries(1):
+        assert inbox.mark_all_read(user_id) == 1
+    assert inbox.unread_count(user_id) == 0
+    assert not Notification.objects.filter(read_at=None).exists()
+    # The counter agrees with the database after a rebuild
+    inbox.reconcile()
+    assert inbox.unread_count(user_id) == 0
@@ -0,0 +1,54 @@
+import pytest
+
+from apps.notifications import lanes, tasks
+from apps.notifications.choices import NotificationChannel, NotificationPriority
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """The send batches published to Celery, as ``(channel, ids, queue)``."""
+    calls = []
+    for channel in NotificationChannel:
+        monkeypatch.setattr(
+            tasks._batch_task(channel),
+            "apply_async",
+            lambda args, kwargs, queue, channel=channel: calls.append(
+                (channel, args[0], queue)
+            ),
+        )
+    return calls
+
+
+def test_transactional_notifications_skip_the_bulk_lane(redis, settings, published):
+    settings.NOTIFICATIONS_EMAIL_BATCH_SIZE = 2
+
+    tasks.publish_notifications(
+        NotificationChannel.EMAIL, NotificationPriority.TRANSACTIONAL, [1, 2, 3]
+    )
+
+    assert published == [
+        (NotificationChannel.EMAIL, ["1", "2"], "transactional"),
+        (NotificationChannel.EMAIL, ["3"], "transactional"),
+    ]
+    assert not lanes.waiting_broadcasts()
+
+
+def test_broadcasts_take_turns_on_the_bulk_lane(redis, settings, published):
+    settings.NOTIFICATIONS_EMAIL_BATCH_SIZE = 1
+    settings.NOTIFICATIONS_BULK_MAX_IN_FLIGHT = 3
+    # A large broadcast queued first must not hold back a small one
+    lanes.enqueue_bulk_batches("large", NotificationChannel.EMAIL, range(5))
+    tasks.publish_notifications(
+        NotificationChannel.EMAIL, NotificationPriority.BULK, [9], broadcast_id="small"
+    )
+
+    assert [ids for _, ids, _ in published] == [["0"], ["9"], ["1"]]
+    assert {queue for _, _, queue in published} == {"bulk"}
+    assert lanes.waiting_broadcasts() == {"large"}
+
+    # The in-flight budget is spent until a batch finishes
+    tasks.dispatch_bulk_batches()
+    assert len(published) == 3
+    lanes.release_bulk_credit()
+    tasks.dispatch_bulk_batches()
+    assert [ids for _, ids, _ in published[3:]] == [["2"]]
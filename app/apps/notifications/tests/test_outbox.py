@@ -0,0 +1,154 @@
+from datetime import timedelta
+
+import pytest
+from django.db import transaction
+from django.utils import timezone
+
+from apps.notifications import counters, lanes
+from apps.notifications.choices import NotificationChannel, NotificationStatus
+from apps.notifications.models import Broadcast, Notification
+from apps.notifications.tasks import (
+    claim_pending_notifications,
+    record_delivery_results,
+    sweep_outbox,
+)
+
+
+@pytest.mark.django_db
+def test_claim_leases_due_notifications_once(make_notifications, settings):
+    due = make_notifications(2)
+    make_notifications(next_attempt_at=timezone.now() + timedelta(minutes=5))
+
+    claimed = claim_pending_notifications(NotificationChannel.EMAIL)
+    assert {n.id for n in claimed} == {n.id for n in due}
+    lease = timezone.now() + timedelta(seconds=settings.NOTIFICATIONS_SEND_LEASE)
+    for notification in Notification.objects.filter(id__in=[n.id for n in due]):
+        assert notification.status == NotificationStatus.SENDING
+        assert notification.attempts == 1
+        assert abs(notification.next_attempt_at - lease) < timedelta(seconds=5)
+
+    # Claimed rows are no longer PENDING, so another sender gets nothing
+    assert claim_pending_notifications(NotificationChannel.EMAIL) == []
+    assert claim_pending_notifications(NotificationChannel.SMS) == []
+
+
+@pytest.mark.django_db
+def test_failed_delivery_backs_off_exponentially(make_notifications, settings):
+    settings.NOTIFICATIONS_RETRY_BACKOFF = 60
+    make_notifications()
+    for attempt, backoff in [(1, 60), (2, 120), (3, 240)]:
+        Notification.objects.update(next_attempt_at=timezone.now())
+        [notification] = claim_pending_notifications(NotificationChannel.EMAIL)
+        assert notification.attempts == attempt
+        record_delivery_results([notification], [ConnectionError("timed out")])
+
+        notification.refresh_from_db()
+        assert notification.status == NotificationStatus.PENDING
+        assert notification.error_message == "timed out"
+        delay = (notification.next_attempt_at - timezone.now()).total_seconds()
+        assert 0.8 * backoff - 5 < delay <= 1.2 * backoff
+
+
+@pytest.mark.django_db
+def test_delivery_fails_for_good_after_max_attempts(make_notifications, settings):
+    settings.NOTIFICATIONS_MAX_ATTEMPTS = 2
+    make_notifications()
+    for status in [NotificationStatus.PENDING, NotificationStatus.FAILED]:
+        Notification.objects.update(next_attempt_at=timezone.now())
+        [notification] = claim_pending_notifications(NotificationChannel.EMAIL)
+        record_delivery_results([notification], [ConnectionError("timed out")])
+        notification.refresh_from_db()
+        assert notification.status == status
+    assert claim_pending_notifications(NotificationChannel.EMAIL) == []
+
+
+@pytest.mark.django_db
+def test_permanent_failure_is_not_retried(make_notifications):
+    make_notifications()
+    [notification] = claim_pending_notifications(NotificationChannel.EMAIL)
+    record_delivery_results([notification], [ValueError("No recipient")])
+    notification.refresh_from_db()
+    assert notification.status == NotificationStatus.FAILED
+
+
+@pytest.mark.django_db
+def test_sweep_takes_back_expired_leases(redis, published, make_notifications):
+    [expired] = make_notifications(
+        status=NotificationStatus.SENDING,
+        attempts=1,
+        next_attempt_at=timezone.now() - timedelta(seconds=1),
+    )
+    [leased] = make_notifications(
+        status=NotificationStatus.SENDING,
+        attempts=1,
+        next_attempt_at=timezone.now() + timedelta(minutes=5),
+    )
+
+    sweep_outbox()
+    expired.refresh_from_db()
+    leased.refresh_from_db()
+    assert expired.status == NotificationStatus.PENDING
+    assert expired.error_message == "Send lease expired"
+    assert expired.next_attempt_at > timezone.now()
+    assert leased.status == NotificationStatus.SENDING
+    # Not due yet: the backoff applies to a taken-back lease too
+    assert published == []
+
+
+@pytest.mark.django_db
+def test_sweep_republishes_due_and_lost_notifications(
+    redis, published, make_notifications, settings
+):
+    past = timezone.now() - timedelta(
+        seconds=settings.NOTIFICATIONS_OUTBOX_REDRIVE_AFTER + 1
+    )
+    [retry] = make_notifications(attempts=1, next_attempt_at=timezone.now())
+    [lost] = make_notifications(next_attempt_at=past)
+    make_notifications(
+        attempts=1, next_attempt_at=timezone.now() + timedelta(minutes=5)
+    )
+    # Just published: its task may not have run yet
+    make_notifications()
+
+    assert sweep_outbox() == 2
+    assert set(published) == {lost.id, retry.id}
+
+
+@pytest.mark.django_db
+def test_sweep_is_not_starved_by_a_waiting_broadcast(
+    redis, published, make_notifications, template, settings
+):
+    settings.NOTIFICATIONS_OUTBOX_SWEEP_LIMIT = 3
+    broadcast = Broadcast.objects.create(
+        name="launch", template=template, channel=NotificationChannel.EMAIL
+    )
+    past = timezone.now() - timedelta(days=1)
+    waiting = make_notifications(5, broadcast=broadcast, next_attempt_at=past)
+    lanes.enqueue_bulk_batches(
+        broadcast.id, NotificationChannel.EMAIL, [n.id for n in waiting]
+    )
+    [retry] = make_notifications(attempts=1, next_attempt_at=timezone.now())
+
+    assert sweep_outbox() == 1
+    assert published == [retry.id]
+
+
+@pytest.mark.django_db
+def test_delivery_outcomes_are_counted_once_committed(
+    redis, make_notifications, template, django_capture_on_commit_callbacks
+):
+    broadcast = Broadcast.objects.create(
+        name="launch", template=template, channel=NotificationChannel.EMAIL
+    )
+    make_notifications(2, broadcast=broadcast)
+    claimed = claim_pending_notifications(NotificationChannel.EMAIL)
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            record_delivery_results(claimed, [None, ValueError("No recipient")])
+            raise RuntimeError("rolled back")
+    assert counters.read(broadcast.id) == (0, 0, None)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        record_delivery_results(claimed, [None, ValueError("No recipient")])
+    assert counters.read(broadcast.id) == (1, 1, None)
@@ -0,0 +1,40 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.notifications.models import Notification
+
+
+@pytest.fixture
+def client(users):
+    client = APIClient()
+    client.force_authenticate(users[0])
+    return client
+
+
+@pytest.mark.django_db
+def test_notification_pages_follow_the_keyset(client, users, make_notifications):
+    notifications = make_notifications(5)
+    # Equal timestamps: the trailing id must still order them totally
+    Notification.objects.update(created_at=timezone.now())
+    Notification.objects.create(user=users[1], content=notifications[0].content)
+    expected = [str(n.id) for n in sorted(notifications, key=lambda n: n.id)][::-1]
+    url = reverse("notifications:notification-list") + "?page_size=2"
+
+    pages = []
+    while url:
+        response = client.get(url).json()
+        pages.append([row["id"] for row in response["results"]])
+        url = response["next"]
+
+    assert pages == [expected[0:2], expected[2:4], expected[4:]]
+    previous = client.get(response["previous"]).json()
+    assert [row["id"] for row in previous["results"]] == expected[2:4]
+    assert previous["previous"] and previous["next"]
+
+
+@pytest.mark.django_db
+def test_malformed_cursor_is_not_found(client):
+    url = reverse("notifications:notification-list")
+    assert client.get(url, {"cursor": "not-a-cursor"}).status_code == 404
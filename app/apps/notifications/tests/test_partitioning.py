@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+
+from apps.notifications import partitioning
+from apps.notifications.partitioning import PartitioningError
+from apps.notifications.tasks import maintain_notification_partitions
+
+# Creating and detaching partitions needs PostgreSQL; these cover what runs
+# on any database.
+
+
+@pytest.mark.parametrize(
+    "day, offset, expected",
+    [
+        (date(2026, 5, 17), 0, date(2026, 5, 1)),
+        (date(2026, 11, 30), 3, date(2027, 2, 1)),
+        (date(2026, 1, 31), -1, date(2025, 12, 1)),
+        (date(2026, 3, 1), -15, date(2024, 12, 1)),
+    ],
+)
+def test_month_start(day, offset, expected):
+    assert partitioning._month_start(day, offset) == expected
+
+
+def test_partition_names_sort_by_month():
+    names = [partitioning.partition_name(date(2026, m, 1)) for m in (1, 10, 12)]
+    assert names == [
+        "notifications_notification_y2026m01",
+        "notifications_notification_y2026m10",
+        "notifications_notification_y2026m12",
+    ]
+    assert names == sorted(names)
+
+
+@pytest.mark.django_db
+def test_maintenance_is_off_unless_enabled(settings):
+    settings.NOTIFICATIONS_PARTITIONING = False
+    assert maintain_notification_partitions() is None
+
+    settings.NOTIFICATIONS_PARTITIONING = True
+    with pytest.raises(PartitioningError, match="requires PostgreSQL"):
+        maintain_notification_partitions()
+
+
+def test_no_retention_keeps_every_partition():
+    assert partitioning.expire_partitions(retention_months=0) == []
@@ -0,0 +1,70 @@
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.core.middleware import JWTAuthMiddleware
+from apps.notifications import counters, progress
+from apps.notifications.choices import NotificationChannel
+from apps.notifications.models import Broadcast, BroadcastStatus
+from apps.notifications.routing import websocket_urlpatterns
+
+application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+
+@pytest.fixture
+def broadcast(template):
+    return Broadcast.objects.create(
+        name="launch",
+        template=template,
+        channel=NotificationChannel.EMAIL,
+        status=BroadcastStatus.SENDING,
+        total_recipients=4,
+    )
+
+
+def connect(broadcast, query=""):
+    path = f"/ws/notifications/broadcasts/{broadcast.id}/progress/{query}"
+    return WebsocketCommunicator(application, path)
+
+
+@pytest.mark.django_db
+def test_subscriber_gets_a_snapshot_then_pushed_progress(redis, users, broadcast):
+    counters.set_total(broadcast.id, 4)
+    counters.record(broadcast.id, sent=1)
+    users[0].is_active = True  # accounts start inactive until activated
+    users[0].save()
+    token = AccessToken.for_user(users[0])
+
+    @async_to_sync
+    async def subscribe():
+        communicator = connect(broadcast, f"?token={token}")
+        connected, _ = await communicator.connect()
+        assert connected
+        initial = await communicator.receive_json_from()
+
+        await database_sync_to_async(counters.record)(broadcast.id, sent=1, failed=1)
+        await database_sync_to_async(progress.publish)(broadcast.id, throttle=False)
+        pushed = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return initial, pushed
+
+    initial, pushed = subscribe()
+
+    assert initial["broadcast"] == str(broadcast.id)
+    assert (initial["sent"], initial["failed"], initial["total"]) == (1, 0, 4)
+    assert (pushed["sent"], pushed["failed"], pushed["percent"]) == (2, 1, 75.0)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("query", ["", "?token=not-a-token"])
+def test_unauthenticated_subscriber_is_refused(redis, broadcast, query):
+    @async_to_sync
+    async def subscribe():
+        communicator = connect(broadcast, query)
+        connected, _ = await communicator.connect()
+        return connected
+
+    assert not subscribe()
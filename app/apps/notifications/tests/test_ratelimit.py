@@ -0,0 +1,121 @@
+import pytest
+from redis.exceptions import RedisError
+
+from apps.notifications import ratelimit
+from apps.notifications.ratelimit import LocalTokenBucket, RedisTokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen monotonic clock for the rate limiter; advance it with ``+=``."""
+
+    class Clock:
+        def __init__(self):
+            self.now = 1000.0
+            self.slept = []
+
+        def sleep(self, seconds):
+            self.slept.append(seconds)
+            self.now += seconds
+
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: clock.now)
+    monkeypatch.setattr(ratelimit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_local_bucket_allows_a_burst_then_spaces_tokens(clock):
+    bucket = LocalTokenBucket(rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1)
+    # Reserved ahead: the next token is due after the previous one
+    assert bucket.reserve() == pytest.approx(0.2)
+
+
+def test_local_bucket_refills_up_to_its_burst(clock):
+    bucket = LocalTokenBucket(rate=10, burst=3)
+    for _ in range(3):
+        bucket.reserve()
+    clock.now += 0.2
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1)
+
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1)
+
+
+def test_local_bucket_acquire_sleeps_until_its_token_is_due(clock):
+    bucket = LocalTokenBucket(rate=5, burst=1)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.2)
+    assert bucket.acquire(count=2) == pytest.approx(0.4)
+    assert clock.slept == [pytest.approx(0.2), pytest.approx(0.4)]
+
+
+def test_redis_bucket_is_shared_between_instances(redis):
+    first = RedisTokenBucket("provider", rate=10, burst=2)
+    second = RedisTokenBucket("provider", rate=10, burst=2)
+    assert first.reserve() == 0.0
+    assert second.reserve() == 0.0
+    # Redis' clock runs on between calls, so the waits can only shrink
+    first_wait, second_wait = first.reserve(), second.reserve()
+    assert 0 < first_wait <= 0.1
+    assert first_wait < second_wait <= 0.2
+    assert RedisTokenBucket("other", rate=10, burst=2).reserve() == 0.0
+
+
+def test_redis_bucket_lets_sends_through_when_redis_is_down(monkeypatch):
+    def unavailable(**kwargs):
+        raise RedisError("Connection refused")
+
+    monkeypatch.setattr(
+        RedisTokenBucket, "_get_script", staticmethod(lambda: unavailable)
+    )
+    assert RedisTokenBucket("provider", rate=1, burst=1).acquire() == 0.0
+
+
+class RateLimitedBackend:
+    def rate_limit(self):
+        return "provider", 10
+
+
+@pytest.fixture
+def local_buckets(monkeypatch, settings):
+    settings.NOTIFICATIONS_RATE_LIMIT_BACKEND = "local"
+    settings.NOTIFICATIONS_BULK_RATE_SHARE = 0.8
+    monkeypatch.setattr(ratelimit, "_local_buckets", {})
+
+
+def test_transactional_lane_borrows_idle_bulk_capacity(clock, local_buckets):
+    bucket = ratelimit.provider_bucket(RateLimitedBackend(), "transactional")
+    # Its own 2 tokens, then the 8 the idle bulk lane isn't using
+    assert [bucket.reserve() for _ in range(10)] == [0.0] * 10
+    assert bucket.reserve() == pytest.approx(0.5)
+
+
+def test_bulk_lane_never_eats_into_the_transactional_reservation(clock, local_buckets):
+    bulk = ratelimit.provider_bucket(RateLimitedBackend(), "bulk")
+    transactional = ratelimit.provider_bucket(RateLimitedBackend(), "transactional")
+    # Its own 8 tokens, then one from the full (idle) transactional bucket
+    assert [bulk.reserve() for _ in range(9)] == [0.0] * 9
+    assert bulk.reserve() > 0
+    assert transactional.reserve() == 0.0
+
+
+def test_lanes_share_an_unlimited_provider(local_buckets):
+    class UnlimitedBackend:
+        def rate_limit(self):
+            return "provider", None
+
+    assert ratelimit.provider_bucket(UnlimitedBackend(), "transactional") is None
+    assert ratelimit.provider_bucket(UnlimitedBackend(), "bulk") is None
+
+
+def test_redis_bucket_takes_now_only_above_the_kept_tokens(redis):
+    bucket = RedisTokenBucket("provider", rate=1, burst=3)
+    assert bucket.take_now(keep=2)
+    assert not bucket.take_now(keep=2)
+    assert bucket.take_now()
+    assert bucket.take_now()
+    assert not bucket.take_now()
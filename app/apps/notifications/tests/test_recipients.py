@@ -0,0 +1,43 @@
+import pytest
+
+from apps.notifications.choices import NotificationChannel
+from apps.notifications.models import UserNotificationSetting
+from apps.notifications.recipients import Recipient, resolve_recipients
+
+
+@pytest.mark.django_db
+def test_opted_out_and_deleted_users_are_excluded_in_one_query(
+    users, django_assert_num_queries
+):
+    opted_out, kept, deleted = users
+    UserNotificationSetting.objects.create(user=opted_out, email_enabled=False)
+    # Opting out of another channel doesn't exclude them from email
+    UserNotificationSetting.objects.create(user=kept, in_app_enabled=False)
+    pkids = [user.pkid for user in users]
+    deleted.delete()
+
+    with django_assert_num_queries(1):
+        recipients = resolve_recipients(NotificationChannel.EMAIL, pkids)
+
+    assert [r.email for r in recipients] == [kept.email]
+    assert isinstance(recipients[0], Recipient)
+    assert recipients[0].id == kept.id
+    assert recipients[0].get_full_name() == kept.get_full_name()
+
+
+@pytest.mark.django_db
+def test_sms_recipients_carry_their_phone_number(users):
+    for n, user in enumerate(users):
+        user.profile.phone_number = f"+1415555010{n}"
+        user.profile.save()
+    UserNotificationSetting.objects.create(user=users[1], sms_enabled=False)
+
+    recipients = resolve_recipients(
+        NotificationChannel.SMS, [user.pkid for user in users]
+    )
+
+    numbers = {r.pkid: r.phone_number for r in recipients}
+    assert numbers == {
+        users[0].pkid: "+14155550100",
+        users[2].pkid: "+14155550102",
+    }
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.notifications import tasks
+from apps.notifications.choices import NotificationChannel
+from apps.notifications.models import Broadcast, BroadcastStatus
+
+
+@pytest.fixture
+def started(monkeypatch):
+    """Ids handed to process_broadcast, instead of running it."""
+    ids = []
+    monkeypatch.setattr(tasks.process_broadcast, "delay", ids.append)
+    return ids
+
+
+@pytest.fixture
+def make_broadcast(template):
+    def make(name, **fields):
+        return Broadcast.objects.create(
+            name=name,
+            template=template,
+            channel=NotificationChannel.IN_APP,
+            **{"status": BroadcastStatus.SCHEDULED, **fields},
+        )
+
+    return make
+
+
+@pytest.mark.django_db
+def test_due_broadcasts_are_dispatched_once(
+    settings, make_broadcast, started, django_capture_on_commit_callbacks
+):
+    settings.NOTIFICATIONS_SCHEDULER_REDISPATCH_AFTER = 600
+    now = timezone.now()
+    due = make_broadcast("due", scheduled_at=now - timedelta(minutes=1))
+    make_broadcast("future", scheduled_at=now + timedelta(hours=1))
+    make_broadcast("draft", scheduled_at=now, status=BroadcastStatus.DRAFT)
+    make_broadcast("in flight", scheduled_at=now, dispatched_at=now)
+    # Dispatched, but its message never started it
+    lost = make_broadcast(
+        "lost",
+        scheduled_at=now - timedelta(hours=1),
+        dispatched_at=now - timedelta(hours=1),
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert tasks.dispatch_scheduled_broadcasts() == 2
+    # Oldest schedule first
+    assert started == [str(lost.id), str(due.id)]
+    due.refresh_from_db()
+    assert due.dispatched_at is not None
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert tasks.dispatch_scheduled_broadcasts() == 0
+    assert len(started) == 2
+
+
+@pytest.mark.django_db
+def test_sending_a_future_broadcast_leaves_it_to_the_scheduler(
+    users, make_broadcast, started
+):
+    broadcast = make_broadcast(
+        "later",
+        status=BroadcastStatus.DRAFT,
+        scheduled_at=timezone.now() + timedelta(hours=1),
+    )
+    client = APIClient()
+    client.force_authenticate(users[0])
+
+    response = client.post(reverse("notifications:broadcast-send", args=[broadcast.id]))
+
+    assert response.json() == {"status": "scheduled"}
+    assert started == []
+    broadcast.refresh_from_db()
+    assert broadcast.status == BroadcastStatus.SCHEDULED
+    assert broadcast.dispatched_at is None
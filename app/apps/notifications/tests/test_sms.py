@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+from apps.notifications import aio
+from apps.notifications.backends import (
+    AsyncTwilioSMSBackend,
+    SMSDeliveryError,
+    is_permanent_failure,
+)
+
+# Numbers the stand-in rejects, with Twilio's status for each
+REJECTED = {
+    "+15005550001": 400,  # invalid number: permanent
+    "+15005550009": 429,  # rate limited: transient
+    "+15005550010": 503,  # provider outage: transient
+}
+
+
+class TwilioStandIn:
+    """A local aiohttp server answering Twilio's Messages endpoint."""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = set()
+        self.in_flight = self.max_in_flight = 0
+
+    async def handle(self, request):
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            data = dict(await request.post())
+            await asyncio.sleep(0.05)
+        finally:
+            self.in_flight -= 1
+        data["Account"] = request.match_info["account"]
+        data["Authorization"] = request.headers.get("Authorization")
+        self.messages.append(data)
+        status = REJECTED.get(data["To"], 201)
+        if status != 201:
+            return web.json_response({"message": "Rejected"}, status=status)
+        return web.json_response({"sid": f"SM{len(self.messages)}", "status": "queued"})
+
+
+@pytest.fixture
+def twilio(settings, monkeypatch):
+    stand_in = TwilioStandIn()
+    app = web.Application()
+    app.router.add_post("/2010-04-01/Accounts/{account}/Messages.json", stand_in.handle)
+    loop = asyncio.new_event_loop()
+    app_runner = web.AppRunner(app)
+    loop.run_until_complete(app_runner.setup())
+    site = web.TCPSite(app_runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    settings.TWILIO_API_BASE_URL = f"http://127.0.0.1:{port}/"
+    settings.TWILIO_ACCOUNT_SID = "AC123"
+    settings.TWILIO_AUTH_TOKEN = "secret"
+    settings.TWILIO_PHONE_NUMBER = "+15005550006"
+    settings.NOTIFICATIONS_SMS_CONCURRENCY = 4
+    # A fresh process loop and session, closed after the test
+    runner = aio.AsyncRunner()
+    monkeypatch.setattr(aio, "runner", runner)
+    yield stand_in
+
+    runner.close()
+    asyncio.run_coroutine_threadsafe(app_runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    loop.close()
+
+
+def batch(*numbers):
+    return [
+        {"phone_number": number, "message": "Your code is 1234"} for number in numbers
+    ]
+
+
+def test_batch_is_sent_concurrently_up_to_the_limit(twilio):
+    numbers = [f"+1555000{n:04d}" for n in range(12)]
+    results = AsyncTwilioSMSBackend().send_many(batch(*numbers))
+
+    assert results == [None] * 12
+    assert sorted(message["To"] for message in twilio.messages) == numbers
+    assert 1 < twilio.max_in_flight <= 4
+    message = twilio.messages[0]
+    assert message["Account"] == "AC123"
+    assert message["From"] == "+15005550006"
+    assert message["Body"] == "Your code is 1234"
+    assert message["Authorization"].startswith("Basic ")
+
+
+def test_failures_are_returned_per_message_and_classified(twilio):
+    results = AsyncTwilioSMSBackend().send_many(
+        batch("+15550000001", *REJECTED, "+15550000002")
+    )
+
+    assert results[0] is None and results[-1] is None
+    errors = dict(zip(REJECTED, results[1:-1]))
+    assert all(isinstance(error, SMSDeliveryError) for error in errors.values())
+    assert {number: error.status for number, error in errors.items()} == REJECTED
+    assert is_permanent_failure(errors["+15005550001"])
+    assert not is_permanent_failure(errors["+15005550009"])
+    assert not is_permanent_failure(errors["+15005550010"])
+
+
+def test_send_raises_a_rejection(twilio):
+    with pytest.raises(SMSDeliveryError) as rejected:
+        AsyncTwilioSMSBackend().send("+15005550001", "Hi")
+    assert rejected.value.permanent
+
+
+def test_session_and_connections_are_reused_across_batches(twilio):
+    backend = AsyncTwilioSMSBackend()
+    backend.send_many(batch(*[f"+1555000{n:04d}" for n in range(4)]))
+    session = aio.runner._session
+    backend.send_many(batch(*[f"+1555100{n:04d}" for n in range(4)]))
+
+    assert aio.runner._session is session
+    assert len(twilio.messages) == 8
+    # Keep-alive: the second batch went over the first batch's connections
+    assert len(twilio.connections) <= 4
@@ -0,0 +1,22 @@
+from apps.notifications.templating import referenced_variables
+
+
+def test_loop_variable_is_local_to_its_block():
+    source = (
+        "{% for user in members %}{{ user.email }}{{ forloop.counter }}{% endfor %}"
+        "{{ user.first_name }}"
+    )
+    assert referenced_variables(source) == ["members", "user"]
+
+
+def test_with_variable_is_local_to_its_block():
+    source = "{% with name=user.first_name %}{{ name }}{% endwith %}{{ site_name }}"
+    assert referenced_variables(source) == ["site_name", "user"]
+
+
+def test_nested_bindings():
+    source = (
+        "{% for item in items %}{% with title=item.title %}{{ title }}{{ extra }}"
+        "{% endwith %}{{ title }}{% endfor %}"
+    )
+    assert referenced_variables(source) == ["extra", "items", "title"]
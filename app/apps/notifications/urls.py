@@ -4,7 +4,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     NotificationTemplateViewSet,
     BroadcastViewSet,
+    SegmentViewSet,
     NotificationViewSet,
+    InboxViewSet,
     UserNotificationSettingViewSet,
     EmailConfigurationViewSet,
 )
@@ -19,9 +21,11 @@ router.register(
     r"notifications/settings", UserNotificationSettingViewSet, basename="settings"
 )
 router.register(r"notifications/broadcasts", BroadcastViewSet, basename="broadcast")
+router.register(r"notifications/segments", SegmentViewSet, basename="segment")
 router.register(
     r"notifications/notifications", NotificationViewSet, basename="notification"
 )
+router.register(r"notifications/inbox", InboxViewSet, basename="inbox")
 
 router.register(
     r"notifications/email-configs", EmailConfigurationViewSet, basename="emailconfig"
@@ -1,11 +1,24 @@
 import re
 import logging
+from functools import partial
+
+from django.db import transaction
 from django.template import Template, Context
 from django.utils import timezone
 
-from .choices import NotificationChannel, NotificationStatus
-from .models import Notification, UserNotificationSetting
-from .backends import DjangoSMTPBackend, ConsoleSMSBackend, TwilioSMSBackend
+from .choices import NotificationChannel, NotificationPriority, NotificationStatus
+from .lanes import queue_for
+from .models import Notification, NotificationContent
+from .recipients import Recipient
+from .templating import template_cache
+from .backends import (
+    DatabaseSMTPBackend,
+    DjangoSMTPBackend,
+    ConsoleSMSBackend,
+    AsyncTwilioSMSBackend,
+    InAppBackend,
+    TwilioSMSBackend,
+)
 from django.conf import settings
 
 
@@ -13,24 +26,81 @@ logger = logging.getLogger(__name__)
 
 
 def get_email_backend():
-    backend_class = getattr(settings, "EMAIL_BACKEND_CLASS", DjangoSMTPBackend)
-    return backend_class()
+    backend_name = getattr(settings, "EMAIL_BACKEND", "database")
+    if backend_name == "smtp":
+        return DjangoSMTPBackend()
+    return DatabaseSMTPBackend()
 
 
 def get_sms_backend():
     backend_name = getattr(settings, "SMS_BACKEND", "console")
     if backend_name == "twilio":
+        return AsyncTwilioSMSBackend()
+    if backend_name == "twilio_sdk":
         return TwilioSMSBackend()
     return ConsoleSMSBackend()
 
 
+def get_in_app_backend():
+    return InAppBackend()
+
+
+def get_backend(channel):
+    """The configured delivery backend for ``channel``."""
+    if channel == NotificationChannel.EMAIL:
+        return get_email_backend()
+    if channel == NotificationChannel.IN_APP:
+        return get_in_app_backend()
+    return get_sms_backend()
+
+
 def render_template(template_str, context):
     """Render a string template with Django template language."""
     t = Template(template_str)
     return t.render(Context(context))
 
 
-def send_notification(
+def render_named(name, context):
+    """
+    Render the active NotificationTemplate called ``name`` from the compiled
+    template cache. Returns ``(subject, body, html_body)``.
+    """
+    template = template_cache.resolve(name)
+    return render_notification(template, NotificationChannel.EMAIL, context)
+
+
+def common_context(context=None):
+    """Copy ``context`` and add the variables every template can use."""
+    # Copy: callers (e.g. broadcasts) share one base context across users
+    context = dict(context or {})
+
+    # Add common context variables (primitive values ONLY!)
+    if "site_name" not in context:
+        context["site_name"] = getattr(settings, "SITE_NAME", "Our Site")
+    if "year" not in context:
+        context["year"] = timezone.now().year
+    return context
+
+
+def render_notification(template, channel, context):
+    """Render ``template`` for ``channel``. Returns ``(subject, body, html_body)``."""
+    if channel == NotificationChannel.EMAIL:
+        return (
+            template_cache.render(template, "subject", context),
+            template_cache.render(template, "template", context),
+            template_cache.render(template, "html_template", context) or None,
+        )
+    if channel == NotificationChannel.IN_APP:
+        return (
+            template_cache.render(template, "subject", context),
+            template_cache.render(template, "template", context),
+            None,
+        )
+    # SMS
+    return "", template_cache.render(template, "template", context), None
+
+
+def build_notification(
     *,
     user=None,
     recipient_email=None,
@@ -42,119 +112,180 @@ def send_notification(
     template=None,
     context=None,
     broadcast=None,
+    rendered=None,
+    priority=None,
 ):
+    """
+    Resolve the recipient, check preferences and render the message.
+    Returns an unsaved Notification, or None if the user opted out.
+
+    ``user`` may be a User or a ``recipients.Recipient`` record.
+    ``template`` may be a NotificationTemplate or the name of an active one.
+    ``rendered`` is already rendered NotificationContent for templates that
+    don't depend on the recipient (see process_broadcast_partition).
+    ``priority`` defaults to BULK for broadcasts and TRANSACTIONAL otherwise.
+    """
+    if isinstance(template, str):
+        template = template_cache.resolve(template)
+
+    # Determine recipient
+    if user:
+        if channel == NotificationChannel.EMAIL:
+            recipient_email = user.email
+        elif channel == NotificationChannel.SMS:
+            phone_number = getattr(user, "phone_number", None) or getattr(
+                getattr(user, "profile", None), "phone_number", None
+            )
+
+    # Validate at least one contact method
+    if channel == NotificationChannel.EMAIL and not recipient_email:
+        raise ValueError("No email recipient provided")
+    if channel == NotificationChannel.SMS and not phone_number:
+        raise ValueError("No phone number provided")
+    if channel == NotificationChannel.IN_APP and not user:
+        raise ValueError("No user provided")
+
+    # Check user preferences (if user is known). No settings row means no
+    # explicit opt-out; Recipient records were already filtered in SQL.
+    prefs = getattr(user, "notification_settings", None) if user else None
+    if prefs:
+        if channel == NotificationChannel.EMAIL and not prefs.email_enabled:
+            logger.info(f"Email disabled for user {user.email}, skipping.")
+            return None
+        if channel == NotificationChannel.SMS and not prefs.sms_enabled:
+            logger.info(f"SMS disabled for user {user}, skipping.")
+            return None
+        if channel == NotificationChannel.IN_APP and not prefs.in_app_enabled:
+            logger.info(f"In-app notifications disabled for user {user}, skipping.")
+            return None
+
+    # Only the caller's own variables are kept on the notification: site and
+    # user variables can be rebuilt, and broadcasts share theirs.
+    stored_context = {} if broadcast else dict(context or {})
+
+    # --- Template rendering with safe context ---
+    if template:
+        context = common_context(context)
+
+        # 🟢 SAFE: Convert User object to dictionary (only if the template uses it)
+        if user and template.uses_variable("user"):
+            context["user"] = {
+                "id": str(user.id),
+                "pkid": user.pkid,
+                "email": user.email,
+                "username": user.username,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "full_name": user.get_full_name(),
+                "is_active": user.is_active,
+                "role": user.role if hasattr(user, "role") else None,
+            }
+
+        if rendered is None:
+            rendered = NotificationContent.pack(
+                *render_notification(template, channel, context)
+            )
+    else:
+        # Use provided subject/body (no rendering)
+        rendered = NotificationContent.pack(subject, body, html_body)
+
+    if isinstance(user, Recipient):
+        user_fk = {"user_id": user.pkid}
+    else:
+        user_fk = {"user": user}  # 🟢 This is a FK, NOT stored in JSON – it's fine
+
+    return Notification(
+        **user_fk,
+        recipient=recipient_email or "",
+        phone_number=phone_number or "",
+        channel=channel,
+        content=rendered,
+        template=template,
+        context=stored_context,  # 🟢 Now contains ONLY JSON-serializable data
+        broadcast=broadcast,
+        priority=priority
+        or (
+            NotificationPriority.BULK
+            if broadcast
+            else NotificationPriority.TRANSACTIONAL
+        ),
+    )
+
+
+def save_notifications(notifications):
+    """
+    Insert built notifications, storing each distinct content once. Content
+    that is already stored (an identical earlier message) is not rewritten.
+    """
+    contents = {n.content_id: n.content for n in notifications}
+    with transaction.atomic():
+        NotificationContent.objects.bulk_create(
+            contents.values(), ignore_conflicts=True
+        )
+        # Hold the rows until commit so the archiver can't prune an existing
+        # one before it is referenced; one pruned meanwhile is stored again.
+        stored = set(
+            NotificationContent.objects.select_for_update(no_key=True)
+            .filter(digest__in=contents)
+            .values_list("digest", flat=True)
+        )
+        if len(stored) < len(contents):
+            NotificationContent.objects.bulk_create(
+                [
+                    content
+                    for digest, content in contents.items()
+                    if digest not in stored
+                ],
+                ignore_conflicts=True,
+            )
+        return Notification.objects.bulk_create(notifications)
+
+
+def deliver_notification(notification):
+    """
+    Save a built notification and hand it to its sender, once the caller's
+    transaction (if any) has committed the row.
+    """
+    # Create notification log (status = pending). The row is the outbox
+    # entry; sweep_outbox re-publishes it if the task below never runs.
+    save_notifications([notification])
+
+    # Dispatch async task on the notification's priority lane
+    from .tasks import send_in_app_batch, send_notification_task
+
+    if notification.channel == NotificationChannel.IN_APP:
+        task, args = send_in_app_batch, [[str(notification.id)]]
+    else:
+        task, args = send_notification_task, [str(notification.id)]
+    transaction.on_commit(
+        partial(task.apply_async, args=args, queue=queue_for(notification.priority))
+    )
+
+
+def send_notification(**kwargs):
     """
     Core sending function.
     - Creates a Notification log record.
     - Checks user notification preferences.
     - Calls the appropriate backend asynchronously via Celery task.
+    - Notifications from a template in digest mode are buffered instead, and
+      returned unsaved (see digests.py).
+
+    Accepts the same keyword arguments as ``build_notification``.
     """
-    try:
-        # Determine recipient
-        if user:
-            if channel == NotificationChannel.EMAIL:
-                recipient_email = user.email
-            elif channel == NotificationChannel.SMS:
-                phone_number = getattr(user, "phone_number", None) or getattr(
-                    getattr(user, "profile", None), "phone_number", None
-                )
-
-        # Validate at least one contact method
-        if channel == NotificationChannel.EMAIL and not recipient_email:
-            raise ValueError("No email recipient provided")
-        if channel == NotificationChannel.SMS and not phone_number:
-            raise ValueError("No phone number provided")
-
-        # Check user preferences (if user is known)
-        if user:
-            try:
-                prefs = user.notification_settings
-                if channel == NotificationChannel.EMAIL and not prefs.email_enabled:
-                    logger.info(f"Email disabled for user {user.email}, skipping.")
-                    return None
-                if channel == NotificationChannel.SMS and not prefs.sms_enabled:
-                    logger.info(f"SMS disabled for user {user}, skipping.")
-                    return None
-            except UserNotificationSetting.DoesNotExist:
-                pass  # send anyway if no explicit opt-out
-
-        # --- Template rendering with safe context ---
-        if template:
-            context = context or {}
-
-            # Add common context variables (primitive values ONLY!)
-            if "site_name" not in context:
-                context["site_name"] = getattr(settings, "SITE_NAME", "Our Site")
-            if "year" not in context:
-                context["year"] = timezone.now().year
-
-            # 🟢 SAFE: Convert User object to dictionary
-            if user:
-                context["user"] = {
-                    "id": str(user.id),
-                    "pkid": user.pkid,
-                    "email": user.email,
-                    "username": user.username,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "full_name": user.get_full_name(),
-                    "is_active": user.is_active,
-                    "role": user.role if hasattr(user, "role") else None,
-                }
-
-            if channel == NotificationChannel.EMAIL:
-                subject = (
-                    render_template(template.subject, context)
-                    if template.subject
-                    else ""
-                )
-                body = render_template(template.template, context)
-                html_body = (
-                    render_template(template.html_template, context)
-                    if template.html_template
-                    else None
-                )
-            else:  # SMS
-                body = render_template(template.template, context)
-                html_body = None
-        else:
-            # Use provided subject/body (no rendering)
-            subject = subject or ""
-            body = body or ""
-            html_body = html_body
-
-        # Create notification log (status = pending)
-        notification = Notification.objects.create(
-            user=user,  # 🟢 This is a FK, NOT stored in JSON – it's fine
-            recipient=recipient_email,
-            phone_number=phone_number,
-            channel=channel,
-            subject=subject,
-            body=body,
-            template=template,
-            context=context or {},  # 🟢 Now contains ONLY JSON-serializable data
-            broadcast=broadcast,
-        )
+    from . import digests
 
-        # Dispatch async task
-        from .tasks import send_notification_task
+    try:
+        notification = build_notification(**kwargs)
+        if notification is None:
+            return None
 
-        send_notification_task.delay(str(notification.id))
+        if digests.is_digested(notification):
+            transaction.on_commit(partial(digests.buffer, notification))
+            return notification
 
+        deliver_notification(notification)
         return notification
     except Exception as e:
         logger.exception(f"Failed to send notification: {e}")
         raise e
-
-
-def get_email_backend():
-    backend_name = getattr(settings, "EMAIL_BACKEND", "database")
-    if backend_name == "database":
-        from .backends import DatabaseSMTPBackend
-
-        return DatabaseSMTPBackend()
-    elif backend_name == "smtp":
-        from .backends import DjangoSMTPBackend
-
-        return DjangoSMTPBackend()
-    return DatabaseSMTPBackend()
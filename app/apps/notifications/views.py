@@ -1,24 +1,35 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import ProtectedError
 from django.utils import timezone
 
 from .models import (
     NotificationTemplate,
     Broadcast,
     Notification,
+    Segment,
     UserNotificationSetting,
     BroadcastStatus,
 )
 from .serializers import (
     NotificationTemplateSerializer,
     BroadcastSerializer,
+    SegmentSerializer,
     NotificationSerializer,
     UserNotificationSettingSerializer,
+    InboxMarkReadSerializer,
 )
-from .tasks import process_broadcast
+from apps.core.pagination import KeysetPagination
+from apps.core.views import CompiledListMixin
+
+from . import estimates, inbox, segments
+from .tasks import process_broadcast, refresh_segments
 from .utils import send_notification
 from .choices import NotificationChannel
 
@@ -45,27 +56,91 @@ class BroadcastViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"])
     def send(self, request, pk=None):
         broadcast = self.get_object()
-        if broadcast.status != BroadcastStatus.DRAFT:
+        now = timezone.now()
+        # Future broadcasts are started by dispatch_scheduled_broadcasts
+        immediate = not broadcast.scheduled_at or broadcast.scheduled_at <= now
+        # Conditional update so two concurrent requests can't both schedule it
+        claimed = Broadcast.objects.filter(
+            pk=broadcast.pk, status=BroadcastStatus.DRAFT
+        ).update(
+            status=BroadcastStatus.SCHEDULED,
+            dispatched_at=now if immediate else None,
+            updated_at=now,
+        )
+        if not claimed:
             return Response(
                 {"error": "Broadcast is not in draft state."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        if broadcast.scheduled_at:
-            broadcast.status = BroadcastStatus.SCHEDULED
-            broadcast.save()
-            # Schedule Celery task (use apply_async with eta)
-            process_broadcast.apply_async(
-                args=[str(broadcast.id)], eta=broadcast.scheduled_at
-            )
-        else:
-            broadcast.status = BroadcastStatus.SCHEDULED
-            broadcast.save()
-            # Send immediately
+        if immediate:
             process_broadcast.delay(str(broadcast.id))
         return Response({"status": "scheduled"})
 
+    @action(detail=True, methods=["get"])
+    def estimate(self, request, pk=None):
+        """
+        Dry run: estimated recipient count, ``?sample=`` rendered messages
+        (3 by default) and the predicted send duration. Sends nothing and
+        never scans the users table.
+        """
+        try:
+            sample = max(int(request.query_params["sample"]), 0)
+        except (KeyError, ValueError):
+            sample = 3
+        return Response(estimates.estimate_broadcast(self.get_object(), sample))
+
+
+class SegmentViewSet(viewsets.ModelViewSet):
+    """
+    Named user segments (see segments.py). Membership is built in the
+    background after a segment is created or its definition changes, and
+    then kept up to date as users change.
+    """
+
+    # Bitmaps can be large; the API only shows their size
+    queryset = Segment.objects.defer("bitmap")
+    serializer_class = SegmentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+        transaction.on_commit(refresh_segments.delay)
+
+    def perform_update(self, serializer):
+        if {"filter", "expression"} & serializer.validated_data.keys():
+            serializer.save(refreshed_at=None)
+            transaction.on_commit(refresh_segments.delay)
+        else:
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        names = segments.dependents(instance.id)
+        if names:
+            raise ValidationError(
+                {"error": f"Segment is used by segments: {', '.join(names)}."}
+            )
+        try:
+            instance.delete()
+        except ProtectedError:
+            raise ValidationError({"error": "Segment is used by broadcasts."})
+
+    @action(detail=True, methods=["post"])
+    def rebuild(self, request, pk=None):
+        """
+        Rebuild membership from scratch, e.g. after bulk user changes that
+        bypass model signals (``QuerySet.update``, ``bulk_create``).
+        """
+        segment = self.get_object()
+        Segment.objects.filter(pk=segment.pk).update(refreshed_at=None)
+        transaction.on_commit(refresh_segments.delay)
+        return Response({"status": "rebuilding"})
+
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class NotificationViewSet(CompiledListMixin, viewsets.ReadOnlyModelViewSet):
     """
     Read‑only list/retrieve of sent notifications.
     Users can only see their own notifications.
@@ -73,12 +148,49 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
 
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Notification.objects.select_related("user", "content")
         if user.is_staff:
-            return Notification.objects.all()
-        return Notification.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
+
+
+class InboxViewSet(viewsets.ViewSet):
+    """
+    The current user's inbox, served from Redis (see inbox.py): the latest
+    items, the unread badge and marking items read.
+    Authenticates from the access token alone, so polling the badge never
+    queries the database.
+    """
+
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        try:
+            limit = int(request.query_params["limit"])
+        except (KeyError, ValueError):
+            limit = None
+        unread, items = inbox.recent(request.user.id, limit)
+        return Response({"unread": unread, "results": items})
+
+    @action(detail=False, methods=["get"])
+    def unread(self, request):
+        return Response({"unread": inbox.unread_count(request.user.id)})
+
+    @action(detail=False, methods=["post"])
+    def mark_read(self, request):
+        serializer = InboxMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changed = inbox.mark_read(request.user.id, serializer.validated_data["ids"])
+        return Response({"marked": changed})
+
+    @action(detail=False, methods=["post"])
+    def mark_all_read(self, request):
+        return Response({"marked": inbox.mark_all_read(request.user.id)})
 
 
 class UserNotificationSettingViewSet(
@@ -12,6 +12,8 @@ from rest_framework.mixins import (
     ListModelMixin,
 )
 
+from apps.core.pagination import KeysetPagination
+from apps.core.views import CompiledListMixin
 from apps.users.models import User, Profile, Role
 from apps.users.api.serializers import (
     UserSerializer,
@@ -24,19 +26,24 @@ from apps.users.api.renderers import ProfileJSONRenderer
 logger = logging.getLogger(__name__)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserPagination(KeysetPagination):
+    ordering = ("-date_joined", "-pkid")
+
+
+class UserViewSet(CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for User model.
     Admin users can list and manage all users; regular users can only retrieve/update their own.
+    Lists are keyset-paginated newest first; there is no client-chosen ordering,
+    and are serialized by the compiled UserSerializer.
     """
 
     queryset = User.objects.all().select_related("profile")
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = UserPagination
+    filter_backends = [filters.SearchFilter]
     search_fields = ["username", "email", "first_name", "last_name"]
-    ordering_fields = ["date_joined", "last_login", "username"]
-    ordering = ["-date_joined"]
 
     def get_permissions(self):
         if self.action in ["list", "destroy"]:
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["-date_joined", "-pkid"], name="users_user_date_jo_c1fb0e_idx"
+            ),
+        ),
+    ]
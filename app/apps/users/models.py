@@ -62,6 +62,8 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name_plural = _("Users")
         indexes = [
             models.Index(fields=["email"]),
+            models.Index(fields=["-date_joined", "-pkid"]),
+            models.Index(fields=["is_active", "role"]),
         ]
 
     def __str__(self):
@@ -110,6 +112,7 @@ class Profile(TimeStampedUUIDModel):
         verbose_name_plural = _("Profiles")
         indexes = [
             models.Index(fields=["phone_number"]),
+            models.Index(fields=["country", "city"]),
         ]
 
     def __str__(self):
@@ -71,6 +71,7 @@ THIRD_PARTY_APPS = [
     "djoser",
     "djcelery_email",
     "drf_spectacular",
+    "django_celery_beat",
 ]
 
 INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS + THIRD_PARTY_APPS
@@ -110,6 +111,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "djangostarter.wsgi.application"
+ASGI_APPLICATION = "djangostarter.asgi.application"
 
 # -----------------------------
 # Channels (WebSocket)
@@ -133,6 +135,15 @@ CHANNEL_LAYERS = {
 #     },
 #     "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
 # }
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    # Archived notification history (see apps/notifications/archive.py)
+    "notification_archive": {
+        "BACKEND": "helpers.cloudflare.storages.ProtectedMediaStorage",
+        "OPTIONS": helpers.cloudflare.settings.CLOUDFLARE_R2_CONFIG_OPTIONS,
+    },
+}
 
 # -----------------------------
 # Database
@@ -298,6 +309,229 @@ EMAIL_HOST_USER = env("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD", default="")
 EMAIL_USE_TLS = env.bool("EMAIL_USE_TLS", default=True)
 DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="noreply@example.com")
+
+# 'console', 'twilio' (async REST client) or 'twilio_sdk' (blocking twilio SDK)
+SMS_BACKEND = env("SMS_BACKEND", default="console")
+TWILIO_ACCOUNT_SID = env("TWILIO_ACCOUNT_SID", default="")
+TWILIO_AUTH_TOKEN = env("TWILIO_AUTH_TOKEN", default="")
+TWILIO_PHONE_NUMBER = env("TWILIO_PHONE_NUMBER", default="")
+# Point at a local stand-in to test without hitting Twilio
+TWILIO_API_BASE_URL = env("TWILIO_API_BASE_URL", default="https://api.twilio.com")
+
+# Max pending notifications claimed by one send_email_batch/send_sms_batch/
+# send_in_app_batch task
+NOTIFICATIONS_EMAIL_BATCH_SIZE = env.int("NOTIFICATIONS_EMAIL_BATCH_SIZE", default=100)
+NOTIFICATIONS_SMS_BATCH_SIZE = env.int("NOTIFICATIONS_SMS_BATCH_SIZE", default=50)
+NOTIFICATIONS_IN_APP_BATCH_SIZE = env.int(
+    "NOTIFICATIONS_IN_APP_BATCH_SIZE", default=1000
+)
+# Recipients rendered, bulk-inserted and enqueued together by a broadcast partition
+NOTIFICATIONS_BROADCAST_CHUNK_SIZE = env.int(
+    "NOTIFICATIONS_BROADCAST_CHUNK_SIZE", default=1000
+)
+# Recipients per broadcast partition (one process_broadcast_partition task each)
+NOTIFICATIONS_BROADCAST_PARTITION_SIZE = env.int(
+    "NOTIFICATIONS_BROADCAST_PARTITION_SIZE", default=50000
+)
+# Seconds without a heartbeat after which a running partition is resumed
+NOTIFICATIONS_PARTITION_STALE_AFTER = env.int(
+    "NOTIFICATIONS_PARTITION_STALE_AFTER", default=300
+)
+# Max in-flight requests (and pooled connections) of the async SMS sender
+NOTIFICATIONS_SMS_CONCURRENCY = env.int("NOTIFICATIONS_SMS_CONCURRENCY", default=10)
+NOTIFICATIONS_SMS_TIMEOUT = env.int("NOTIFICATIONS_SMS_TIMEOUT", default=15)
+# Per-process SMTP connection pool (see apps/notifications/connections.py)
+NOTIFICATIONS_SMTP_POOL_SIZE = env.int("NOTIFICATIONS_SMTP_POOL_SIZE", default=2)
+# Concurrent SMTP sessions of the run_email_engine worker
+NOTIFICATIONS_EMAIL_ENGINE_CONNECTIONS = env.int(
+    "NOTIFICATIONS_EMAIL_ENGINE_CONNECTIONS", default=4
+)
+# Idle seconds after which a pooled connection is NOOP-checked before reuse
+NOTIFICATIONS_SMTP_HEALTHCHECK_AFTER = env.int(
+    "NOTIFICATIONS_SMTP_HEALTHCHECK_AFTER", default=30
+)
+# Token-bucket rate limits in messages/second (0 = unlimited). An active
+# EmailConfiguration's max_send_rate takes precedence for database email.
+NOTIFICATIONS_EMAIL_RATE_LIMIT = env.float("NOTIFICATIONS_EMAIL_RATE_LIMIT", default=0)
+NOTIFICATIONS_SMS_RATE_LIMIT = env.float("NOTIFICATIONS_SMS_RATE_LIMIT", default=0)
+# "redis" shares buckets across workers; "local" keeps them per process
+NOTIFICATIONS_RATE_LIMIT_BACKEND = env(
+    "NOTIFICATIONS_RATE_LIMIT_BACKEND", default="redis"
+)
+# Share of a provider's rate limit reserved for bulk; transactional gets the rest.
+# Each lane borrows what the other leaves idle (see ratelimit.provider_bucket).
+NOTIFICATIONS_BULK_RATE_SHARE = env.float("NOTIFICATIONS_BULK_RATE_SHARE", default=0.8)
+# Max broadcast send batches queued on the bulk lane at once (see lanes.py)
+NOTIFICATIONS_BULK_MAX_IN_FLIGHT = env.int(
+    "NOTIFICATIONS_BULK_MAX_IN_FLIGHT", default=50
+)
+# Rendered notification bodies (text + HTML) of at least this many bytes are
+# stored zlib-compressed; 0 disables compression
+NOTIFICATIONS_CONTENT_COMPRESS_MIN = env.int(
+    "NOTIFICATIONS_CONTENT_COMPRESS_MIN", default=512
+)
+# Delivery attempts per notification before it is marked FAILED; retries back
+# off exponentially from NOTIFICATIONS_RETRY_BACKOFF seconds
+NOTIFICATIONS_MAX_ATTEMPTS = env.int("NOTIFICATIONS_MAX_ATTEMPTS", default=4)
+NOTIFICATIONS_RETRY_BACKOFF = env.int("NOTIFICATIONS_RETRY_BACKOFF", default=60)
+# Seconds a sender may hold a claimed (SENDING) notification before the
+# outbox sweeper assumes it died and takes the notification back
+NOTIFICATIONS_SEND_LEASE = env.int("NOTIFICATIONS_SEND_LEASE", default=600)
+# Seconds after which a never-attempted notification is assumed to have lost
+# its task message and is published again
+NOTIFICATIONS_OUTBOX_REDRIVE_AFTER = env.int(
+    "NOTIFICATIONS_OUTBOX_REDRIVE_AFTER", default=300
+)
+# Max notifications re-published per sweep
+NOTIFICATIONS_OUTBOX_SWEEP_LIMIT = env.int(
+    "NOTIFICATIONS_OUTBOX_SWEEP_LIMIT", default=5000
+)
+# Opt-in monthly partitioning of the Notification table (PostgreSQL only, see
+# apps/notifications/partitioning.py); convert once with
+# "manage.py partition_notifications --convert"
+NOTIFICATIONS_PARTITIONING = env.bool("NOTIFICATIONS_PARTITIONING", default=False)
+# Monthly partitions kept created ahead of the current month
+NOTIFICATIONS_PARTITIONS_AHEAD = env.int("NOTIFICATIONS_PARTITIONS_AHEAD", default=3)
+# Months of notifications kept before their partition is detached (0 = forever)
+NOTIFICATIONS_RETENTION_MONTHS = env.int("NOTIFICATIONS_RETENTION_MONTHS", default=0)
+# Drop expired partitions instead of only detaching them
+NOTIFICATIONS_RETENTION_DROP = env.bool("NOTIFICATIONS_RETENTION_DROP", default=False)
+# Finished notifications older than this many days are moved to the
+# "notification_archive" storage (0 disables archiving)
+NOTIFICATIONS_ARCHIVE_AFTER_DAYS = env.int(
+    "NOTIFICATIONS_ARCHIVE_AFTER_DAYS", default=0
+)
+# Rows per archive chunk (read, written, verified and deleted together)
+NOTIFICATIONS_ARCHIVE_CHUNK_SIZE = env.int(
+    "NOTIFICATIONS_ARCHIVE_CHUNK_SIZE", default=5000
+)
+# Time budget of one periodic archive run; the next run continues
+NOTIFICATIONS_ARCHIVE_MAX_SECONDS = env.int(
+    "NOTIFICATIONS_ARCHIVE_MAX_SECONDS", default=240
+)
+# Redis used for delivery counters and other notification bookkeeping
+NOTIFICATIONS_REDIS_URL = env("NOTIFICATIONS_REDIS_URL", default="redis://redis:6379/1")
+# Seconds between flushes of the Redis broadcast counters into Broadcast rows
+NOTIFICATIONS_COUNTER_FLUSH_INTERVAL = env.int(
+    "NOTIFICATIONS_COUNTER_FLUSH_INTERVAL", default=5
+)
+# Latest items kept per user in the Redis inbox feed (see apps/notifications/inbox.py)
+NOTIFICATIONS_INBOX_RECENT_SIZE = env.int("NOTIFICATIONS_INBOX_RECENT_SIZE", default=50)
+# Seconds a user's Redis inbox state lives after their last inbox read
+NOTIFICATIONS_INBOX_TTL = env.int("NOTIFICATIONS_INBOX_TTL", default=24 * 3600)
+# Seconds between rebuilds of the Redis inbox state of dirty users
+NOTIFICATIONS_INBOX_RECONCILE_INTERVAL = env.int(
+    "NOTIFICATIONS_INBOX_RECONCILE_INTERVAL", default=30
+)
+# Min seconds between live progress pushes per broadcast (see apps/notifications/progress.py)
+NOTIFICATIONS_PROGRESS_INTERVAL = env.float(
+    "NOTIFICATIONS_PROGRESS_INTERVAL", default=1.0
+)
+# Seconds between checks for config/template changes made by other processes
+NOTIFICATIONS_CACHE_RECHECK = env.int("NOTIFICATIONS_CACHE_RECHECK", default=5)
+# Max compiled templates kept per process (see apps/notifications/templating.py)
+NOTIFICATIONS_TEMPLATE_CACHE_SIZE = env.int(
+    "NOTIFICATIONS_TEMPLATE_CACHE_SIZE", default=256
+)
+# Seconds between scheduler sweeps for due broadcasts: how late a scheduled
+# broadcast may start
+NOTIFICATIONS_SCHEDULER_INTERVAL = env.int(
+    "NOTIFICATIONS_SCHEDULER_INTERVAL", default=10
+)
+# Seconds after which a due broadcast that hasn't started is dispatched again
+NOTIFICATIONS_SCHEDULER_REDISPATCH_AFTER = env.int(
+    "NOTIFICATIONS_SCHEDULER_REDISPATCH_AFTER", default=300
+)
+# Seconds between sends of the digests whose window has closed (see
+# apps/notifications/digests.py): how late a digest may go out
+NOTIFICATIONS_DIGEST_FLUSH_INTERVAL = env.int(
+    "NOTIFICATIONS_DIGEST_FLUSH_INTERVAL", default=5
+)
+# Seconds between applications of user changes to segment bitmaps (see
+# apps/notifications/segments.py), and changed users applied per transaction
+NOTIFICATIONS_SEGMENT_REFRESH_INTERVAL = env.int(
+    "NOTIFICATIONS_SEGMENT_REFRESH_INTERVAL", default=60
+)
+NOTIFICATIONS_SEGMENT_REFRESH_BATCH = env.int(
+    "NOTIFICATIONS_SEGMENT_REFRESH_BATCH", default=5000
+)
+
+# -----------------------------
+# Celery queues (priority lanes)
+# -----------------------------
+# send_notification and dispatch_bulk_batches pick lanes per message, the
+# rest go to a fixed lane. Run a dedicated worker pool per lane, see
+# CELERY_QUEUES in docker/local/django/celery/worker/start.
+CELERY_TASK_ROUTES = {
+    "apps.notifications.tasks.send_notification_task": {"queue": "transactional"},
+    "apps.notifications.tasks.send_email_batch": {"queue": "bulk"},
+    "apps.notifications.tasks.send_sms_batch": {"queue": "bulk"},
+    "apps.notifications.tasks.send_in_app_batch": {"queue": "bulk"},
+    "apps.notifications.tasks.process_broadcast": {"queue": "bulk"},
+    "apps.notifications.tasks.process_broadcast_partition": {"queue": "bulk"},
+    "apps.notifications.tasks.dispatch_bulk_batches": {"queue": "maintenance"},
+    "apps.notifications.tasks.dispatch_scheduled_broadcasts": {"queue": "maintenance"},
+    "apps.notifications.tasks.flush_broadcast_counters": {"queue": "maintenance"},
+    "apps.notifications.tasks.resume_broadcast_partitions": {"queue": "maintenance"},
+    "apps.notifications.tasks.sweep_outbox": {"queue": "maintenance"},
+    "apps.notifications.tasks.maintain_notification_partitions": {
+        "queue": "maintenance"
+    },
+    "apps.notifications.tasks.archive_old_notifications": {"queue": "maintenance"},
+    "apps.notifications.tasks.reconcile_inbox": {"queue": "maintenance"},
+    "apps.notifications.tasks.refresh_segments": {"queue": "maintenance"},
+    "apps.notifications.tasks.flush_digests": {"queue": "maintenance"},
+}
+
+# -----------------------------
+# Celery beat (periodic tasks)
+# -----------------------------
+# Schedules live in the database (editable in the admin); the entries below
+# are synced into it when beat starts.
+CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+CELERY_BEAT_SCHEDULE = {
+    "dispatch-bulk-batches": {
+        "task": "apps.notifications.tasks.dispatch_bulk_batches",
+        "schedule": 1,
+    },
+    "dispatch-scheduled-broadcasts": {
+        "task": "apps.notifications.tasks.dispatch_scheduled_broadcasts",
+        "schedule": NOTIFICATIONS_SCHEDULER_INTERVAL,
+    },
+    "flush-broadcast-counters": {
+        "task": "apps.notifications.tasks.flush_broadcast_counters",
+        "schedule": NOTIFICATIONS_COUNTER_FLUSH_INTERVAL,
+    },
+    "resume-broadcast-partitions": {
+        "task": "apps.notifications.tasks.resume_broadcast_partitions",
+        "schedule": 60,
+    },
+    "sweep-outbox": {
+        "task": "apps.notifications.tasks.sweep_outbox",
+        "schedule": 30,
+    },
+    "maintain-notification-partitions": {
+        "task": "apps.notifications.tasks.maintain_notification_partitions",
+        "schedule": 6 * 60 * 60,
+    },
+    "archive-old-notifications": {
+        "task": "apps.notifications.tasks.archive_old_notifications",
+        "schedule": 15 * 60,
+    },
+    "reconcile-inbox": {
+        "task": "apps.notifications.tasks.reconcile_inbox",
+        "schedule": NOTIFICATIONS_INBOX_RECONCILE_INTERVAL,
+    },
+    "flush-digests": {
+        "task": "apps.notifications.tasks.flush_digests",
+        "schedule": NOTIFICATIONS_DIGEST_FLUSH_INTERVAL,
+    },
+    "refresh-segments": {
+        "task": "apps.notifications.tasks.refresh_segments",
+        "schedule": NOTIFICATIONS_SEGMENT_REFRESH_INTERVAL,
+    },
+}
+
 # -----------------------------
 # Logger configuration
 # -----------------------------